@@ -0,0 +1,50 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from bulk_users import BulkImporter, LineParser, export_users
+from settings import get_settings
+
+router = APIRouter(prefix="/admin")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Admin routes are disabled entirely unless ADMIN_TOKEN is configured
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+async def iter_lines(stream):
+    """Split a streamed request body into text lines without buffering it"""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+@router.post("/users/import", dependencies=[Depends(require_admin)])
+async def import_users(request: Request):
+    # Body is NDJSON (default) or CSV with a header row (Content-Type: text/csv)
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    importer = BulkImporter()
+    parser = LineParser(fmt)
+    try:
+        async for line in iter_lines(request.stream()):
+            await parser.feed(importer, line)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+    return await importer.finish()
+
+
+@router.get("/users/export", dependencies=[Depends(require_admin)])
+def export(decrypt: bool = False):
+    # A sync generator: Starlette pulls each page on a worker thread, and
+    # only one page is held in memory at a time
+    return StreamingResponse(export_users(decrypt=decrypt), media_type="application/x-ndjson")
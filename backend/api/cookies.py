@@ -0,0 +1,34 @@
+from fastapi import Response
+from jwt_utils import ACCESS_TOKEN_TTL
+from sessions import Session
+
+# The refresh token is sent to every path so /logout can end the session
+# even after the access token has expired; SameSite=lax keeps it off
+# cross-site POSTs such as a forged /refresh
+REFRESH_COOKIE = "refresh_token"
+
+
+def set_session_cookies(response: Response, access_token: str, session: Session, now: float):
+    """Set the access token cookie, and the refresh token cookie if it was rotated"""
+    response.set_cookie(
+        key="token",
+        value=access_token,
+        httponly=True,
+        max_age=ACCESS_TOKEN_TTL,
+        samesite="lax",
+        secure=True  # HTTPS only in production
+    )
+    if session.refresh_token is not None:
+        response.set_cookie(
+            key=REFRESH_COOKIE,
+            value=session.refresh_token,
+            httponly=True,
+            max_age=max(0, int(session.exp - now)),
+            samesite="lax",
+            secure=True
+        )
+
+
+def clear_session_cookies(response: Response):
+    response.delete_cookie(key="token")
+    response.delete_cookie(key=REFRESH_COOKIE)
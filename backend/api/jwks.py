@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from jwt_utils import get_jwks
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json")
+def jwks(response: Response):
+    # Public keys only; other services fetch these to verify tokens locally
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return get_jwks()
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException, Response
+import math
+import time
+import logging
+from fastapi import APIRouter, HTTPException, Request, Response, BackgroundTasks
 from pydantic import BaseModel, EmailStr
-from utils import get_user_by_email
-from jwt_utils import create_jwt_token
-from password_utils import verify_password
+from repository import get_user_by_email, update_user, start_session, check_login_rate
+from jwt_utils import create_access_token
+from password_utils import verify_password_async, hash_password_async, needs_rehash
+from utils import reencrypt_user_aadhaar, normalize_email
+from api.cookies import set_session_cookies
+from api.models import UserProfile
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -12,32 +20,52 @@ class LoginRequest(BaseModel):
     password: str
 
 
-@router.post("/login")
-async def login(request: LoginRequest, response: Response):
+class LoginResponse(BaseModel):
+    message: str
+    user: UserProfile
+
+
+async def rehash_password(auth_id: str, password: str):
+    """Re-hash a verified password with the current Argon2 parameters"""
+    try:
+        await update_user(auth_id, password=await hash_password_async(password))
+    except Exception:
+        logger.warning("Could not rehash password for user %s", auth_id, exc_info=True)
+
+
+@router.post("/login", response_model=LoginResponse)
+async def login(request: LoginRequest, response: Response, background_tasks: BackgroundTasks,
+                http_request: Request):
+    # Reject over-budget attempts before any database or Argon2 work
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    retry_after = await check_login_rate(client_ip, normalize_email(request.email))
+    if retry_after:
+        raise HTTPException(
+            status_code=429, detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))})
+
     # Get user by email
-    user = get_user_by_email(request.email)
+    user = await get_user_by_email(request.email)
 
     if not user:
         raise HTTPException(
             status_code=401, detail="Invalid email or password")
 
     # Verify password using Argon2
-    if not verify_password(user['password'], request.password):
+    if not await verify_password_async(user['password'], request.password):
         raise HTTPException(
             status_code=401, detail="Invalid email or password")
 
-    # Create JWT token with user_id (auth_id)
-    token = create_jwt_token(user['auth_id'])
-
-    # Set JWT as httpOnly cookie (expires in 1 day = 86400 seconds)
-    response.set_cookie(
-        key="token",
-        value=token,
-        httponly=True,
-        max_age=86400,  # 1 day in seconds
-        samesite="lax",
-        secure=True  # HTTPS only in production
-    )
+    # Upgrade legacy Aadhaar ciphertext and outdated password hashes after responding
+    background_tasks.add_task(reencrypt_user_aadhaar, user)
+    if needs_rehash(user['password']):
+        background_tasks.add_task(rehash_password, user['auth_id'], request.password)
+
+    # Start a refresh session and issue a short-lived access token carrying
+    # the profile, so /verify needs no database read until it expires
+    session = await start_session(user['auth_id'])
+    token = create_access_token(user, session.session_id)
+    set_session_cookies(response, token, session, time.time())
 
     # Return user data (excluding password)
     return {
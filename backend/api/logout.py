@@ -1,10 +1,28 @@
-from fastapi import APIRouter, Response
+import time
+from fastapi import APIRouter, Response, Cookie
+from jwt_utils import verify_jwt_token, ACCESS_TOKEN_TTL
+from repository import revoke_token, end_session, end_session_for_token
+from api.cookies import REFRESH_COOKIE, clear_session_cookies
+from api.models import MessageResponse
 
 router = APIRouter()
 
 
-@router.post("/logout")
-async def logout(response: Response):
-    # Delete the token cookie
-    response.delete_cookie(key="token")
+@router.post("/logout", response_model=MessageResponse)
+async def logout(response: Response, token: str = Cookie(None),
+                 refresh_token: str = Cookie(None, alias=REFRESH_COOKIE)):
+    # End the refresh session, which also revokes every access token issued
+    # under it; fall back to revoking just this token (tokens issued without
+    # a jti simply run to their exp)
+    payload = verify_jwt_token(token) if token else None
+    access_expiry = time.time() + ACCESS_TOKEN_TTL
+    if payload and payload.get('sid'):
+        await end_session(payload['sid'], access_expiry)
+    elif refresh_token:
+        await end_session_for_token(refresh_token, access_expiry)
+    if payload and payload.get('jti') and not payload.get('sid'):
+        await revoke_token(payload['jti'], payload['exp'])
+
+    # Delete the token cookies
+    clear_session_cookies(response)
     return {"message": "Logged out successfully"}
@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metrics import render_metrics
+from password_utils import hashing_pool
+from utils import get_user_cache_stats, get_email_filter_stats, get_storage_stats
+from jwt_utils import get_token_cache_stats
+from repository import get_coalesced_lookups
+from sessions import revocations
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Point-in-time pool and cache state, sampled at scrape time
+    pool = hashing_pool.stats()
+    cache = get_user_cache_stats()
+    tokens = get_token_cache_stats()
+    revoked = revocations.stats()
+    gauges = {
+        "auth_hash_pool_running": pool["running"],
+        "auth_hash_pool_queued": pool["queued"],
+        "auth_user_cache_size": cache["size"],
+        "auth_token_cache_size": tokens["size"],
+        "auth_revoked_tokens": revoked["revoked"],
+    }
+    counters = {
+        "auth_hash_pool_completed_total": pool["completed"],
+        "auth_user_cache_hits_total": cache["hits"],
+        "auth_user_cache_misses_total": cache["misses"],
+        "auth_user_cache_evictions_total": cache["evictions"],
+        "auth_lookups_coalesced_total": get_coalesced_lookups(),
+        "auth_token_cache_hits_total": tokens["hits"],
+        "auth_token_cache_misses_total": tokens["misses"],
+    }
+    email_filter = get_email_filter_stats()
+    if email_filter is not None:
+        gauges.update({
+            "auth_email_filter_ready": int(email_filter["ready"]),
+            "auth_email_filter_emails": email_filter["count"],
+            "auth_email_filter_estimated_fpr": email_filter["estimated_fpr"],
+            "auth_email_filter_observed_fpr": email_filter["observed_fpr"],
+        })
+        counters.update({
+            "auth_email_filter_negatives_total": email_filter["negatives"],
+            "auth_email_filter_maybes_total": email_filter["maybes"],
+            "auth_email_filter_stale_total": email_filter["stale"],
+            "auth_email_filter_false_positives_total": email_filter["false_positives"],
+        })
+    if revoked["seconds_since_sync"] is not None:
+        gauges["auth_revocations_seconds_since_sync"] = revoked["seconds_since_sync"]
+    replica = get_storage_stats()
+    if replica is not None:
+        gauges.update({
+            "auth_replica_ready": int(replica["ready"]),
+            "auth_replica_users": replica["users"],
+        })
+        if replica["seconds_since_event"] is not None:
+            gauges["auth_replica_seconds_since_event"] = replica["seconds_since_event"]
+        counters.update({
+            "auth_replica_events_total": replica["events"],
+            "auth_replica_resyncs_total": replica["resyncs"],
+            "auth_replica_restarts_total": replica["restarts"],
+            "auth_replica_hits_total": replica["hits"],
+            "auth_replica_misses_total": replica["misses"],
+            "auth_replica_fallbacks_total": replica["fallbacks"],
+        })
+    return render_metrics(gauges, counters)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class UserProfile(BaseModel):
+    auth_id: str
+    name: str
+    email: str
+    aadhaar: str
+
+
+class MessageResponse(BaseModel):
+    message: str
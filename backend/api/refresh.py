@@ -0,0 +1,33 @@
+import time
+from fastapi import APIRouter, HTTPException, Response, Cookie
+from fastapi.responses import ORJSONResponse
+from repository import rotate_refresh_token, get_user_by_auth_id
+from jwt_utils import create_access_token
+from sessions import RefreshTokenError
+from api.cookies import REFRESH_COOKIE, set_session_cookies, clear_session_cookies
+from api.models import MessageResponse
+
+router = APIRouter()
+
+
+@router.post("/refresh", response_model=MessageResponse)
+async def refresh(response: Response, refresh_token: str = Cookie(None, alias=REFRESH_COOKIE)):
+    # The only endpoint that reads session state from storage; /verify
+    # answers from the access token alone
+    if not refresh_token:
+        raise HTTPException(status_code=401, detail="No refresh token provided")
+
+    try:
+        session = await rotate_refresh_token(refresh_token)
+    except RefreshTokenError:
+        # Drop the dead cookies too, so the client stops retrying with them
+        failure = ORJSONResponse(status_code=401, content={"detail": "Invalid or expired refresh token"})
+        clear_session_cookies(failure)
+        return failure
+
+    user = await get_user_by_auth_id(session.auth_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    set_session_cookies(response, create_access_token(user, session.session_id), session, time.time())
+    return {"message": "Token refreshed"}
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-from utils import generate_auth_id, email_exists, create_user
-from password_utils import hash_password
+from repository import generate_auth_id, create_user, EmailAlreadyExistsError
+from password_utils import hash_password_async
 from encryption_utils import encrypt_message
 
 router = APIRouter()
@@ -14,28 +14,29 @@ class SignupRequest(BaseModel):
     password: str
 
 
-@router.post("/signup")
+class SignupResponse(BaseModel):
+    message: str
+    auth_id: str
+
+
+@router.post("/signup", response_model=SignupResponse)
 async def signup(request: SignupRequest):
     # Validate Aadhaar number
     if len(request.aadhaar) != 12 or not request.aadhaar.isdigit():
         raise HTTPException(status_code=400, detail="Invalid Aadhaar number")
 
-    # Check if email already exists
-    if email_exists(request.email):
-        raise HTTPException(status_code=400, detail="Email already registered")
-
     # Generate unique auth ID
-    auth_id = generate_auth_id()
+    auth_id = await generate_auth_id()
 
     # Hash password using Argon2
-    hashed_password = hash_password(request.password)
+    hashed_password = await hash_password_async(request.password)
 
-    # Encrypt Aadhaar using AES-256-CBC
+    # Encrypt Aadhaar using AES-256-GCM
     encrypted_aadhaar = encrypt_message(request.aadhaar)
 
-    # Create user in database
+    # Reserve the email and create the user in one atomic write
     try:
-        create_user(
+        await create_user(
             auth_id=auth_id,
             name=request.name,
             email=request.email,
@@ -46,6 +47,8 @@ async def signup(request: SignupRequest):
             "message": "User created successfully",
             "auth_id": auth_id
         }
+    except EmailAlreadyExistsError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to create user: {str(e)}")
@@ -1,19 +1,46 @@
-from fastapi import APIRouter, HTTPException, Cookie
+from fastapi import APIRouter, HTTPException, Cookie, BackgroundTasks
 from pydantic import BaseModel
 from jwt_utils import verify_jwt_token
-from utils import get_user_by_auth_id
-from encryption_utils import decrypt_message
+from repository import get_user_by_auth_id
+from utils import get_cached_user, reencrypt_user_aadhaar
+from encryption_utils import decrypt_message, open_claim
+from api.models import UserProfile
 
 router = APIRouter()
 
 
 class VerifyResponse(BaseModel):
     valid: bool
-    user: dict = None
+    user: UserProfile = None
 
 
-@router.get("/verify")
-async def verify_token(token: str = Cookie(None)):
+def profile_from_token(payload: dict):
+    """
+    Return the user from an access token's own claims, with the Aadhaar
+    number decrypted, or None if the user record must be read.
+
+    Never adds I/O: the profile and sealed Aadhaar number come from the
+    token, and the version check only consults the in-process user cache,
+    where a record with a newer profile_version forces a read.
+    """
+    profile = payload.get('profile')
+    # Access tokens live only ACCESS_TOKEN_TTL, which bounds how stale
+    # their profile can be
+    if not profile or payload.get('typ') != 'access':
+        return None
+
+    aadhaar = open_claim(payload.get('aadhaar_seal') or "", payload['user_id'])
+    if aadhaar is None:
+        return None
+
+    cached = get_cached_user(payload['user_id'])
+    if cached is not None and cached.get('profile_version', 1) != profile.get('pv'):
+        return None
+    return {**profile, "aadhaar": aadhaar}
+
+
+@router.get("/verify", response_model=VerifyResponse)
+async def verify_token(background_tasks: BackgroundTasks, token: str = Cookie(None)):
     if not token:
         raise HTTPException(status_code=401, detail="No token provided")
 
@@ -23,19 +50,26 @@ async def verify_token(token: str = Cookie(None)):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    # Get user data
-    user = get_user_by_auth_id(payload['user_id'])
+    # Answer from the token's own claims when possible, else read the user
+    user = profile_from_token(payload)
+    if user is not None:
+        decrypted_aadhaar = user['aadhaar']
+    else:
+        user = await get_user_by_auth_id(payload['user_id'])
+
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
 
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+        # Upgrade legacy Aadhaar ciphertext after responding
+        background_tasks.add_task(reencrypt_user_aadhaar, user)
 
-    # Decrypt Aadhaar before sending to client
-    decrypted_aadhaar = decrypt_message(user['aadhaar'])
+        # Decrypt Aadhaar before sending to client
+        decrypted_aadhaar = decrypt_message(user['aadhaar'])
 
     return {
         "valid": True,
         "user": {
-            "auth_id": user['auth_id'],
+            "auth_id": payload['user_id'],
             "name": user['name'],
             "email": user['email'],
             "aadhaar": decrypted_aadhaar
@@ -0,0 +1,20 @@
+"""
+Performance benchmarks for the authentication backend.
+
+Run from the backend directory:
+
+    python -m benchmarks --users 10000 --save benchmarks/baseline.json
+    python -m benchmarks --users 10000 --compare benchmarks/baseline.json
+
+Everything runs in-process against a local storage backend (memory or
+sqlite), so no Firebase project is needed.
+"""
+import os
+
+# Encryption and token signing need keys on first use; give the benchmarks
+# throwaway keys unless real ones are configured.
+os.environ.setdefault("ENCRYPTION_KEY", "benchmark_encryption_key")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark_jwt_secret_key")
+# The load driver logs in from one client address far faster than any
+# real user would.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
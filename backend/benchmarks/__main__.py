@@ -0,0 +1,51 @@
+import sys
+import argparse
+from benchmarks.harness import save_results, load_results, compare_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run authentication backend benchmarks")
+    parser.add_argument("--users", type=int, default=10000, help="Synthetic users to seed")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--signup-requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1000, help="Microbenchmark rounds")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative p50 slowdown before failing")
+    args = parser.parse_args(argv)
+
+    from benchmarks.micro import run_micro
+    from benchmarks.load import run_endpoints
+
+    results = {}
+    if not args.skip_micro:
+        results.update(run_micro(rounds=args.rounds))
+    if not args.skip_endpoints:
+        results.update(run_endpoints(args.users, backend_name=args.backend, requests=args.requests,
+                                     concurrency=args.concurrency,
+                                     signup_requests=args.signup_requests))
+
+    print(f"{'benchmark':<26}{'p50 us':>12}{'p99 us':>12}{'ops/s':>12}")
+    for name, result in sorted(results.items()):
+        rate = result.get("throughput_rps", result["ops_per_sec"])
+        print(f"{name:<26}{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}{rate:>12.1f}")
+
+    if args.save:
+        save_results(args.save, results)
+
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), results, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p50 {before:.1f}us -> {after:.1f}us")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import json
+import time
+import statistics
+
+
+def summarize(samples: list) -> dict:
+    """
+    Summarize per-call durations (seconds) as latency percentiles.
+
+    Returns:
+        Dict of mean/p50/p99 in microseconds and calls per second
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "rounds": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+        "ops_per_sec": len(ordered) / total if total else 0.0,
+    }
+
+
+def bench(func, rounds: int = 1000, warmup: int = 10) -> dict:
+    """
+    Time func() over a number of rounds, pytest-benchmark style.
+
+    Args:
+        func: Zero-argument callable to measure
+        rounds: Number of timed calls
+        warmup: Untimed calls made first
+
+    Returns:
+        Summary from summarize()
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    timer = time.perf_counter
+    for _ in range(rounds):
+        start = timer()
+        func()
+        samples.append(timer() - start)
+    return summarize(samples)
+
+
+def save_results(path: str, results: dict):
+    """Write benchmark results as JSON"""
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> dict:
+    """Read benchmark results written by save_results()"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.2) -> list:
+    """
+    Find benchmarks whose median latency regressed beyond threshold.
+
+    Args:
+        baseline: Results from a previous run
+        current: Results from this run
+        threshold: Allowed relative p50 slowdown (0.2 = 20%)
+
+    Returns:
+        List of (name, baseline_p50_us, current_p50_us) for regressions
+    """
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous and result["p50_us"] > previous["p50_us"] * (1 + threshold):
+            regressions.append((name, previous["p50_us"], result["p50_us"]))
+    return regressions
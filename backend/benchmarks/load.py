@@ -0,0 +1,139 @@
+"""
+In-process ASGI load driver for /signup, /login and /verify.
+
+Requests go through httpx's ASGI transport straight into the FastAPI app,
+so the numbers cover routing, validation, hashing, crypto and storage but
+not the network or the HTTP server.
+"""
+import time
+import asyncio
+import httpx
+import storage
+from benchmarks.harness import summarize
+from storage.memory import MemoryBackend
+from storage.sqlite import SQLiteBackend
+from password_utils import hash_password
+from encryption_utils import encrypt_message
+from utils import generate_auth_id, normalize_email, user_cache
+
+SEED_PASSWORD = "SeedPassword123"
+
+
+def seed_users(backend, count: int) -> list:
+    """
+    Fill a backend with synthetic users.
+
+    All users share one Argon2 hash and one Aadhaar ciphertext so that
+    seeding a million users takes seconds rather than hours.
+
+    Returns:
+        The seeded emails, in creation order
+    """
+    hashed = hash_password(SEED_PASSWORD)
+    aadhaar = encrypt_message("123456789012")
+    emails = []
+    for i in range(count):
+        email = f"user{i}@bench.example.com"
+        backend.create_user(generate_auth_id(), {
+            'name': f"Bench User {i}",
+            'email': email,
+            'aadhaar': aadhaar,
+            'password': hashed,
+            'profile_version': 1
+        }, normalize_email(email))
+        emails.append(email)
+    return emails
+
+
+def make_backend(name: str, path: str = ":memory:"):
+    """Create a local storage backend for load testing"""
+    if name == "sqlite":
+        return SQLiteBackend(path)
+    return MemoryBackend()
+
+
+async def _drive(client, make_request, total: int, concurrency: int) -> dict:
+    samples = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(samples)
+    result["throughput_rps"] = total / elapsed if elapsed else 0.0
+    result["errors"] = errors
+    result["concurrency"] = concurrency
+    return result
+
+
+async def run_load(app, emails: list, requests: int = 1000, concurrency: int = 50,
+                   signup_requests: int = 100) -> dict:
+    """
+    Drive the app with concurrent /signup, /login and /verify requests.
+
+    Args:
+        app: The FastAPI application
+        emails: Seeded emails whose password is SEED_PASSWORD
+        requests: Number of /login and /verify requests each
+        concurrency: Number of concurrent virtual clients
+        signup_requests: Number of /signup requests (Argon2 bound)
+
+    Returns:
+        Per-endpoint latency summaries plus throughput
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+        async def signup(client, i):
+            return await client.post("/signup", json={
+                "name": f"New User {i}",
+                "email": f"new{i}-{time.time_ns()}@bench.example.com",
+                "aadhaar": "123456789012",
+                "password": SEED_PASSWORD
+            })
+
+        async def login(client, i):
+            return await client.post("/login", json={
+                "email": emails[i % len(emails)],
+                "password": SEED_PASSWORD
+            })
+
+        login_response = await login(client, 0)
+        token = login_response.cookies.get("token")
+
+        async def verify(client, i):
+            return await client.get("/verify", cookies={"token": token})
+
+        return {
+            "endpoint_signup": await _drive(client, signup, signup_requests, concurrency),
+            "endpoint_login": await _drive(client, login, requests, concurrency),
+            "endpoint_verify": await _drive(client, verify, requests, concurrency),
+        }
+
+
+def run_endpoints(users: int, backend_name: str = "memory", requests: int = 1000,
+                  concurrency: int = 50, signup_requests: int = 100) -> dict:
+    """Seed a local backend, install it, and run the load driver"""
+    from main import app
+
+    backend = make_backend(backend_name)
+    emails = seed_users(backend, users)
+    previous = storage._backend
+    storage.set_backend(backend)
+    user_cache.clear()
+    try:
+        return asyncio.run(run_load(app, emails, requests=requests, concurrency=concurrency,
+                                    signup_requests=signup_requests))
+    finally:
+        storage.set_backend(previous)
+        backend.close()
@@ -0,0 +1,46 @@
+"""Microbenchmarks for the per-request primitives."""
+from benchmarks.harness import bench
+from password_utils import hash_password, verify_password
+from encryption_utils import encrypt_message, decrypt_message
+from jwt_utils import create_jwt_token, verify_jwt_token
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from api.verify import VerifyResponse
+
+
+def run_micro(rounds: int = 1000, argon2_rounds: int = 20) -> dict:
+    """
+    Benchmark hashing, encryption and JWT helpers.
+
+    Argon2 is deliberately slow, so it runs for fewer rounds. The two
+    serialize_verify entries render a /verify body the way FastAPI does
+    without a response model (jsonable_encoder, then json.dumps) and with
+    one (pydantic-core validation and serialization, then orjson).
+    """
+    password = "BenchmarkPassword123"
+    hashed = hash_password(password)
+    ciphertext = encrypt_message("123456789012")
+    token = create_jwt_token("benchmarkUser")
+    body = {
+        "valid": True,
+        "user": {
+            "auth_id": "benchmarkUser",
+            "name": "Benchmark User",
+            "email": "benchmark@example.com",
+            "aadhaar": "123456789012"
+        }
+    }
+    verify_response = TypeAdapter(VerifyResponse)
+
+    return {
+        "hash_password": bench(lambda: hash_password(password), rounds=argon2_rounds, warmup=1),
+        "verify_password": bench(lambda: verify_password(hashed, password), rounds=argon2_rounds, warmup=1),
+        "encrypt_message": bench(lambda: encrypt_message("123456789012"), rounds=rounds),
+        "decrypt_message": bench(lambda: decrypt_message(ciphertext), rounds=rounds),
+        "create_jwt_token": bench(lambda: create_jwt_token("benchmarkUser"), rounds=rounds),
+        "verify_jwt_token": bench(lambda: verify_jwt_token(token), rounds=rounds),
+        "serialize_verify_generic": bench(lambda: JSONResponse(jsonable_encoder(body)), rounds=rounds),
+        "serialize_verify_typed": bench(lambda: ORJSONResponse(verify_response.dump_python(
+            verify_response.validate_python(body), mode="json")), rounds=rounds),
+    }
@@ -0,0 +1,251 @@
+"""
+Bloom filter of registered emails for zero-I/O negative lookups.
+
+A Bloom filter never forgets an added item, so "not in the filter" means the
+email is definitely not registered, while "in the filter" only means maybe
+(checked against the store as before). Users are never deleted and emails
+never change, so the filter only has to learn about new users:
+
+- users created by this process are added as they are written
+- users created elsewhere (other workers or hosts, bulk imports) are picked
+  up by a background catch-up scan over the auth ids created since the last
+  one, every refresh interval; negatives are not answered while it lags
+
+The filter can be saved to disk so a restart only catches up instead of
+rescanning every user.
+"""
+import os
+import math
+import time
+import struct
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# File layout: magic, version, num_bits, num_hashes, count, synced_at, bits
+_MAGIC = b"BLM"
+_VERSION = 1
+_HEADER = struct.Struct(">3sBQIQd")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings, using double hashing of one
+    BLAKE2b digest.
+
+    Args:
+        num_bits: Size of the bit array
+        num_hashes: Bit positions set per item
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: bytes = None, count: int = 0):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, num_hashes)
+        self._bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        """Size a filter for capacity items at the target false-positive rate"""
+        capacity = max(1, capacity)
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        """Add an item (count only grows if the item was not already present)"""
+        positions = self._positions(item)
+        # Setting a bit is a read-modify-write of its byte
+        with self._lock:
+            changed = False
+            for position in positions:
+                mask = 1 << (position & 7)
+                if not self._bits[position >> 3] & mask:
+                    self._bits[position >> 3] |= mask
+                    changed = True
+            if changed:
+                self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def estimated_fpr(self) -> float:
+        """Expected false-positive rate for the number of items added"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def to_bytes(self, synced_at: float = 0.0) -> bytes:
+        with self._lock:
+            return _HEADER.pack(_MAGIC, _VERSION, self.num_bits, self.num_hashes,
+                                self.count, synced_at) + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """
+        Load a filter written by to_bytes.
+
+        Returns:
+            (filter, synced_at)
+
+        Raises:
+            ValueError: If the data is not a complete serialized filter
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated Bloom filter")
+        magic, version, num_bits, num_hashes, count, synced_at = _HEADER.unpack_from(data)
+        bits = data[_HEADER.size:]
+        if magic != _MAGIC or version != _VERSION or len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Not a serialized Bloom filter")
+        return cls(num_bits, num_hashes, bits=bits, count=count), synced_at
+
+
+class EmailFilter:
+    """
+    Registered-email filter kept in step with the user store.
+
+    Args:
+        capacity: Expected number of users (sizes the filter)
+        error_rate: Target false-positive rate at capacity
+        scan: Callable(since, until) yielding the normalized emails of every
+            user created between the two timestamps (None for no bound)
+        refresh_interval: Seconds between background catch-up scans;
+            negatives are only answered while the last one is less than
+            twice this old
+        skew: Seconds scanned on either side of the catch-up window,
+            covering clock skew between the hosts that create users
+        path: File for warm-start snapshots (None disables persistence)
+        clock: Time function, injectable for tests
+    """
+
+    def __init__(self, capacity: int, error_rate: float, scan, refresh_interval: float = 1.0,
+                 skew: float = 60.0, path: str = None, clock=time.time):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.skew = skew
+        self.path = path
+        self._scan = scan
+        self._clock = clock
+        self._filter = None
+        self._synced_at = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.negatives = 0
+        self.stale = 0
+        self.maybes = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def load_or_build(self):
+        """Warm-start from the snapshot if it matches the sizing, else build from a full scan"""
+        bloom = synced_at = None
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    bloom, synced_at = BloomFilter.from_bytes(f.read())
+                expected = BloomFilter.for_capacity(self.capacity, self.error_rate)
+                if (bloom.num_bits, bloom.num_hashes) != (expected.num_bits, expected.num_hashes):
+                    bloom = synced_at = None
+            except (OSError, ValueError):
+                logger.warning("Ignoring unreadable email filter snapshot %s", self.path, exc_info=True)
+                bloom = synced_at = None
+
+        if bloom is None:
+            bloom = BloomFilter.for_capacity(self.capacity, self.error_rate)
+        started = self._clock()
+        if synced_at is None:
+            emails = self._scan(None, None)
+        else:
+            emails = self._scan(synced_at - self.skew, started + self.skew)
+        for email in emails:
+            bloom.add(email)
+        self._filter, self._synced_at = bloom, started
+        self.save()
+
+    def refresh(self):
+        """Catch up with users created since the last scan"""
+        with self._refresh_lock:
+            started = self._clock()
+            for email in self._scan(self._synced_at - self.skew, started + self.skew):
+                self._filter.add(email)
+            self._synced_at = started
+
+    def start(self):
+        """Keep catching up on a daemon thread, every refresh_interval"""
+        self._stop.clear()
+        threading.Thread(target=self._run, name="email-filter-refresh", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.warning("Could not refresh the email filter", exc_info=True)
+
+    def add(self, email: str):
+        """Record a newly created user's normalized email"""
+        if self._filter is not None:
+            self._filter.add(email)
+
+    def definitely_absent(self, email: str) -> bool:
+        """
+        Return True only if the normalized email is certainly not registered.
+
+        Always False until the filter has been built, and while the
+        background catch-up has fallen behind (the last scan is twice
+        refresh_interval old); it never scans on the caller's thread.
+        """
+        if self._filter is None:
+            return False
+        if email in self._filter:
+            self.maybes += 1
+            return False
+        if self._clock() - self._synced_at >= 2 * self.refresh_interval:
+            self.stale += 1
+            return False
+        self.negatives += 1
+        return True
+
+    def record_false_positive(self):
+        """Count a "maybe" answer the store then reported as absent"""
+        self.false_positives += 1
+
+    def save(self):
+        """Atomically write the snapshot, if persistence is configured"""
+        if not self.path or self._filter is None:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(self._filter.to_bytes(self._synced_at))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.warning("Could not save email filter snapshot %s", self.path, exc_info=True)
+
+    def stats(self) -> dict:
+        """Return size, estimated and observed false-positive rates and counters"""
+        checks = self.negatives + self.false_positives
+        return {
+            "ready": self.ready,
+            "count": self._filter.count if self._filter is not None else 0,
+            "estimated_fpr": self._filter.estimated_fpr() if self._filter is not None else 0.0,
+            "observed_fpr": self.false_positives / checks if checks else 0.0,
+            "negatives": self.negatives,
+            "maybes": self.maybes,
+            "stale": self.stale,
+            "false_positives": self.false_positives,
+        }
@@ -0,0 +1,249 @@
+"""
+Bulk user import and export.
+
+Import: rows (name, email, aadhaar, password) are read from NDJSON or CSV and
+processed in chunks: passwords are hashed concurrently on the Argon2 worker
+pool, Aadhaar numbers are encrypted in one batch, and each chunk is written
+with a single batched backend call. Used by `python manage.py import-users`
+and `POST /admin/users/import`.
+
+Export: users are streamed as NDJSON from the backend's paged iterator, so
+memory stays constant however many users are stored. Used by
+`python manage.py export-users` and `GET /admin/users/export`.
+"""
+import csv
+import json
+import asyncio
+import logging
+from pydantic import BaseModel, EmailStr, ValidationError
+import repository
+from utils import normalize_email, new_user_record, iter_users
+from password_utils import hash_password_async
+from encryption_utils import encrypt_many, decrypt_many, decrypt_message
+from settings import env
+from storage import ITER_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(env("IMPORT_CHUNK_SIZE", "500"))
+
+# Record fields included in exports; password hashes never leave the store
+EXPORT_FIELDS = ("name", "email", "aadhaar", "profile_version")
+
+# Per-row errors reported in the summary; the counts are always complete
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRow(BaseModel):
+    name: str
+    email: EmailStr
+    aadhaar: str
+    password: str
+
+
+def parse_ndjson_line(line: str):
+    """Parse one NDJSON line into a row dict, or None for a blank line"""
+    line = line.strip()
+    return json.loads(line) if line else None
+
+
+def parse_csv_line(line: str, header: list):
+    """Parse one CSV line into a row dict using the header, or None for a blank line"""
+    if not line.strip():
+        return None
+    return dict(zip(header, next(csv.reader([line]))))
+
+
+def parse_csv_header(line: str) -> list:
+    """Parse the CSV header line into column names"""
+    return [name.strip() for name in next(csv.reader([line]))]
+
+
+class BulkImporter:
+    """
+    Import users chunk by chunk.
+
+    Feed rows with add() and call finish() at the end; rows are buffered up
+    to chunk_size and then written together. Rows with missing or invalid
+    fields, emails repeated within the import and emails that are already
+    registered are skipped and counted.
+
+    Args:
+        chunk_size: Rows hashed, encrypted and written per batch
+    """
+
+    def __init__(self, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self._pending = []
+        self._seen_emails = set()
+
+    def _reject(self, row_number: int, reason: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": reason})
+
+    async def add(self, row):
+        """Queue one raw row (dict), writing a chunk when the buffer is full"""
+        self.rows += 1
+        if not isinstance(row, dict):
+            self._reject(self.rows, "Row must be an object with name, email, aadhaar and password")
+            return
+        try:
+            user = ImportRow(**row)
+        except ValidationError as e:
+            self._reject(self.rows, "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            return
+
+        email = normalize_email(user.email)
+        if len(user.aadhaar) != 12 or not user.aadhaar.isdigit():
+            self._reject(self.rows, "Invalid Aadhaar number")
+            return
+        if email in self._seen_emails:
+            self.duplicates += 1
+            return
+
+        self._seen_emails.add(email)
+        self._pending.append(user)
+        if len(self._pending) >= self.chunk_size:
+            await self.flush()
+
+    def reject(self, reason: str):
+        """Count a row that could not be parsed at all"""
+        self.rows += 1
+        self._reject(self.rows, reason)
+
+    async def flush(self):
+        """Hash, encrypt and write the buffered rows"""
+        chunk, self._pending = self._pending, []
+        if not chunk:
+            return
+
+        # Skip users that are already registered before paying for their
+        # hashes (re-running an import is then cheap); create_users still
+        # catches any email taken in the meantime
+        registered = await asyncio.gather(*(repository.email_exists(user.email) for user in chunk))
+        self.duplicates += sum(registered)
+        chunk = [user for user, exists in zip(chunk, registered) if not exists]
+        if not chunk:
+            return
+
+        # The pool bounds how many hashes actually run at once
+        hashes = await asyncio.gather(*(hash_password_async(user.password) for user in chunk))
+        aadhaars = encrypt_many([user.aadhaar for user in chunk])
+
+        records = {}
+        for user, hashed_password, encrypted_aadhaar in zip(chunk, hashes, aadhaars):
+            auth_id = await repository.generate_auth_id()
+            records[auth_id] = new_user_record(user.name, user.email, encrypted_aadhaar, hashed_password)
+
+        duplicates = await repository.create_users(records)
+        self.duplicates += len(duplicates)
+        self.created += len(records) - len(duplicates)
+
+    async def finish(self) -> dict:
+        """Write any remaining rows and return the summary"""
+        await self.flush()
+        return self.summary()
+
+    def summary(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+class LineParser:
+    """Turn NDJSON or CSV text lines into rows for a BulkImporter"""
+
+    def __init__(self, fmt: str = "ndjson"):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.fmt = fmt
+        self.header = None
+
+    async def feed(self, importer: BulkImporter, line: str):
+        try:
+            if self.fmt == "csv" and self.header is None:
+                if line.strip():
+                    self.header = parse_csv_header(line)
+                return
+            row = parse_csv_line(line, self.header) if self.fmt == "csv" else parse_ndjson_line(line)
+        except (ValueError, csv.Error) as e:
+            importer.reject(f"Could not parse line: {e}")
+            return
+        if row is not None:
+            await importer.add(row)
+
+
+async def import_lines(lines, fmt: str = "ndjson", chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Import users from an iterable of text lines.
+
+    Args:
+        lines: NDJSON lines, or CSV lines starting with a header row
+        fmt: "ndjson" or "csv"
+        chunk_size: Rows written per batch
+
+    Returns:
+        Summary dict with rows/created/duplicates/invalid counts and errors
+    """
+    importer = BulkImporter(chunk_size)
+    parser = LineParser(fmt)
+    for line in lines:
+        await parser.feed(importer, line)
+    return await importer.finish()
+
+
+def _decrypt_batch(batch):
+    try:
+        plaintexts = decrypt_many([record.get('aadhaar') for _, record in batch])
+    except Exception:
+        # Fall back to one record at a time so a single bad ciphertext does
+        # not abort the export
+        plaintexts = []
+        for auth_id, record in batch:
+            try:
+                plaintexts.append(decrypt_message(record.get('aadhaar')))
+            except Exception:
+                logger.warning("Could not decrypt Aadhaar for user %s", auth_id)
+                plaintexts.append(None)
+    for (_, record), plaintext in zip(batch, plaintexts):
+        record['aadhaar'] = plaintext
+
+
+def export_users(decrypt: bool = False, batch_size: int = ITER_PAGE_SIZE):
+    """
+    Yield every user as one NDJSON line.
+
+    Args:
+        decrypt: Replace the Aadhaar ciphertext with the plaintext, decrypted
+            in batches of batch_size
+        batch_size: Users read per page (and decrypted per batch)
+
+    Yields:
+        '{"auth_id": ..., "name": ..., "email": ..., "aadhaar": ..., "profile_version": ...}\\n'
+    """
+    batch = []
+
+    def flush():
+        if decrypt:
+            _decrypt_batch(batch)
+        lines = [json.dumps({"auth_id": auth_id, **{field: record.get(field) for field in EXPORT_FIELDS}}) + "\n"
+                 for auth_id, record in batch]
+        batch.clear()
+        return lines
+
+    for auth_id, record in iter_users(page_size=batch_size):
+        batch.append((auth_id, record))
+        if len(batch) >= batch_size:
+            yield from flush()
+    yield from flush()
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe bounded cache with LRU eviction and per-entry expiry.
+
+    Args:
+        maxsize: Maximum number of entries (0 disables the cache)
+        ttl: Seconds an entry stays valid after it is stored
+        timer: Clock function, injectable for tests
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if absent or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self._timer():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Store value under key, evicting the least recently used entry if full.
+
+        Args:
+            ttl: Seconds this entry stays valid, if shorter than the cache's ttl
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._timer() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Remove key from the cache if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current size"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and share its result (or exception) instead of
+    repeating the work. Put in front of a cache fill, this also stops a
+    stampede when a hot entry expires: only one caller reloads it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, func, *args):
+        """Return func(*args), sharing the result with concurrent calls for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, key):
+        """Make later callers start a new call for key (e.g. after a write)"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+def _retrieve_exception(future):
+    # Mark the outcome retrieved even if every waiter was cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop.
+
+    Waiters await the shared call instead of holding a thread, and a waiter
+    being cancelled never cancels the call the others are waiting on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, func, *args):
+        """Return await func(*args), sharing the result with concurrent calls for key"""
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self.shared += 1
+        else:
+            future = self._calls[key] = asyncio.ensure_future(self._call(key, func, args))
+            future.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(future)
+
+    async def _call(self, key, func, args):
+        try:
+            return await func(*args)
+        finally:
+            if self._calls.get(key) is asyncio.current_task():
+                del self._calls[key]
+
+    def forget(self, key):
+        """Make later callers start a new call for key (e.g. after a write)"""
+        self._calls.pop(key, None)
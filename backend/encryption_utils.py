@@ -1,18 +1,12 @@
-import os
 import base64
 import secrets
+import threading
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import hashes, padding
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.backends import default_backend
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Get encryption key from environment or generate one
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
-if not ENCRYPTION_KEY:
-    raise ValueError("ENCRYPTION_KEY not found in environment variables")
+from metrics import timed
+from settings import get_settings
 
 # Derive AES key using HKDF
 
@@ -33,66 +27,248 @@ def derive_aes_key(master_key: bytes, salt: bytes = b"woosh-chat-salt", info: by
         algorithm=hashes.SHA256(),
         length=32,  # 256 bits
         salt=salt,
-        info=info,
-        backend=default_backend()
+        info=info
     )
     return hkdf.derive(master_key)
 
 
-# Derive the AES key from the master encryption key
-AES_KEY = derive_aes_key(ENCRYPTION_KEY.encode())
+# Versioned envelope: Base64(MAGIC || VERSION || nonce || ciphertext || tag).
+# Ciphertexts without the header are legacy Base64(IV || CBC ciphertext).
+ENVELOPE_MAGIC = b"AE"
+ENVELOPE_VERSION_GCM = 1
+GCM_HEADER = ENVELOPE_MAGIC + bytes([ENVELOPE_VERSION_GCM])
+GCM_NONCE_SIZE = 12
 
 
-def encrypt_message(plaintext: str) -> str:
+class AESCipher:
     """
-    Encrypt a message using AES-256-CBC.
+    Reusable AES-256-GCM context with read support for legacy AES-256-CBC.
 
-    Flow:
-    1. Generate random 16-byte IV
-    2. Apply PKCS7 padding to plaintext
-    3. Encrypt using AES-256-CBC
-    4. Prepend IV to ciphertext
-    5. Base64 encode the result
+    The AEAD, AES algorithm and PKCS7 padding objects are built once and
+    shared by every call. The batch methods also draw all nonces with a
+    single CSPRNG call.
 
     Args:
-        plaintext: Plain text message to encrypt
+        key: 32-byte AES-GCM key used for new ciphertexts
+        legacy_key: 32-byte AES-CBC key for reading legacy ciphertexts
+            (defaults to key)
+    """
+
+    def __init__(self, key: bytes, legacy_key: bytes = None):
+        # Imported here: the AEAD module loads the OpenSSL backend, which is
+        # a large share of the module's import time
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self._aead = AESGCM(key)
+        self._legacy_algorithm = algorithms.AES(legacy_key or key)
+        self._padding = padding.PKCS7(128)
+
+    def _encrypt(self, plaintext: str, nonce: bytes) -> str:
+        ciphertext = self._aead.encrypt(nonce, plaintext.encode('utf-8'), GCM_HEADER)
+        return base64.b64encode(GCM_HEADER + nonce + ciphertext).decode('utf-8')
+
+    def encrypt(self, plaintext: str) -> str:
+        """
+        Encrypt a message using AES-256-GCM.
+
+        Flow:
+        1. Generate random 12-byte nonce
+        2. Encrypt and authenticate using AES-256-GCM (header as associated data)
+        3. Prepend envelope header and nonce to ciphertext and tag
+        4. Base64 encode the result
+
+        Args:
+            plaintext: Plain text message to encrypt
+
+        Returns:
+            Base64 encoded string: Base64(header || nonce || ciphertext || tag)
+        """
+        return self._encrypt(plaintext, secrets.token_bytes(GCM_NONCE_SIZE))
+
+    def decrypt(self, encrypted_message: str) -> str:
+        """
+        Decrypt a message in either envelope format.
+
+        Flow:
+        1. Base64 decode the message
+        2. If it starts with the GCM header, split nonce and ciphertext and
+           decrypt with AES-256-GCM (which also verifies the tag)
+        3. Otherwise treat it as legacy IV || AES-256-CBC ciphertext
+        4. Decode to UTF-8 string
+
+        Args:
+            encrypted_message: Base64 encoded encrypted message
+
+        Returns:
+            Decrypted plaintext string
+        """
+        encrypted_data = base64.b64decode(encrypted_message)
+
+        if encrypted_data.startswith(GCM_HEADER):
+            header_size = len(GCM_HEADER)
+            nonce = encrypted_data[header_size:header_size + GCM_NONCE_SIZE]
+            ciphertext = encrypted_data[header_size + GCM_NONCE_SIZE:]
+            try:
+                return self._aead.decrypt(nonce, ciphertext, GCM_HEADER).decode('utf-8')
+            except InvalidTag:
+                # A legacy random IV can start with the header bytes by chance
+                if len(encrypted_data) % 16:
+                    raise
+
+        return self._decrypt_cbc(encrypted_data)
+
+    def _decrypt_cbc(self, encrypted_data: bytes) -> str:
+        iv = encrypted_data[:16]
+        ciphertext = encrypted_data[16:]
+
+        decryptor = Cipher(self._legacy_algorithm, modes.CBC(iv)).decryptor()
+        padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+
+        unpadder = self._padding.unpadder()
+        plaintext = unpadder.update(padded_plaintext) + unpadder.finalize()
+        return plaintext.decode('utf-8')
+
+    def needs_reencryption(self, encrypted_message: str) -> bool:
+        """
+        Check whether a ciphertext is in an outdated envelope format.
+
+        Args:
+            encrypted_message: Base64 encoded encrypted message
+
+        Returns:
+            True if the message should be re-encrypted with encrypt()
+        """
+        header = base64.b64decode(encrypted_message[:4])
+        return not header.startswith(GCM_HEADER)
+
+    def encrypt_many(self, plaintexts: list) -> list:
+        """
+        Encrypt a list of messages in one call.
+
+        Args:
+            plaintexts: Plain text messages to encrypt
+
+        Returns:
+            Encrypted messages, in the same order
+        """
+        nonces = secrets.token_bytes(GCM_NONCE_SIZE * len(plaintexts))
+        return [self._encrypt(plaintext, nonces[i * GCM_NONCE_SIZE:(i + 1) * GCM_NONCE_SIZE])
+                for i, plaintext in enumerate(plaintexts)]
+
+    def decrypt_many(self, encrypted_messages: list) -> list:
+        """
+        Decrypt a list of messages in one call.
+
+        Args:
+            encrypted_messages: Base64 encoded encrypted messages
+
+        Returns:
+            Decrypted plaintext strings, in the same order
+        """
+        return [self.decrypt(message) for message in encrypted_messages]
+
+
+# Context info for the application keys derived from ENCRYPTION_KEY
+KEY_INFO = {
+    "AES_KEY": b"aes-session-key",    # legacy CBC key, read-only
+    "AES_GCM_KEY": b"aes-gcm-key-v1",
+    "TOKEN_SEAL_KEY": b"token-seal-key-v1",
+}
+
+_cipher = None
+_sealer = None
+_cipher_lock = threading.Lock()
+
+
+def _derive_key(name: str) -> bytes:
+    encryption_key = get_settings().encryption_key
+    if not encryption_key:
+        raise ValueError("ENCRYPTION_KEY not found in environment variables")
+    return derive_aes_key(encryption_key.encode(), info=KEY_INFO[name])
+
+
+def get_cipher() -> AESCipher:
+    """
+    Return the shared context for the application keys.
+
+    The keys are derived on first use, so importing this module does not
+    require ENCRYPTION_KEY. The legacy CBC key is only used to read records
+    written before the GCM envelope existed.
+
+    Raises:
+        ValueError: If ENCRYPTION_KEY is not set
+    """
+    global _cipher
+    if _cipher is None:
+        with _cipher_lock:
+            if _cipher is None:
+                _cipher = AESCipher(_derive_key("AES_GCM_KEY"), legacy_key=_derive_key("AES_KEY"))
+    return _cipher
+
+
+def _get_sealer():
+    global _sealer
+    if _sealer is None:
+        with _cipher_lock:
+            if _sealer is None:
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+                _sealer = AESGCM(_derive_key("TOKEN_SEAL_KEY"))
+    return _sealer
+
+
+def seal_claim(plaintext: str, subject: str) -> str:
+    """
+    Encrypt a value for a token claim with the server-only token key.
+
+    The subject (the token's user id) is bound as associated data, so a
+    sealed value cannot be moved into another user's token. Tokens are
+    readable by anyone holding them; only this server can open the value.
 
     Returns:
-        Base64 encoded string: Base64(IV || ciphertext)
+        URL-safe Base64(nonce || ciphertext || tag)
     """
-    # Generate random 16-byte IV
-    iv = secrets.token_bytes(16)
-
-    # Create cipher
-    cipher = Cipher(
-        algorithms.AES(AES_KEY),
-        modes.CBC(iv),
-        backend=default_backend()
-    )
-    encryptor = cipher.encryptor()
+    nonce = secrets.token_bytes(GCM_NONCE_SIZE)
+    sealed = _get_sealer().encrypt(nonce, plaintext.encode('utf-8'), subject.encode('utf-8'))
+    return base64.urlsafe_b64encode(nonce + sealed).decode('ascii')
 
-    # Apply PKCS7 padding (128-bit block size)
-    padder = padding.PKCS7(128).padder()
-    padded_data = padder.update(plaintext.encode('utf-8')) + padder.finalize()
 
-    # Encrypt
-    ciphertext = encryptor.update(padded_data) + encryptor.finalize()
+def open_claim(sealed: str, subject: str):
+    """Decrypt a seal_claim value, or return None if it is not valid for subject"""
+    try:
+        data = base64.urlsafe_b64decode(sealed)
+        return _get_sealer().decrypt(data[:GCM_NONCE_SIZE], data[GCM_NONCE_SIZE:],
+                                     subject.encode('utf-8')).decode('utf-8')
+    except (InvalidTag, ValueError, TypeError):
+        return None
 
-    # Prepend IV to ciphertext and Base64 encode
-    result = iv + ciphertext
-    return base64.b64encode(result).decode('utf-8')
 
+def __getattr__(name):
+    # Lazy module attributes for callers that import the keys or the shared
+    # context directly
+    if name == "cipher":
+        return get_cipher()
+    if name in KEY_INFO:
+        return _derive_key(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def decrypt_message(encrypted_message: str) -> str:
+
+@timed("aes.encrypt")
+def encrypt_message(plaintext: str) -> str:
+    """
+    Encrypt a message using AES-256-GCM with the application key.
+
+    Args:
+        plaintext: Plain text message to encrypt
+
+    Returns:
+        Base64 encoded versioned envelope
     """
-    Decrypt a message encrypted with AES-256-CBC.
+    return get_cipher().encrypt(plaintext)
 
-    Flow:
-    1. Base64 decode the message
-    2. Split IV (first 16 bytes) and ciphertext
-    3. Decrypt using AES-256-CBC
-    4. Remove PKCS7 padding
-    5. Decode to UTF-8 string
+
+@timed("aes.decrypt")
+def decrypt_message(encrypted_message: str) -> str:
+    """
+    Decrypt a message in the current GCM or legacy CBC format.
 
     Args:
         encrypted_message: Base64 encoded encrypted message
@@ -100,26 +276,19 @@ def decrypt_message(encrypted_message: str) -> str:
     Returns:
         Decrypted plaintext string
     """
-    # Base64 decode
-    encrypted_data = base64.b64decode(encrypted_message)
-
-    # Split IV and ciphertext
-    iv = encrypted_data[:16]
-    ciphertext = encrypted_data[16:]
-
-    # Create cipher
-    cipher = Cipher(
-        algorithms.AES(AES_KEY),
-        modes.CBC(iv),
-        backend=default_backend()
-    )
-    decryptor = cipher.decryptor()
+    return get_cipher().decrypt(encrypted_message)
+
+
+def needs_reencryption(encrypted_message: str) -> bool:
+    """Check whether a ciphertext should be upgraded to the current envelope"""
+    return get_cipher().needs_reencryption(encrypted_message)
+
 
-    # Decrypt
-    padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+def encrypt_many(plaintexts: list) -> list:
+    """Encrypt a list of messages with the application key"""
+    return get_cipher().encrypt_many(plaintexts)
 
-    # Remove PKCS7 padding
-    unpadder = padding.PKCS7(128).unpadder()
-    plaintext = unpadder.update(padded_plaintext) + unpadder.finalize()
 
-    return plaintext.decode('utf-8')
+def decrypt_many(encrypted_messages: list) -> list:
+    """Decrypt a list of messages with the application key"""
+    return get_cipher().decrypt_many(encrypted_messages)
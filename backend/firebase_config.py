@@ -1,28 +1,36 @@
-import os
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, db
+import threading
+from settings import get_settings
 
-load_dotenv()
+# The Firebase app is initialized on first use rather than at import, so
+# importing the backend (tests, CLI tools, other storage backends) never needs
+# credentials or pays for the SDK.
+_app = None
+_lock = threading.Lock()
 
-# Initialize Firebase using credentials from environment variables
-cred = credentials.Certificate({
-    "type": os.getenv("FIREBASE_TYPE"),
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace('\\n', '\n'),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-    "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL")
-})
 
-firebase_admin.initialize_app(cred, {
-    'databaseURL': os.getenv("FIREBASE_DATABASE_URL")
-})
+def get_app():
+    """Return the Firebase app, initializing it from the settings on first call"""
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                settings = get_settings()
+                missing = settings.missing_firebase_vars()
+                if missing:
+                    raise ValueError(
+                        f"Firebase is not configured; missing environment variables: {', '.join(missing)}")
+
+                import firebase_admin
+                from firebase_admin import credentials
+
+                # Initialize Firebase using credentials from environment variables
+                cred = credentials.Certificate(settings.firebase_credentials)
+                _app = firebase_admin.initialize_app(cred, {
+                    'databaseURL': settings.firebase_database_url
+                })
+    return _app
 
 
 def get_database():
-    return db.reference('/')
+    from firebase_admin import db
+    return db.reference('/', app=get_app())
@@ -1,31 +1,256 @@
-import os
+import re
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
 import jwt
+from jwt.algorithms import get_default_algorithms
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from cache import TTLCache
+from metrics import timed
+from settings import env, get_settings
+from sessions import revocations
+from encryption_utils import decrypt_message, seal_claim
 
-load_dotenv()
+# Lifetime of the access tokens issued by /login and /refresh. They carry
+# the profile and the sealed Aadhaar number, and /verify answers them
+# without a database read, so this bounds how stale a profile can be.
+ACCESS_TOKEN_TTL = int(env("ACCESS_TOKEN_TTL", "900"))
 
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Verified tokens, keyed by SHA-256 of the token, so a session re-checking
+# the same cookie skips signature verification. Entries never outlive the
+# token's exp; JWT_CACHE_TTL also bounds how long a token verified under a
+# since-removed key keeps being accepted. Set JWT_CACHE_SIZE=0 to disable.
+JWT_CACHE_SIZE = int(env("JWT_CACHE_SIZE", "10000"))
+JWT_CACHE_TTL = float(env("JWT_CACHE_TTL", "300"))
 
+token_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
 
-def create_jwt_token(user_id: str) -> str:
-    """Create JWT token with user_id that expires in 1 day"""
-    expiration = datetime.utcnow() + timedelta(days=1)
+_PEM_BLOCK = re.compile(r"-----BEGIN [A-Z ]+-----.+?-----END [A-Z ]+-----", re.S)
+
+# Members hashed for an RFC 7638 JWK thumbprint, by key type
+_THUMBPRINT_MEMBERS = {"EC": ("crv", "kty", "x", "y"), "OKP": ("crv", "kty", "x"), "RSA": ("e", "kty", "n")}
+
+
+def __getattr__(name):
+    # JWT_SECRET_KEY and JWT_ALGORITHM resolve from the settings on access
+    if name == "JWT_SECRET_KEY":
+        return get_settings().jwt_secret_key
+    if name == "JWT_ALGORITHM":
+        return get_settings().jwt_algorithm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def public_jwk(algorithm, public_key) -> dict:
+    """Public JWK for a key, with EC coordinates padded to the curve size (RFC 7518 6.2.1.2)"""
+    jwk = algorithm.to_jwk(public_key, as_dict=True)
+    if jwk["kty"] == "EC":
+        # PyJWT drops leading zero bytes, which PyJWK (and other verifiers) reject
+        size = (public_key.curve.key_size + 7) // 8
+        numbers = public_key.public_numbers()
+        jwk["x"] = _b64url(numbers.x.to_bytes(size, "big"))
+        jwk["y"] = _b64url(numbers.y.to_bytes(size, "big"))
+    return jwk
+
+
+def jwk_thumbprint(jwk: dict) -> str:
+    """RFC 7638 thumbprint of a public JWK, used as its key ID"""
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return _b64url(digest)
+
+
+class KeyRing:
+    """
+    Signing and verification keys for one algorithm, parsed and prepared once.
+
+    HMAC algorithms (the default HS256) sign and verify with the shared
+    secret. Asymmetric algorithms (EdDSA, ES256, RS256, ...) sign with the
+    private key and publish the public keys, each under a key ID (`kid`), so
+    other services can verify tokens locally from the JWKS.
+
+    Args:
+        algorithm: JWS algorithm name
+        secret: Shared secret for HMAC algorithms
+        private_key: PEM private key for asymmetric algorithms
+        public_keys: PEM public keys that are also accepted (key rotation)
+        key_id: kid for the signing key (default: its JWK thumbprint)
+    """
+
+    def __init__(self, algorithm: str, secret: str = None, private_key: str = None,
+                 public_keys: str = None, key_id: str = None):
+        algorithms = get_default_algorithms()
+        if algorithm not in algorithms or algorithm == "none":
+            raise ValueError(f"Unsupported JWT_ALGORITHM: {algorithm}")
+        self.algorithm = algorithm
+        self._alg = algorithms[algorithm]
+        self.verification_keys = {}
+        self.public_jwks = []
+
+        if algorithm.startswith("HS"):
+            if not secret:
+                raise ValueError("JWT_SECRET_KEY not found in environment variables")
+            self.key_id = key_id
+            self.signing_key = self._alg.prepare_key(secret)
+            self.verification_keys[key_id] = jwt.PyJWK(
+                {"kty": "oct", "k": base64.urlsafe_b64encode(self.signing_key).rstrip(b"=").decode()},
+                algorithm=algorithm)
+            return
+
+        if not private_key:
+            raise ValueError(f"JWT_PRIVATE_KEY is required for {algorithm}")
+        self.signing_key = self._alg.prepare_key(private_key)
+        self.key_id = self._add_public_key(self.signing_key.public_key(), key_id)
+        for pem in _PEM_BLOCK.findall(public_keys or ""):
+            self._add_public_key(self._alg.prepare_key(pem))
+
+    def _add_public_key(self, public_key, key_id: str = None) -> str:
+        jwk = public_jwk(self._alg, public_key)
+        key_id = key_id or jwk_thumbprint(jwk)
+        jwk.update({"kid": key_id, "alg": self.algorithm, "use": "sig"})
+        self.verification_keys[key_id] = jwt.PyJWK(jwk, algorithm=self.algorithm)
+        self.public_jwks.append(jwk)
+        return key_id
+
+    def sign(self, payload: dict) -> str:
+        headers = {"kid": self.key_id} if self.key_id else None
+        return jwt.encode(payload, self.signing_key, algorithm=self.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        """
+        Verify the signature and exp and return the payload.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired, signed
+                with another algorithm or by an unknown key
+        """
+        if len(self.verification_keys) == 1:
+            # One key (always the case for HMAC): no need to parse the header
+            # for a kid, a token from any other key fails the signature check
+            [key] = self.verification_keys.values()
+        else:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.verification_keys.get(kid)
+            if key is None:
+                raise jwt.InvalidTokenError(f"Unknown key id: {kid}")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict:
+        """Public keys as a JWK Set (empty for HMAC algorithms)"""
+        return {"keys": list(self.public_jwks)}
+
+
+_keyring = None
+_keyring_lock = threading.Lock()
+
+
+def get_keyring() -> KeyRing:
+    """Return the process key ring, built from the settings on first use"""
+    global _keyring
+    if _keyring is None:
+        with _keyring_lock:
+            if _keyring is None:
+                settings = get_settings()
+                _keyring = KeyRing(settings.jwt_algorithm, secret=settings.jwt_secret_key,
+                                   private_key=settings.jwt_private_key,
+                                   public_keys=settings.jwt_public_keys, key_id=settings.jwt_key_id)
+    return _keyring
+
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+@timed("jwt.encode")
+def create_jwt_token(user_id: str, profile: dict = None, lifetime: timedelta = timedelta(days=1),
+                     claims: dict = None) -> str:
+    """Create JWT token with user_id (and optional profile claims) that expires in 1 day"""
+    expiration = datetime.utcnow() + lifetime
     payload = {
         "user_id": user_id,
-        "exp": expiration
+        "exp": expiration,
+        # Token id, so logout can revoke this token alone
+        "jti": secrets.token_urlsafe(16)
+    }
+    if profile is not None:
+        payload["profile"] = profile
+    if claims:
+        payload.update(claims)
+    return get_keyring().sign(payload)
+
+
+def create_access_token(user: dict, session_id: str) -> str:
+    """
+    Create a short-lived access token (ACCESS_TOKEN_TTL) for a refresh session.
+
+    `sid` ties the token to its session, so ending the session revokes every
+    access token issued under it. `aadhaar_seal` carries the Aadhaar number
+    encrypted under a server-only key, so /verify needs no user record.
+    """
+    claims = {
+        "typ": "access",
+        "sid": session_id,
+        "aadhaar_seal": seal_claim(decrypt_message(user['aadhaar']), user['auth_id']),
     }
-    token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
-    return token
+    return create_jwt_token(user['auth_id'], profile=profile_claims(user),
+                            lifetime=timedelta(seconds=ACCESS_TOKEN_TTL), claims=claims)
 
 
+@timed("jwt.decode")
 def verify_jwt_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
+    """
+    Verify JWT token and return payload (None if invalid or expired).
+
+    Repeat verifications of the same token are served from token_cache until
+    the token's exp; revoked tokens are rejected from memory either way.
+    """
+    if not token:
         return None
-    except jwt.InvalidTokenError:
+    digest = _token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = get_keyring().verify(token)
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+        if isinstance(payload.get('exp'), (int, float)):
+            token_cache.set(digest, payload, ttl=payload['exp'] - time.time())
+
+    # Checked on every call, cached or not: a logout revokes at once
+    if revocations.is_revoked(payload.get('jti')) or revocations.is_revoked(payload.get('sid')):
         return None
+    return dict(payload)
+
+
+def get_jwks() -> dict:
+    """Public verification keys as a JWK Set"""
+    return get_keyring().jwks()
+
+
+def get_token_cache_stats():
+    """Return hit/miss/eviction counters for the verified-token cache"""
+    return token_cache.stats()
+
+
+def profile_claims(user: dict) -> dict:
+    """
+    Build the profile claims embedded in stateless tokens.
+
+    Only non-sensitive fields go in, since tokens are signed, not encrypted,
+    and anyone holding one (or the JWKS) can read them: never the Aadhaar
+    number, not even its ciphertext, nor the password hash. `pv` is the
+    record's profile version, bumped on profile edits.
+    """
+    return {
+        "name": user['name'],
+        "email": user['email'],
+        "pv": user.get('profile_version', 1)
+    }
@@ -1,11 +1,50 @@
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api.signup import router as signup_router
 from api.login import router as login_router
 from api.verify import router as verify_router
 from api.logout import router as logout_router
+from api.refresh import router as refresh_router
+from api.metrics import router as metrics_router
+from api.admin import router as admin_router
+from api.jwks import router as jwks_router
+from metrics import MetricsMiddleware, METRICS_ENABLED
+import repository
+import storage
+import utils
+from encryption_utils import get_cipher
+from jwt_utils import get_keyring
+from sessions import revocations
+from password_utils import hashing_pool
 
-app = FastAPI(title="Authentication API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once in every worker process: configuration, keys and the storage
+    # client are built lazily, so warm them here instead of on the first request
+    storage.get_backend().connect()
+    get_cipher()
+    get_keyring()
+    # The email filter needs a full scan on a cold start; serve meanwhile
+    threading.Thread(target=utils.start_email_filter, name="email-filter", daemon=True).start()
+    revocations.start()
+    yield
+    revocations.stop()
+    # Graceful shutdown: let in-flight work finish, then release resources
+    hashing_pool.shutdown()
+    repository.shutdown()
+    if utils.email_filter is not None:
+        utils.email_filter.stop()
+        utils.email_filter.save()
+    storage.get_backend().close()
+
+
+# Responses are validated against each route's response_model, serialized
+# by pydantic-core and rendered with orjson, skipping jsonable_encoder
+app = FastAPI(title="Authentication API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -21,6 +60,14 @@ app.include_router(signup_router)
 app.include_router(login_router)
 app.include_router(verify_router)
 app.include_router(logout_router)
+app.include_router(refresh_router)
+app.include_router(admin_router)
+app.include_router(jwks_router)
+
+# Per-stage timing histograms on /metrics (and optional Server-Timing headers)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -29,5 +76,6 @@ def read_root():
 
 
 if __name__ == "__main__":
+    # Development server; use serve.py for production
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8002, reload=True)
@@ -0,0 +1,104 @@
+"""Maintenance commands for the authentication backend.
+
+Usage:
+    python manage.py backfill-email-index
+    python manage.py calibrate-argon2 [--target-ms 250] [--max-memory-mib 64]
+    python manage.py import-users users.ndjson|users.csv|- [--format csv] [--chunk-size 500]
+    python manage.py export-users [--output users.ndjson] [--decrypt]
+"""
+import sys
+import json
+import asyncio
+import argparse
+
+
+def backfill_email_index_command(args):
+    from utils import backfill_email_index
+
+    count = backfill_email_index()
+    print(f"Indexed {count} user email(s)")
+
+
+def calibrate_argon2_command(args):
+    from password_utils import calibrate_argon2
+
+    params = calibrate_argon2(target_ms=args.target_ms, max_memory_kib=args.max_memory_mib * 1024,
+                              parallelism=args.parallelism)
+    print(f"# Median hash time on this host: {params['measured_ms']} ms")
+    print(f"ARGON2_TIME_COST={params['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={params['memory_cost']}")
+    print(f"ARGON2_PARALLELISM={params['parallelism']}")
+
+
+def import_users_command(args):
+    from bulk_users import import_lines, IMPORT_CHUNK_SIZE
+    from password_utils import hashing_pool
+    import repository
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    try:
+        summary = asyncio.run(import_lines(source, fmt=fmt, chunk_size=args.chunk_size or IMPORT_CHUNK_SIZE))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        hashing_pool.shutdown()
+        repository.shutdown()
+
+    print(f"Created {summary['created']} user(s); skipped {summary['duplicates']} duplicate(s) "
+          f"and {summary['invalid']} invalid row(s) out of {summary['rows']}")
+    for error in summary["errors"]:
+        print(json.dumps(error), file=sys.stderr)
+
+
+def export_users_command(args):
+    from bulk_users import export_users
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    count = 0
+    try:
+        for line in export_users(decrypt=args.decrypt, batch_size=args.page_size):
+            output.write(line)
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Exported {count} user(s)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Authentication backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser(
+        "backfill-email-index", help="Build the email -> auth_id index for existing users")
+    backfill.set_defaults(func=backfill_email_index_command)
+
+    calibrate = subparsers.add_parser(
+        "calibrate-argon2", help="Pick Argon2 parameters for a target hashing latency on this host")
+    calibrate.add_argument("--target-ms", type=float, default=250)
+    calibrate.add_argument("--max-memory-mib", type=int, default=64)
+    calibrate.add_argument("--parallelism", type=int, default=None)
+    calibrate.set_defaults(func=calibrate_argon2_command)
+
+    import_users = subparsers.add_parser(
+        "import-users", help="Bulk-create users from an NDJSON or CSV file ('-' for stdin)")
+    import_users.add_argument("path")
+    import_users.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                              help="Defaults to csv for *.csv files, otherwise ndjson")
+    import_users.add_argument("--chunk-size", type=int, default=None)
+    import_users.set_defaults(func=import_users_command)
+
+    export = subparsers.add_parser(
+        "export-users", help="Stream every user as NDJSON (constant memory)")
+    export.add_argument("--output", default="-", help="File to write, '-' for stdout (default)")
+    export.add_argument("--decrypt", action="store_true", help="Include plaintext Aadhaar numbers")
+    export.add_argument("--page-size", type=int, default=1000)
+    export.set_defaults(func=export_users_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
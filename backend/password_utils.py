@@ -1,8 +1,31 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError, InvalidHashError
+from metrics import timed
+from settings import env
 
-# Initialize Argon2 PasswordHasher with secure defaults
-ph = PasswordHasher()
+# Argon2 cost parameters; defaults match argon2-cffi's. Pick host-appropriate
+# values with `python manage.py calibrate-argon2` and set them fleet-wide:
+# hashes made with other parameters are upgraded on the next login.
+ARGON2_TIME_COST = int(env("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(env("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(env("ARGON2_PARALLELISM", "4"))
+
+# Initialize Argon2 PasswordHasher with the configured parameters
+ph = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM
+)
+
+# Argon2 worker pool configuration. Each hash/verify holds ~64 MiB while it
+# runs, so the number of workers is also the cap on concurrent Argon2 memory.
+HASH_EXECUTOR = env("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(env("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 
 def hash_password(password: str) -> str:
@@ -34,3 +57,178 @@ def verify_password(hashed_password: str, password: str) -> bool:
         return True
     except (VerifyMismatchError, InvalidHashError):
         return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a hash was made with parameters other than the current ones.
+
+    Args:
+        hashed_password: A verified Argon2 hash
+
+    Returns:
+        True if the password should be hashed again with the current parameters
+    """
+    try:
+        return ph.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return False
+
+
+def _measure_ms(hasher: PasswordHasher, samples: int = 3) -> float:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate_argon2(target_ms: float = 250, max_memory_kib: int = 65536,
+                     parallelism: int = None, max_time_cost: int = 10) -> dict:
+    """
+    Find Argon2 parameters that hash in about target_ms on this host.
+
+    Memory is the strongest defence against GPU cracking, so the full memory
+    budget is used first and time_cost is raised until the target is met.
+    If even one pass is too slow, memory is halved (down to 8 MiB) instead.
+
+    Args:
+        target_ms: Desired median hashing latency in milliseconds
+        max_memory_kib: Memory budget per hash in KiB
+        parallelism: Lanes to use (defaults to the CPU count, capped at 4)
+        max_time_cost: Upper bound for the number of passes
+
+    Returns:
+        Dict with time_cost, memory_cost, parallelism and measured_ms
+    """
+    parallelism = parallelism or min(4, os.cpu_count() or 1)
+    memory_cost = max_memory_kib
+    min_memory_kib = 8192
+
+    def measure(time_cost, memory_cost):
+        hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost,
+                                parallelism=parallelism)
+        return _measure_ms(hasher)
+
+    measured = measure(1, memory_cost)
+    while measured > target_ms and memory_cost // 2 >= min_memory_kib:
+        memory_cost //= 2
+        measured = measure(1, memory_cost)
+
+    time_cost = 1
+    while measured < target_ms and time_cost < max_time_cost:
+        candidate = measure(time_cost + 1, memory_cost)
+        if candidate > target_ms * 1.25:
+            break
+        time_cost += 1
+        measured = candidate
+
+    return {
+        "time_cost": time_cost,
+        "memory_cost": memory_cost,
+        "parallelism": parallelism,
+        "measured_ms": round(measured, 1)
+    }
+
+
+class HashingPool:
+    """
+    Bounded executor for Argon2 work, tracking queue depth.
+
+    Args:
+        workers: Maximum number of concurrent Argon2 operations
+        kind: "thread" (argon2-cffi releases the GIL) or "process"
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, kind: str = HASH_EXECUTOR):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported HASH_EXECUTOR: {kind}")
+        self.workers = max(1, workers)
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # Imported on demand: it pulls in multiprocessing
+                        from concurrent.futures import ProcessPoolExecutor
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="argon2")
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run func(*args) on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of pool metrics.
+
+        The executor runs at most `workers` calls at once and queues the rest
+        in FIFO order, so anything in flight beyond that is waiting.
+        """
+        with self._lock:
+            in_flight = self._in_flight
+            completed = self._completed
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "running": min(in_flight, self.workers),
+            "queued": max(0, in_flight - self.workers),
+            "completed": completed,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the underlying executor (it is recreated on next use)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+hashing_pool = HashingPool()
+
+
+@timed("argon2.hash")
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password on the Argon2 worker pool without blocking the event loop.
+
+    Args:
+        password: Plain text password to hash
+
+    Returns:
+        Hashed password with embedded salt
+    """
+    return await hashing_pool.run(hash_password, password)
+
+
+@timed("argon2.verify")
+async def verify_password_async(hashed_password: str, password: str) -> bool:
+    """
+    Verify a password on the Argon2 worker pool without blocking the event loop.
+
+    Args:
+        hashed_password: The Argon2 hash to verify against
+        password: Plain text password to verify
+
+    Returns:
+        True if password matches, False otherwise
+    """
+    return await hashing_pool.run(verify_password, hashed_password, password)
@@ -0,0 +1,246 @@
+"""
+Login rate limiting, applied before any database or Argon2 work.
+
+Two limiter types are available, selected by RATE_LIMIT_BACKEND:
+
+    memory  Token buckets held in this process (default)
+    sqlite  Sliding-window counters in a SQLite file shared by every worker
+            on the host (point RATE_LIMIT_DB at /dev/shm for a RAM-backed file)
+
+Limits are "<attempts>/<seconds>" strings, applied separately per client IP
+and per normalized email.
+"""
+import time
+import math
+import sqlite3
+import threading
+from collections import OrderedDict
+from settings import env
+
+RATE_LIMIT_ENABLED = env("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = env("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB = env("RATE_LIMIT_DB", "/dev/shm/auth-rate-limit.db")
+LOGIN_RATE_PER_IP = env("LOGIN_RATE_PER_IP", "30/60")
+LOGIN_RATE_PER_EMAIL = env("LOGIN_RATE_PER_EMAIL", "10/60")
+
+
+def parse_rate(rate: str):
+    """Parse "<attempts>/<seconds>" into (attempts, seconds)"""
+    attempts, seconds = rate.split("/")
+    return int(attempts), float(seconds)
+
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket per key.
+
+    Each key holds up to `capacity` tokens, refilled continuously over
+    `period` seconds. Only the most recently used `max_keys` buckets are
+    kept, so memory stays bounded under a spray of distinct keys.
+    """
+
+    def __init__(self, capacity: int, period: float, max_keys: int = 100000,
+                 clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> float:
+        """
+        Take one token for key.
+
+        Returns:
+            0 if allowed, otherwise seconds until a token is available
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens >= 1:
+                retry_after = 0.0
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self.refill_rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def reset(self):
+        """Forget every bucket"""
+        with self._lock:
+            self._buckets.clear()
+
+
+class MemoryWindowStore:
+    """Per-process fixed-window counters for SlidingWindowLimiter"""
+
+    def __init__(self):
+        self._counts = {}
+        # Counter keys grouped by the time they stop mattering, so expired
+        # counters of every key are dropped without scanning the rest
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def increment(self, key: str, window: int, period: float):
+        """Count a hit in window; return (current_count, previous_count)"""
+        with self._lock:
+            current = self._counts.get((key, window), 0) + 1
+            self._counts[(key, window)] = current
+            if current == 1:
+                self._expiry.setdefault((window + 2) * period, []).append((key, window))
+            previous = self._counts.get((key, window - 1), 0)
+            self._purge(window * period)
+        return current, previous
+
+    def _purge(self, horizon: float):
+        for expires in [t for t in self._expiry if t <= horizon]:
+            for stale in self._expiry.pop(expires):
+                self._counts.pop(stale, None)
+
+    def reset(self):
+        """Drop every counter"""
+        with self._lock:
+            self._counts.clear()
+            self._expiry.clear()
+
+
+class SQLiteWindowStore:
+    """
+    Fixed-window counters in a SQLite file shared across worker processes.
+
+    Args:
+        path: Database file; use a tmpfs path such as /dev/shm for speed
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False,
+                                     isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_windows ("
+                " key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL,"
+                " expires REAL NOT NULL, PRIMARY KEY (key, window)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS rate_windows_expires ON rate_windows (expires)")
+
+    def increment(self, key: str, window: int, period: float):
+        """Count a hit in window; return (current_count, previous_count)"""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO rate_windows (key, window, count, expires) VALUES (?, ?, 1, ?)"
+                    " ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+                    (key, window, (window + 2) * period))
+                rows = dict(conn.execute(
+                    "SELECT window, count FROM rate_windows WHERE key = ? AND window >= ?",
+                    (key, window - 1)).fetchall())
+                # Expired counters of every key, not just this one; the index
+                # keeps this cheap when there is nothing to drop
+                conn.execute("DELETE FROM rate_windows WHERE expires <= ?", (window * period,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows.get(window, 0), rows.get(window - 1, 0)
+
+    def reset(self):
+        """Drop every counter"""
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_windows")
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window limiter over a shareable counter store.
+
+    Uses the two-window approximation: the previous window's count is
+    weighted by how much of it still overlaps the sliding window. A counter
+    expires once its window no longer overlaps, at (window + 2) * period,
+    so limiters with different periods can share one store.
+    """
+
+    def __init__(self, limit: int, period: float, store, clock=time.time):
+        self.limit = limit
+        self.period = period
+        self.store = store
+        self._clock = clock
+
+    def hit(self, key: str) -> float:
+        """
+        Record an attempt for key.
+
+        Returns:
+            0 if allowed, otherwise seconds until the window has room again
+        """
+        now = self._clock()
+        window = int(now // self.period)
+        current, previous = self.store.increment(key, window, self.period)
+        elapsed = (now % self.period) / self.period
+        estimated = current + previous * (1 - elapsed)
+        if estimated <= self.limit:
+            return 0.0
+        return max(1.0, math.ceil(self.period - now % self.period))
+
+    def reset(self):
+        """Drop every counter in the store"""
+        self.store.reset()
+
+
+def create_limiter(rate: str, backend: str = RATE_LIMIT_BACKEND, store=None):
+    """Create a limiter for a "<attempts>/<seconds>" rate"""
+    attempts, period = parse_rate(rate)
+    if backend == "memory":
+        return TokenBucketLimiter(attempts, period)
+    if backend == "sqlite":
+        return SlidingWindowLimiter(attempts, period, store or SQLiteWindowStore())
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+class LoginRateLimiter:
+    """Per-IP and per-email budgets for login attempts"""
+
+    def __init__(self, per_ip, per_email, enabled: bool = RATE_LIMIT_ENABLED):
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self.enabled = enabled
+
+    def check(self, ip: str, email: str) -> float:
+        """
+        Record a login attempt.
+
+        Returns:
+            0 if allowed, otherwise seconds the client should wait
+        """
+        if not self.enabled:
+            return 0.0
+        retry_after = self.per_ip.hit(f"ip:{ip}")
+        if retry_after:
+            return retry_after
+        return self.per_email.hit(f"email:{email}")
+
+    def reset(self):
+        """Clear both budgets"""
+        self.per_ip.reset()
+        self.per_email.reset()
+
+
+def _create_login_limiter():
+    # Both limiters share one store; their keys are prefixed by kind
+    store = SQLiteWindowStore() if RATE_LIMIT_BACKEND == "sqlite" else None
+    return LoginRateLimiter(
+        create_limiter(LOGIN_RATE_PER_IP, store=store),
+        create_limiter(LOGIN_RATE_PER_EMAIL, store=store),
+    )
+
+
+login_limiter = _create_login_limiter()
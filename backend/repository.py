@@ -0,0 +1,157 @@
+"""
+Async data access layer for request handlers.
+
+The Firebase Admin SDK only offers blocking calls, so each function here runs
+the matching `utils` function on a dedicated I/O thread pool and awaits it.
+Slow RTDB round-trips then overlap instead of stalling the event loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import utils
+from cache import AsyncSingleFlight
+import sessions
+from sessions import revocations
+from utils import EmailAlreadyExistsError
+from metrics import timed
+from rate_limit import login_limiter
+from settings import env
+
+# Database calls are network-bound, so the pool can be much larger than the
+# CPU count.
+DB_IO_WORKERS = int(env("DB_IO_WORKERS", "32"))
+
+_executor = None
+
+# Identical lookups from concurrent requests (parallel tabs, login retries)
+# await one shared read instead of each taking an I/O thread
+_user_lookups = AsyncSingleFlight()
+_email_lookups = AsyncSingleFlight()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_IO_WORKERS, thread_name_prefix="db-io")
+    return _executor
+
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), lambda: func(*args, **kwargs))
+
+
+def shutdown(wait=True):
+    """Shut down the I/O thread pool (it is recreated on next use)"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def get_coalesced_lookups():
+    """Return how many lookups shared an in-flight read instead of making their own"""
+    return _user_lookups.shared + _email_lookups.shared + utils.get_coalesced_lookups()
+
+
+async def generate_auth_id():
+    """Generate a unique auth ID (pure CPU, so no thread hop)"""
+    return utils.generate_auth_id()
+
+
+def _forget_email(email):
+    # Lookups already in flight may have missed the new user
+    email = utils.normalize_email(email)
+    _email_lookups.forget(("exists", email))
+    _email_lookups.forget(("user", email))
+
+
+@timed("db.email_exists")
+async def email_exists(email):
+    """Check if email already exists in database"""
+    return await _email_lookups.do(("exists", utils.normalize_email(email)), _run, utils.email_exists, email)
+
+
+@timed("db.get_user_by_email")
+async def get_user_by_email(email):
+    """Get user data by email"""
+    user = await _email_lookups.do(("user", utils.normalize_email(email)), _run, utils.get_user_by_email, email)
+    return dict(user) if user else None
+
+
+@timed("db.create_user")
+async def create_user(auth_id, name, email, aadhaar, password):
+    """Create a new user, raising EmailAlreadyExistsError if the email is taken"""
+    created = await _run(utils.create_user, auth_id=auth_id, name=name, email=email,
+                         aadhaar=aadhaar, password=password)
+    _forget_email(email)
+    return created
+
+
+@timed("db.create_users")
+async def create_users(records):
+    """Create many users in one batched write, returning the duplicate emails"""
+    duplicates = await _run(utils.create_users, records)
+    for record in records.values():
+        _forget_email(record['email'])
+    return duplicates
+
+
+@timed("db.update_user")
+async def update_user(auth_id, **fields):
+    """Update fields on an existing user"""
+    result = await _run(utils.update_user, auth_id, **fields)
+    _user_lookups.forget(auth_id)
+    return result
+
+
+@timed("db.get_user_by_auth_id")
+async def get_user_by_auth_id(auth_id):
+    """Get user data by auth_id, answering cache hits without a thread hop"""
+    user = utils.get_cached_user(auth_id)
+    if user is not None:
+        return user
+    user = await _user_lookups.do(auth_id, _run, utils.fetch_user_by_auth_id, auth_id)
+    return dict(user) if user else None
+
+
+@timed("db.get_users_by_auth_ids")
+async def get_users_by_auth_ids(auth_ids):
+    """Get many users by auth_id with one batched read for the cache misses"""
+    return await _run(utils.get_users_by_auth_ids, auth_ids)
+
+
+@timed("db.revoke_token")
+async def revoke_token(jti, exp):
+    """Revoke a token id until its exp, for every worker"""
+    return await _run(revocations.revoke, jti, exp)
+
+
+@timed("db.start_session")
+async def start_session(auth_id):
+    """Create a refresh session for auth_id"""
+    return await _run(sessions.start_session, auth_id)
+
+
+@timed("db.rotate_refresh_token")
+async def rotate_refresh_token(refresh_token):
+    """Redeem a refresh token, raising sessions.RefreshTokenError if it is not valid"""
+    return await _run(sessions.rotate_refresh_token, refresh_token)
+
+
+@timed("db.end_session")
+async def end_session(session_id, exp):
+    """End a refresh session and revoke its access tokens"""
+    return await _run(sessions.end_session, session_id, exp)
+
+
+@timed("db.end_session_for_token")
+async def end_session_for_token(refresh_token, exp):
+    """End the session a refresh token belongs to, if the token is valid"""
+    return await _run(sessions.end_session_for_token, refresh_token, exp)
+
+
+@timed("db.check_login_rate")
+async def check_login_rate(ip, email):
+    """Record a login attempt; returns 0 if allowed, else seconds to wait"""
+    # The SQLite store can wait on other workers' locks
+    return await _run(login_limiter.check, ip, email)
@@ -0,0 +1,71 @@
+"""
+Production server entry point.
+
+Runs the API in several uvicorn worker processes with uvloop and httptools,
+no auto-reloader, and tuned keep-alive/backlog settings:
+
+    python serve.py
+
+`python main.py` remains the single-process development server with reload.
+
+Each worker imports the app on its own, and the app's lifespan hook sets
+up storage (Firebase, if selected) and the crypto keys inside each worker,
+so no client connections are shared across a fork.
+"""
+import os
+import importlib.util
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options(env=os.environ) -> dict:
+    """
+    Build uvicorn.run() options from environment variables.
+
+    Variables:
+        HOST, PORT              Bind address (default 0.0.0.0:8002)
+        WEB_CONCURRENCY         Worker processes (default: one per CPU)
+        KEEP_ALIVE              Idle keep-alive timeout in seconds (default 5)
+        BACKLOG                 Listen backlog (default 2048)
+        GRACEFUL_TIMEOUT        Seconds to drain requests on shutdown (default 30)
+        FORWARDED_ALLOW_IPS     Proxies trusted for X-Forwarded-* (default 127.0.0.1)
+    """
+    return {
+        "host": env.get("HOST", "0.0.0.0"),
+        "port": int(env.get("PORT", "8002")),
+        "workers": int(env.get("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        "loop": "uvloop" if _available("uvloop") else "asyncio",
+        "http": "httptools" if _available("httptools") else "h11",
+        "reload": False,
+        "timeout_keep_alive": int(env.get("KEEP_ALIVE", "5")),
+        "backlog": int(env.get("BACKLOG", "2048")),
+        "timeout_graceful_shutdown": int(env.get("GRACEFUL_TIMEOUT", "30")),
+        "proxy_headers": True,
+        "forwarded_allow_ips": env.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "access_log": env.get("ACCESS_LOG", "false").lower() == "true",
+    }
+
+
+def hash_workers_per_process(workers: int) -> int:
+    """
+    Split the cores between worker processes for the Argon2 pools.
+
+    Every process gets its own hashing pool, so without this each of N
+    workers would run up to HASH_WORKERS concurrent 64 MiB hashes.
+    """
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def main():
+    import uvicorn
+
+    options = server_options()
+    # Workers inherit the environment, so this sizes every worker's pool
+    os.environ.setdefault("HASH_WORKERS", str(hash_workers_per_process(options["workers"])))
+    uvicorn.run("main:app", **options)
+
+
+if __name__ == "__main__":
+    main()
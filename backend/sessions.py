@@ -0,0 +1,279 @@
+"""
+Refresh sessions and token revocation.
+
+Login starts a refresh session and issues a short-lived access token under
+it; /refresh trades the session's refresh token for a new access token and
+a new refresh token. Refresh tokens are "<session id>.<secret>" and only
+the SHA-256 of the current secret is stored. Rotation is a compare-and-set
+on that hash, and presenting a rotated-out token (outside a short grace
+window for concurrent refreshes from several tabs) is treated as theft:
+the session is deleted and its access tokens are revoked.
+
+Revocation, so logout invalidates tokens before their exp:
+
+Every token carries a random `jti`. Logging out records (jti, exp) in the
+storage backend and in an in-memory RevocationSet, so verifying a token
+stays a dict lookup with no database I/O. Each worker polls the backend for
+revocations made by the others (REVOCATION_SYNC_INTERVAL, default 1s), and
+revocations are forgotten once their token has expired, so memory is
+bounded by the number of revoked tokens that are still live.
+"""
+import time
+import hashlib
+import logging
+import secrets
+import threading
+from dataclasses import dataclass
+from storage import get_backend
+from settings import env
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_INTERVAL = float(env("REVOCATION_SYNC_INTERVAL", "1"))
+
+# Expired revocations and sessions are deleted from the store this often
+# (by every worker)
+REVOCATION_PURGE_INTERVAL = 3600.0
+
+# A session lasts this long from login, however often it is refreshed
+REFRESH_TOKEN_TTL = float(env("REFRESH_TOKEN_TTL", "86400"))
+
+# Seconds a just-rotated refresh token is still accepted (without issuing a
+# new one), for tabs that refreshed concurrently
+REFRESH_REUSE_GRACE = float(env("REFRESH_REUSE_GRACE", "10"))
+
+
+class RefreshTokenError(Exception):
+    """Raised when a refresh token is malformed, unknown, expired or reused"""
+
+
+@dataclass(frozen=True)
+class Session:
+    """A refresh session, as returned by start_session and rotate_refresh_token"""
+
+    session_id: str
+    auth_id: str
+    exp: float
+    refresh_token: str = None
+
+
+class RevocationSet:
+    """
+    Revoked token ids that forget themselves when their token expires.
+
+    Entries are filed in time buckets by exp; sweep() drops whole buckets
+    once their time has passed, so neither lookups nor expiry scan the set.
+
+    Args:
+        bucket_seconds: Width of an expiry bucket
+        clock: Time function, injectable for tests
+    """
+
+    def __init__(self, bucket_seconds: float = 60.0, clock=time.time):
+        self.bucket_seconds = bucket_seconds
+        self._clock = clock
+        self._expiry = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, exp: float):
+        if exp <= self._clock():
+            return
+        bucket = int(exp // self.bucket_seconds)
+        with self._lock:
+            self._expiry[jti] = exp
+            self._buckets.setdefault(bucket, set()).add(jti)
+
+    def __contains__(self, jti) -> bool:
+        exp = self._expiry.get(jti)
+        return exp is not None and exp > self._clock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def sweep(self) -> int:
+        """Drop every bucket whose tokens have all expired, returning how many ids went"""
+        current = int(self._clock() // self.bucket_seconds)
+        removed = 0
+        with self._lock:
+            for bucket in [bucket for bucket in self._buckets if bucket < current]:
+                for jti in self._buckets.pop(bucket):
+                    # A re-revocation may have filed the id in a later bucket
+                    if int(self._expiry.get(jti, 0) // self.bucket_seconds) == bucket:
+                        del self._expiry[jti]
+                        removed += 1
+        return removed
+
+
+class TokenRevocations:
+    """
+    Revocations shared by every worker through the storage backend.
+
+    Args:
+        sync_interval: Seconds between polls for other workers' revocations
+        skew: Seconds re-read before the last poll, covering clock skew
+            between hosts
+        clock: Time function, injectable for tests
+    """
+
+    def __init__(self, sync_interval: float = REVOCATION_SYNC_INTERVAL, skew: float = 60.0,
+                 clock=time.time):
+        self.sync_interval = sync_interval
+        self.skew = skew
+        self._clock = clock
+        self._revoked = RevocationSet(clock=clock)
+        self._synced_at = None
+        self._purged_at = None
+        self._stop = threading.Event()
+        self.synced = False
+
+    def revoke(self, jti: str, exp: float):
+        """Revoke a token for every worker (this one at once, others on their next poll)"""
+        get_backend().revoke_token(jti, exp, self._clock())
+        self._revoked.add(jti, exp)
+
+    def is_revoked(self, jti) -> bool:
+        """Return True if the token id was revoked; memory only"""
+        return jti is not None and jti in self._revoked
+
+    def sync(self):
+        """Read revocations recorded since the last poll and drop expired ones"""
+        started = self._clock()
+        since = self._synced_at - self.skew if self._synced_at is not None else None
+        for jti, exp in get_backend().get_revoked_tokens(since):
+            self._revoked.add(jti, exp)
+        self._synced_at = started
+        self.synced = True
+        self._revoked.sweep()
+
+        if self._purged_at is None or started - self._purged_at >= REVOCATION_PURGE_INTERVAL:
+            self._purged_at = started
+            get_backend().purge_revoked_tokens(started)
+            get_backend().purge_sessions(started - REFRESH_TOKEN_TTL)
+
+    def start(self):
+        """Load the current revocations, then keep polling on a daemon thread"""
+        self._stop.clear()
+        try:
+            self.sync()
+        except Exception:
+            logger.warning("Could not load token revocations; retrying in the background", exc_info=True)
+        threading.Thread(target=self._run, name="token-revocations", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.warning("Could not sync token revocations", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "synced": self.synced,
+            "revoked": len(self._revoked),
+            "seconds_since_sync": self._clock() - self._synced_at if self._synced_at is not None else None,
+        }
+
+
+revocations = TokenRevocations()
+
+
+def _hash_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def start_session(auth_id: str, clock=time.time) -> Session:
+    """Create a refresh session for a user who just logged in"""
+    now = clock()
+    # Time-prefixed ids let backends purge expired sessions by key range
+    session_id = f"{int(now * 1000):013d}_{secrets.token_urlsafe(12)}"
+    secret = secrets.token_urlsafe(32)
+    exp = now + REFRESH_TOKEN_TTL
+    get_backend().create_session(session_id, {
+        "auth_id": auth_id,
+        "token_hash": _hash_secret(secret),
+        "previous_hash": None,
+        "rotated_at": now,
+        "created_at": now,
+        "exp": exp,
+    })
+    return Session(session_id, auth_id, exp, f"{session_id}.{secret}")
+
+
+def rotate_refresh_token(refresh_token: str, clock=time.time) -> Session:
+    """
+    Redeem a refresh token for its successor.
+
+    Returns:
+        The session, with the new refresh_token, or with refresh_token None
+        if another request rotated this token within REFRESH_REUSE_GRACE
+
+    Raises:
+        RefreshTokenError: If the token is invalid or expired, or was already
+            rotated (then the whole session is ended)
+    """
+    session_id, _, secret = (refresh_token or "").partition(".")
+    if not session_id or not secret:
+        raise RefreshTokenError("Malformed refresh token")
+
+    backend = get_backend()
+    now = clock()
+    presented = _hash_secret(secret)
+    record = backend.get_session(session_id)
+    if record is None or record['exp'] <= now:
+        raise RefreshTokenError("Unknown or expired refresh session")
+
+    if secrets.compare_digest(presented, record['token_hash']):
+        new_secret = secrets.token_urlsafe(32)
+        rotated = backend.rotate_session(session_id, presented, {
+            "token_hash": _hash_secret(new_secret),
+            "previous_hash": presented,
+            "rotated_at": now,
+        })
+        if rotated:
+            return Session(session_id, record['auth_id'], record['exp'], f"{session_id}.{new_secret}")
+        # Lost a race with a concurrent rotation of the same token
+        record = backend.get_session(session_id)
+        if record is None:
+            raise RefreshTokenError("Unknown or expired refresh session")
+
+    previous = record.get('previous_hash')
+    if previous and secrets.compare_digest(presented, previous) \
+            and now - record['rotated_at'] <= REFRESH_REUSE_GRACE:
+        return Session(session_id, record['auth_id'], record['exp'])
+
+    # No access token outlives its session
+    end_session(session_id, record['exp'])
+    logger.warning("Refresh token reuse detected; ended session %s", session_id)
+    raise RefreshTokenError("Refresh token was already used")
+
+
+def end_session(session_id: str, exp: float):
+    """
+    Delete a refresh session and revoke the access tokens issued under it.
+
+    Args:
+        exp: Time by which every access token of the session has expired
+    """
+    get_backend().delete_session(session_id)
+    # Access tokens carry the session id as `sid`
+    revocations.revoke(session_id, exp)
+
+
+def end_session_for_token(refresh_token: str, exp: float) -> bool:
+    """
+    End the session a refresh token belongs to, if the token is its current
+    (or just rotated) one; a guessed session id alone ends nothing.
+
+    Returns:
+        True if a session was ended
+    """
+    session_id, _, secret = (refresh_token or "").partition(".")
+    record = get_backend().get_session(session_id) if session_id and secret else None
+    if record is None or _hash_secret(secret) not in (record['token_hash'], record.get('previous_hash')):
+        return False
+    end_session(session_id, exp)
+    return True
@@ -0,0 +1,104 @@
+"""
+Process-wide configuration.
+
+Values are read from the environment after loading backend/.env (or the file
+named by ENV_FILE) once per process; variables already set in the environment
+win. Secrets and Firebase credentials are only collected when get_settings()
+is first called, so importing a module never fails on a missing variable: the
+error surfaces where the value is actually needed.
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+ENV_FILE = os.getenv("ENV_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+# Firebase service account fields and the variables they are read from
+FIREBASE_CREDENTIAL_VARS = {
+    "type": "FIREBASE_TYPE",
+    "project_id": "FIREBASE_PROJECT_ID",
+    "private_key_id": "FIREBASE_PRIVATE_KEY_ID",
+    "private_key": "FIREBASE_PRIVATE_KEY",
+    "client_email": "FIREBASE_CLIENT_EMAIL",
+    "client_id": "FIREBASE_CLIENT_ID",
+    "auth_uri": "FIREBASE_AUTH_URI",
+    "token_uri": "FIREBASE_TOKEN_URI",
+    "auth_provider_x509_cert_url": "FIREBASE_AUTH_PROVIDER_CERT_URL",
+    "client_x509_cert_url": "FIREBASE_CLIENT_CERT_URL",
+}
+# Fields a service account certificate cannot be built without
+REQUIRED_FIREBASE_FIELDS = ("type", "project_id", "private_key", "client_email", "token_uri")
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env():
+    """Load the .env file into os.environ, once per process"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            # python-dotenv is only imported when there is a file to read
+            if os.path.exists(ENV_FILE):
+                from dotenv import load_dotenv
+                load_dotenv(ENV_FILE)
+            _env_loaded = True
+
+
+def env(name: str, default: str = None) -> str:
+    """Return an environment variable, loading .env first"""
+    load_env()
+    return os.getenv(name, default)
+
+
+def _pem(value):
+    """Undo the \\n escaping used to keep PEM keys on one line in .env files"""
+    return value.replace('\\n', '\n') if value else value
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Secrets and service configuration, read once from the environment"""
+
+    encryption_key: str = None
+    jwt_secret_key: str = None
+    jwt_algorithm: str = "HS256"
+    jwt_private_key: str = None
+    jwt_public_keys: str = None
+    jwt_key_id: str = None
+    firebase_credentials: dict = field(default_factory=dict)
+    firebase_database_url: str = None
+    admin_token: str = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        credentials = {key: env(var) for key, var in FIREBASE_CREDENTIAL_VARS.items()}
+        credentials["private_key"] = _pem(credentials["private_key"])
+        return cls(
+            encryption_key=env("ENCRYPTION_KEY"),
+            jwt_secret_key=env("JWT_SECRET_KEY"),
+            jwt_algorithm=env("JWT_ALGORITHM", "HS256"),
+            jwt_private_key=_pem(env("JWT_PRIVATE_KEY")),
+            jwt_public_keys=_pem(env("JWT_PUBLIC_KEYS")),
+            jwt_key_id=env("JWT_KEY_ID"),
+            firebase_credentials=credentials,
+            firebase_database_url=env("FIREBASE_DATABASE_URL"),
+            admin_token=env("ADMIN_TOKEN"),
+        )
+
+    def missing_firebase_vars(self) -> list:
+        """Return the names of required Firebase variables that are unset"""
+        missing = [FIREBASE_CREDENTIAL_VARS[key] for key in REQUIRED_FIREBASE_FIELDS
+                   if not self.firebase_credentials.get(key)]
+        if not self.firebase_database_url:
+            missing.append("FIREBASE_DATABASE_URL")
+        return missing
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Return the process settings, reading the environment on first call"""
+    return Settings.from_env()
@@ -0,0 +1,65 @@
+"""
+Pluggable user storage.
+
+The backend is chosen with the STORAGE_BACKEND environment variable:
+
+    firebase  Firebase Realtime Database (default)
+    sqlite    Local SQLite file at SQLITE_PATH, indexed on email
+    memory    Process-local dictionaries, for tests and load testing
+
+With STORAGE_REPLICA=true the firebase backend is wrapped in a
+ReplicatedBackend that serves reads from an in-process copy kept in sync by
+the realtime change stream.
+
+Backends are imported lazily so that selecting sqlite or memory never
+initializes Firebase.
+"""
+import threading
+from settings import env
+from storage.base import StorageBackend, EmailAlreadyExistsError, ITER_PAGE_SIZE
+
+STORAGE_BACKEND = env("STORAGE_BACKEND", "firebase")
+SQLITE_PATH = env("SQLITE_PATH", "auth.db")
+STORAGE_REPLICA = env("STORAGE_REPLICA", "false").lower() == "true"
+STORAGE_REPLICA_MAX_STALENESS = float(env("STORAGE_REPLICA_MAX_STALENESS", "60"))
+
+_backend = None
+_lock = threading.Lock()
+
+
+def create_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """Construct a storage backend by name"""
+    if name == "firebase":
+        from storage.firebase import (FirebaseBackend, EMAIL_INDEX_NODE, REVOKED_TOKENS_NODE, SESSIONS_NODE,
+                                      HEARTBEAT_NODE)
+        if STORAGE_REPLICA:
+            from storage.replica import ReplicatedBackend
+            return ReplicatedBackend(FirebaseBackend(),
+                                     skip_keys=[EMAIL_INDEX_NODE, REVOKED_TOKENS_NODE, SESSIONS_NODE,
+                                                HEARTBEAT_NODE],
+                                     max_staleness=STORAGE_REPLICA_MAX_STALENESS)
+        return FirebaseBackend()
+    if name == "sqlite":
+        from storage.sqlite import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    if name == "memory":
+        from storage.memory import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+
+
+def get_backend() -> StorageBackend:
+    """Return the configured backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend: StorageBackend):
+    """Replace the active backend (used by tests and benchmarks)"""
+    global _backend
+    with _lock:
+        _backend = backend
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+
+# Users fetched per round-trip when a backend scans all records
+ITER_PAGE_SIZE = 1000
+
+
+class EmailAlreadyExistsError(Exception):
+    """Raised by create_user when the email is already registered"""
+
+
+class StorageBackend(ABC):
+    """
+    Interface every user store implements.
+
+    Records are plain dicts ({name, email, aadhaar, password}) keyed by
+    auth_id. Emails passed to the backend are already normalized by the
+    caller, and every backend keeps an email -> auth_id index so lookups by
+    email never scan all users.
+    """
+
+    @abstractmethod
+    def get_user(self, auth_id: str):
+        """Return the stored record for auth_id, or None"""
+
+    @abstractmethod
+    def get_auth_id_by_email(self, email: str):
+        """Return the auth_id indexed under a normalized email, or None"""
+
+    @abstractmethod
+    def create_user(self, auth_id: str, record: dict, email: str):
+        """
+        Atomically reserve the normalized email and store record under auth_id.
+
+        Raises:
+            EmailAlreadyExistsError: If another user already holds the email
+        """
+
+    @abstractmethod
+    def update_user(self, auth_id: str, fields: dict):
+        """Merge fields into the existing record for auth_id (never the email)"""
+
+    def get_users(self, auth_ids) -> dict:
+        """Return {auth_id: record} for the given auth_ids that exist"""
+        users = {}
+        for auth_id in auth_ids:
+            record = self.get_user(auth_id)
+            if record is not None:
+                users[auth_id] = record
+        return users
+
+    def create_users(self, users) -> list:
+        """
+        Create many users at once.
+
+        Args:
+            users: (auth_id, record, normalized email) tuples
+
+        Returns:
+            Emails that were already registered; those users are skipped
+        """
+        duplicates = []
+        for auth_id, record, email in users:
+            try:
+                self.create_user(auth_id, record, email)
+            except EmailAlreadyExistsError:
+                duplicates.append(email)
+        return duplicates
+
+    @abstractmethod
+    def iter_users(self, page_size: int = ITER_PAGE_SIZE, start_at: str = None, end_at: str = None):
+        """
+        Yield (auth_id, record) pairs for every stored user, in auth_id order.
+
+        Backends read the records in pages of page_size, so a full scan uses
+        constant memory. With start_at / end_at, only auth_ids in that
+        inclusive range are read.
+        """
+
+    @abstractmethod
+    def revoke_token(self, jti: str, exp: float, revoked_at: float):
+        """Record that the token with this jti (valid until exp) was revoked at revoked_at"""
+
+    @abstractmethod
+    def get_revoked_tokens(self, since: float = None) -> list:
+        """
+        Return (jti, exp) for tokens revoked at or after since (all if None).
+
+        Backends keep revocations ordered by revocation time, so polling
+        with a recent since only reads the new entries.
+        """
+
+    @abstractmethod
+    def purge_revoked_tokens(self, now: float) -> int:
+        """Delete revocations of tokens that expired by now, returning how many"""
+
+    @abstractmethod
+    def create_session(self, session_id: str, record: dict):
+        """Store a refresh session ({auth_id, token_hash, exp, created_at, ...})"""
+
+    @abstractmethod
+    def get_session(self, session_id: str):
+        """Return the refresh session record, or None"""
+
+    @abstractmethod
+    def rotate_session(self, session_id: str, expected_hash: str, fields: dict) -> bool:
+        """
+        Merge fields into the session only if its token_hash is still
+        expected_hash (compare-and-set), so of two concurrent rotations of one
+        refresh token exactly one succeeds.
+
+        Returns:
+            True if the session was updated
+        """
+
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        """Delete a refresh session if it exists"""
+
+    @abstractmethod
+    def purge_sessions(self, created_before: float) -> int:
+        """Delete sessions created before the given time, returning how many"""
+
+    def rebuild_email_index(self) -> int:
+        """
+        Rebuild the email index from the stored records.
+
+        Backends whose index is maintained by the store itself have nothing
+        to rebuild and just report the number of users.
+
+        Returns:
+            Number of indexed users
+        """
+        return sum(1 for _ in self.iter_users())
+
+    def connect(self):
+        """Open connections ahead of the first request (optional)"""
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+    def stats(self):
+        """Backend-specific state for /metrics, or None"""
+        return None
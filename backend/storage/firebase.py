@@ -0,0 +1,284 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from firebase_config import get_app, get_database
+from storage.base import StorageBackend, EmailAlreadyExistsError, ITER_PAGE_SIZE
+
+# Secondary index node mapping hashed, normalized emails to auth IDs.
+# Stored next to the user records so email lookups are a single keyed read.
+EMAIL_INDEX_NODE = "email_index"
+
+# Revoked token ids, keyed "<revocation time in ms, 13 digits>_<jti>" so
+# polling for new revocations is a key range query. '~' sorts after every
+# alphanumeric auth id.
+REVOKED_TOKENS_NODE = "~revoked_tokens"
+
+# Refresh sessions by session id. Session ids start with their creation time
+# (13 digits of ms), so expired sessions can be purged with a key range.
+SESSIONS_NODE = "~sessions"
+
+# Time of the latest replica heartbeat. Every write reaches every replica's
+# change stream, which is how replicas tell a quiet stream from a dead one.
+HEARTBEAT_NODE = "~heartbeat"
+
+# Key bounds just below and just above the email index node, and the last
+# possible auth id. Auth ids are alphanumeric, so paging these two ranges
+# visits every user and never downloads the index, revocation or session
+# subtrees.
+KEYS_BELOW_INDEX = EMAIL_INDEX_NODE[:-1] + chr(ord(EMAIL_INDEX_NODE[-1]) - 1) + "\uf8ff"
+KEYS_ABOVE_INDEX = EMAIL_INDEX_NODE + "0"
+KEYS_END = "z\uf8ff"
+
+# RTDB has no multi-key read or conditional multi-path write, so the batch
+# methods overlap this many single-key round-trips
+BATCH_WORKERS = 16
+
+
+def time_key(timestamp, suffix=""):
+    """Return a key that sorts by timestamp (13 digits of ms), or just the bound without suffix"""
+    return f"{int(timestamp * 1000):013d}_{suffix}" if suffix else f"{int(timestamp * 1000):013d}"
+
+
+def email_index_key(email):
+    """Return the email index key (SHA-256 of the normalized email).
+
+    RTDB keys cannot contain '.', so the email is hashed rather than stored
+    verbatim as a key.
+    """
+    return hashlib.sha256(email.encode('utf-8')).hexdigest()
+
+
+class FirebaseBackend(StorageBackend):
+    """Users stored at the root of the Firebase Realtime Database"""
+
+    def connect(self):
+        get_app()
+
+    def get_user(self, auth_id):
+        db = get_database()
+        return db.child(auth_id).get() or None
+
+    def get_auth_id_by_email(self, email):
+        db = get_database()
+        return db.child(EMAIL_INDEX_NODE).child(email_index_key(email)).get()
+
+    def create_user(self, auth_id, record, email):
+        """
+        Reserve the email with a transaction on its index entry, then write
+        the record. The transaction is a compare-and-set, so of several
+        concurrent signups for one email exactly one wins; if the record write
+        fails the reservation is released again.
+
+        An index entry whose user record does not exist was left by a signup
+        that died between the two writes, and is reclaimed. A live signup's
+        entry has no record either until its write lands, so after writing,
+        the signup checks its entry is still its own and backs out if not.
+        """
+        db = get_database()
+        self._reserve_email(db, auth_id, email)
+        try:
+            db.child(auth_id).set(record)
+        except Exception:
+            self._release_email(db, auth_id, email)
+            raise
+        if not self._holds_email(db, auth_id, email):
+            db.child(auth_id).delete()
+            raise EmailAlreadyExistsError(email)
+
+    def _reserve_email(self, db, auth_id, email):
+        def reserve(current):
+            if current is not None and current != auth_id and db.child(current).get(shallow=True):
+                raise EmailAlreadyExistsError(email)
+            return auth_id
+
+        db.child(EMAIL_INDEX_NODE).child(email_index_key(email)).transaction(reserve)
+
+    def _holds_email(self, db, auth_id, email):
+        return db.child(EMAIL_INDEX_NODE).child(email_index_key(email)).get() == auth_id
+
+    def _release_email(self, db, auth_id, email):
+        # Only if still ours: the entry may have been reclaimed meanwhile
+        db.child(EMAIL_INDEX_NODE).child(email_index_key(email)).transaction(
+            lambda current: None if current == auth_id else current)
+
+    def get_users(self, auth_ids):
+        auth_ids = list(dict.fromkeys(auth_ids))
+        if not auth_ids:
+            return {}
+        db = get_database()
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(auth_ids))) as pool:
+            records = list(pool.map(lambda auth_id: db.child(auth_id).get(), auth_ids))
+        return {auth_id: record for auth_id, record in zip(auth_ids, records) if record}
+
+    def create_users(self, users):
+        """
+        Reserve every email with its own transaction (run concurrently), then
+        write all reserved records in one multi-path update. Uniqueness holds
+        against concurrent signups exactly as in create_user, including the
+        reclaiming of entries without a record; if a reservation or the write
+        fails, the batch's reservations are released.
+        """
+        users = list(users)
+        if not users:
+            return []
+        db = get_database()
+
+        def reserve(user):
+            auth_id, _, email = user
+            try:
+                self._reserve_email(db, auth_id, email)
+                return True
+            except EmailAlreadyExistsError:
+                return False
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(users))) as pool:
+            results = list(pool.map(reserve, users))
+
+            reserved = [user for user, result in zip(users, results) if result is True]
+            duplicates = [user[2] for user, result in zip(users, results) if result is False]
+            errors = [result for result in results if isinstance(result, Exception)]
+            try:
+                if errors:
+                    raise errors[0]
+                if reserved:
+                    db.update({auth_id: record for auth_id, record, _ in reserved})
+            except Exception:
+                list(pool.map(lambda user: self._release_email(db, user[0], user[2]), reserved))
+                raise
+
+            held = list(pool.map(lambda user: self._holds_email(db, user[0], user[2]), reserved))
+        lost = [user for user, holds in zip(reserved, held) if not holds]
+        if lost:
+            db.update({auth_id: None for auth_id, _, _ in lost})
+            duplicates.extend(email for _, _, email in lost)
+        return duplicates
+
+    def update_user(self, auth_id, fields):
+        db = get_database()
+        db.child(auth_id).update(fields)
+
+    def listen(self, callback):
+        """
+        Stream realtime change events for the whole database to callback.
+
+        Returns:
+            The SDK's ListenerRegistration (close() stops the stream)
+        """
+        return get_database().listen(callback)
+
+    def heartbeat(self, now):
+        """Write the heartbeat node, producing an event on every listener"""
+        get_database().child(HEARTBEAT_NODE).set(now)
+
+    def iter_users(self, page_size: int = ITER_PAGE_SIZE, start_at: str = None, end_at: str = None):
+        """
+        Yield users one key-ordered page at a time (order_by_key with
+        start_at/limit_to_first), so memory stays bounded by page_size no
+        matter how many users are stored.
+        """
+        if start_at is None or start_at <= KEYS_BELOW_INDEX:
+            end = min(end_at, KEYS_BELOW_INDEX) if end_at is not None else KEYS_BELOW_INDEX
+            yield from self._iter_key_range(start_at, end, page_size)
+        if end_at is None or end_at >= KEYS_ABOVE_INDEX:
+            end = min(end_at, KEYS_END) if end_at is not None else KEYS_END
+            yield from self._iter_key_range(max(start_at or "", KEYS_ABOVE_INDEX), end, page_size)
+
+    def _iter_key_range(self, start, end, page_size):
+        db = get_database()
+        cursor = start
+        last_key = None
+        while True:
+            query = db.order_by_key()
+            if cursor is not None:
+                query = query.start_at(cursor)
+            if end is not None:
+                query = query.end_at(end)
+            # start_at is inclusive: after the first page, fetch one extra
+            # row and drop the previous page's last key
+            limit = page_size + (1 if last_key is not None else 0)
+            page = query.limit_to_first(limit).get() or {}
+
+            for auth_id, user_data in page.items():
+                if auth_id != last_key and isinstance(user_data, dict):
+                    yield auth_id, user_data
+
+            if len(page) < limit:
+                return
+            cursor = last_key = next(reversed(page))
+
+    def revoke_token(self, jti, exp, revoked_at):
+        db = get_database()
+        db.child(REVOKED_TOKENS_NODE).child(time_key(revoked_at, jti)).set(exp)
+
+    def get_revoked_tokens(self, since=None):
+        query = get_database().child(REVOKED_TOKENS_NODE).order_by_key()
+        if since is not None:
+            query = query.start_at(time_key(since))
+        entries = query.get() or {}
+        return [(key.split("_", 1)[1], exp) for key, exp in entries.items()]
+
+    def purge_revoked_tokens(self, now):
+        # Revocations are only needed until their token expires; the node is
+        # bounded by the number of live revoked tokens, so read it whole
+        db = get_database()
+        entries = db.child(REVOKED_TOKENS_NODE).get() or {}
+        expired = {f"{REVOKED_TOKENS_NODE}/{key}": None for key, exp in entries.items() if exp <= now}
+        if expired:
+            db.update(expired)
+        return len(expired)
+
+    def create_session(self, session_id, record):
+        get_database().child(SESSIONS_NODE).child(session_id).set(record)
+
+    def get_session(self, session_id):
+        return get_database().child(SESSIONS_NODE).child(session_id).get() or None
+
+    def rotate_session(self, session_id, expected_hash, fields):
+        rotated = []
+
+        def rotate(current):
+            # Transactions can re-run on contention; only the last run counts
+            rotated.clear()
+            if not current or current.get('token_hash') != expected_hash:
+                return current
+            rotated.append(True)
+            return {**current, **fields}
+
+        get_database().child(SESSIONS_NODE).child(session_id).transaction(rotate)
+        return bool(rotated)
+
+    def delete_session(self, session_id):
+        get_database().child(SESSIONS_NODE).child(session_id).delete()
+
+    def purge_sessions(self, created_before):
+        db = get_database()
+        expired = db.child(SESSIONS_NODE).order_by_key().end_at(time_key(created_before)).get() or {}
+        if expired:
+            db.update({f"{SESSIONS_NODE}/{session_id}": None for session_id in expired})
+        return len(expired)
+
+    def rebuild_email_index(self, batch_size: int = ITER_PAGE_SIZE):
+        """
+        Write an index entry for every existing user.
+
+        One-shot migration for users created before the index existed. Users
+        are read page by page and the entries are written in multi-path
+        updates of batch_size; request handlers never scan.
+        """
+        db = get_database()
+        updates = {}
+        count = 0
+        for auth_id, user_data in self.iter_users():
+            if user_data.get('email'):
+                key = email_index_key(user_data['email'].strip().lower())
+                updates[f"{EMAIL_INDEX_NODE}/{key}"] = auth_id
+            if len(updates) >= batch_size:
+                db.update(updates)
+                count += len(updates)
+                updates = {}
+
+        if updates:
+            db.update(updates)
+            count += len(updates)
+        return count
@@ -0,0 +1,87 @@
+import threading
+from storage.base import StorageBackend, EmailAlreadyExistsError, ITER_PAGE_SIZE
+
+
+class MemoryBackend(StorageBackend):
+    """Users kept in process-local dictionaries"""
+
+    def __init__(self):
+        self._users = {}
+        self._emails = {}
+        self._revoked = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get_user(self, auth_id):
+        with self._lock:
+            record = self._users.get(auth_id)
+        return dict(record) if record is not None else None
+
+    def get_auth_id_by_email(self, email):
+        return self._emails.get(email)
+
+    def create_user(self, auth_id, record, email):
+        with self._lock:
+            if email in self._emails:
+                raise EmailAlreadyExistsError(email)
+            self._users[auth_id] = dict(record)
+            self._emails[email] = auth_id
+
+    def update_user(self, auth_id, fields):
+        with self._lock:
+            if auth_id in self._users:
+                self._users[auth_id].update(fields)
+
+    def iter_users(self, page_size=ITER_PAGE_SIZE, start_at=None, end_at=None):
+        with self._lock:
+            auth_ids = sorted(auth_id for auth_id in self._users
+                              if (start_at is None or auth_id >= start_at) and (end_at is None or auth_id <= end_at))
+        for auth_id in auth_ids:
+            record = self.get_user(auth_id)
+            if record is not None:
+                yield auth_id, record
+
+    def revoke_token(self, jti, exp, revoked_at):
+        with self._lock:
+            self._revoked[jti] = (exp, revoked_at)
+
+    def get_revoked_tokens(self, since=None):
+        with self._lock:
+            return [(jti, exp) for jti, (exp, revoked_at) in self._revoked.items()
+                    if since is None or revoked_at >= since]
+
+    def purge_revoked_tokens(self, now):
+        with self._lock:
+            expired = [jti for jti, (exp, _) in self._revoked.items() if exp <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+    def create_session(self, session_id, record):
+        with self._lock:
+            self._sessions[session_id] = dict(record)
+
+    def get_session(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+        return dict(record) if record is not None else None
+
+    def rotate_session(self, session_id, expected_hash, fields):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None or record.get('token_hash') != expected_hash:
+                return False
+            record.update(fields)
+            return True
+
+    def delete_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_sessions(self, created_before):
+        with self._lock:
+            expired = [session_id for session_id, record in self._sessions.items()
+                       if record['created_at'] < created_before]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
@@ -0,0 +1,345 @@
+"""
+In-process read replica of the users tree.
+
+ReplicatedBackend wraps the primary backend (Firebase). connect() starts a
+background warm-up that copies every user with the primary's paged
+iterator, then subscribes to realtime change events on the database root
+(`listen()`), so the local copy follows writes made by every worker and
+host. Once warm, get_user / get_auth_id_by_email / get_users are answered
+from memory:
+
+- hits are served locally; misses still go to the primary, so a user
+  created elsewhere a moment ago is never reported missing while its
+  event is in transit
+- until the replica is warm, after an event fails to apply, after close(),
+  or once no event has arrived for max_staleness, every read goes to the
+  primary
+- a maintenance thread restarts the load and stream after a failure or
+  once the copy goes stale, and otherwise writes a heartbeat through the
+  primary every heartbeat_interval
+- writes go to the primary and are applied locally at once, so this
+  process reads its own writes
+
+RTDB sends the whole tree as the first event of every stream connection
+(and again on each reconnect); that event is applied as a full resync.
+Every heartbeat write comes back to every replica as an event, so a healthy
+stream delivers one at least every heartbeat_interval even when no user
+changes. That is what lets max_staleness be short enough to notice a stream
+that died without telling us within a minute.
+"""
+import time
+import logging
+import threading
+from storage.base import StorageBackend, ITER_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(email):
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+class ReplicatedBackend(StorageBackend):
+    """
+    Serve reads from a local copy of the primary's users, kept current by
+    its change stream.
+
+    Args:
+        primary: Backend that owns the data; must provide listen(callback)
+            and heartbeat(now)
+        skip_keys: Root keys that are not users (e.g. the email index node)
+        page_size: Users per page during the initial load
+        max_staleness: Seconds without any event after which reads go back
+            to the primary and the stream is restarted
+        heartbeat_interval: Seconds between heartbeats and health checks
+            (defaults to a quarter of max_staleness)
+        clock: Time function, injectable for tests
+    """
+
+    def __init__(self, primary: StorageBackend, skip_keys=(), page_size: int = ITER_PAGE_SIZE,
+                 max_staleness: float = 60.0, heartbeat_interval: float = None, clock=time.time):
+        self.primary = primary
+        self.skip_keys = frozenset(skip_keys)
+        self.page_size = page_size
+        self.max_staleness = max_staleness
+        self.heartbeat_interval = heartbeat_interval or max_staleness / 4
+        self._clock = clock
+        self._users = {}
+        self._emails = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._registration = None
+        self._warm = False
+        self._failed = False
+        self._stopped = False
+        self.loaded_at = None
+        self.last_event_at = None
+        self.events = 0
+        self.resyncs = 0
+        self.restarts = 0
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    # Replication
+
+    def connect(self):
+        self.primary.connect()
+        threading.Thread(target=self._run, name="user-replica", daemon=True).start()
+
+    def _run(self):
+        self.warm_up()
+        while not self._stopped:
+            # Woken early when an event fails to apply, and by close()
+            self._wake.wait(self.heartbeat_interval)
+            self._wake.clear()
+            try:
+                self.maintain()
+            except Exception:
+                logger.warning("User replica maintenance failed", exc_info=True)
+
+    def maintain(self):
+        """Restart the load and stream if they failed or went stale, else send a heartbeat"""
+        if self._stopped:
+            return
+        if not self._warm or self._failed or not self.ready:
+            self.restart()
+        else:
+            self.primary.heartbeat(self._clock())
+
+    def restart(self):
+        """Drop the stream and load everything again; reads go to the primary meanwhile"""
+        self._warm = False
+        registration, self._registration = self._registration, None
+        if registration is not None:
+            try:
+                registration.close()
+            except Exception:
+                logger.warning("Could not close the user replica stream", exc_info=True)
+        self._failed = False
+        self.restarts += 1
+        self.warm_up()
+
+    def warm_up(self):
+        """Load every user page by page, then follow the change stream"""
+        try:
+            users = {}
+            for auth_id, record in self.primary.iter_users(page_size=self.page_size):
+                users[auth_id] = record
+            with self._lock:
+                self._replace(users)
+            # Changes made while loading arrive with the stream's first
+            # (full) event, which replaces this copy
+            self._registration = self.primary.listen(self._on_event)
+        except Exception:
+            logger.warning("User replica warm-up failed; reading from the primary", exc_info=True)
+            return
+        self.loaded_at = self._clock()
+        self.last_event_at = None
+        self._warm = True
+        logger.info("User replica warm with %d users", len(self._users))
+
+    @property
+    def ready(self) -> bool:
+        """True while reads can be served locally: warm, healthy and recently updated"""
+        if not self._warm or self._failed or self._stopped:
+            return False
+        synced_at = self.last_event_at or self.loaded_at
+        return self._clock() - synced_at < self.max_staleness
+
+    def _on_event(self, event):
+        # Runs on the listener thread; an exception would end the stream
+        try:
+            self.apply_event(event.event_type, event.path, event.data)
+        except Exception:
+            logger.exception("Could not apply %s event at %s; restarting the replica",
+                             event.event_type, event.path)
+            self._failed = True
+            self._wake.set()
+
+    def apply_event(self, event_type: str, path: str, data):
+        """
+        Apply one realtime event (put or patch) to the local copy.
+
+        put replaces the value at path; patch carries {relative path: value}
+        pairs, each applied as a put under path.
+        """
+        parts = [part for part in path.split("/") if part]
+        with self._lock:
+            if event_type == "put":
+                self._put(parts, data)
+            elif event_type == "patch":
+                for child, value in (data or {}).items():
+                    self._put(parts + [part for part in child.split("/") if part], value)
+            else:
+                return
+            self.events += 1
+            self.last_event_at = self._clock()
+
+    def _put(self, parts, value):
+        if not parts:
+            self._replace(value or {})
+            self.resyncs += 1
+            return
+        auth_id, fields = parts[0], parts[1:]
+        if auth_id in self.skip_keys:
+            return
+        if not fields:
+            self._set_user(auth_id, value if isinstance(value, dict) else None)
+            return
+
+        record = dict(self._users.get(auth_id) or {})
+        node = record
+        for part in fields[:-1]:
+            child = node.get(part)
+            node[part] = dict(child) if isinstance(child, dict) else {}
+            node = node[part]
+        if value is None:
+            node.pop(fields[-1], None)
+        else:
+            node[fields[-1]] = value
+        self._set_user(auth_id, record or None)
+
+    def _replace(self, tree):
+        # Build the new copy aside and swap it in, so lock-free readers
+        # never see a half-filled one
+        users, emails = {}, {}
+        for auth_id, record in tree.items():
+            if auth_id not in self.skip_keys and isinstance(record, dict):
+                users[auth_id] = record
+                email = _normalize(record.get("email"))
+                if email:
+                    emails[email] = auth_id
+        self._users, self._emails = users, emails
+
+    def _set_user(self, auth_id, record):
+        previous = self._users.pop(auth_id, None)
+        if previous is not None:
+            email = _normalize(previous.get("email"))
+            if self._emails.get(email) == auth_id:
+                del self._emails[email]
+        if record:
+            self._users[auth_id] = record
+            email = _normalize(record.get("email"))
+            if email:
+                self._emails[email] = auth_id
+
+    # Reads
+
+    def _local(self, value):
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def get_user(self, auth_id):
+        if not self.ready:
+            self.fallbacks += 1
+            return self.primary.get_user(auth_id)
+        record = self._users.get(auth_id)
+        if self._local(record) is not None:
+            return dict(record)
+        return self.primary.get_user(auth_id)
+
+    def get_auth_id_by_email(self, email):
+        if not self.ready:
+            self.fallbacks += 1
+            return self.primary.get_auth_id_by_email(email)
+        auth_id = self._emails.get(email)
+        if self._local(auth_id) is not None:
+            return auth_id
+        return self.primary.get_auth_id_by_email(email)
+
+    def get_users(self, auth_ids):
+        if not self.ready:
+            self.fallbacks += 1
+            return self.primary.get_users(auth_ids)
+        users, missing = {}, []
+        for auth_id in dict.fromkeys(auth_ids):
+            record = self._local(self._users.get(auth_id))
+            if record is not None:
+                users[auth_id] = dict(record)
+            else:
+                missing.append(auth_id)
+        if missing:
+            users.update(self.primary.get_users(missing))
+        return users
+
+    def iter_users(self, page_size: int = ITER_PAGE_SIZE, start_at: str = None, end_at: str = None):
+        return self.primary.iter_users(page_size=page_size, start_at=start_at, end_at=end_at)
+
+    # Writes go to the primary and are mirrored locally
+
+    def create_user(self, auth_id, record, email):
+        self.primary.create_user(auth_id, record, email)
+        with self._lock:
+            self._set_user(auth_id, dict(record))
+
+    def create_users(self, users):
+        users = list(users)
+        duplicates = self.primary.create_users(users)
+        skipped = set(duplicates)
+        with self._lock:
+            for auth_id, record, email in users:
+                if email not in skipped:
+                    self._set_user(auth_id, dict(record))
+        return duplicates
+
+    def update_user(self, auth_id, fields):
+        self.primary.update_user(auth_id, fields)
+        with self._lock:
+            if auth_id in self._users:
+                self._set_user(auth_id, {**self._users[auth_id], **fields})
+
+    def revoke_token(self, jti, exp, revoked_at):
+        self.primary.revoke_token(jti, exp, revoked_at)
+
+    def get_revoked_tokens(self, since=None):
+        return self.primary.get_revoked_tokens(since)
+
+    def purge_revoked_tokens(self, now):
+        return self.primary.purge_revoked_tokens(now)
+
+    def create_session(self, session_id, record):
+        self.primary.create_session(session_id, record)
+
+    def get_session(self, session_id):
+        return self.primary.get_session(session_id)
+
+    def rotate_session(self, session_id, expected_hash, fields):
+        return self.primary.rotate_session(session_id, expected_hash, fields)
+
+    def delete_session(self, session_id):
+        self.primary.delete_session(session_id)
+
+    def purge_sessions(self, created_before):
+        return self.primary.purge_sessions(created_before)
+
+    def rebuild_email_index(self, *args, **kwargs):
+        return self.primary.rebuild_email_index(*args, **kwargs)
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        registration, self._registration = self._registration, None
+        if registration is not None:
+            # The SDK's listener thread is not a daemon; join it before exit
+            registration.close()
+        self.primary.close()
+
+    def stats(self) -> dict:
+        """Return warmth, size, event age and read counters"""
+        now = self._clock()
+        synced_at = self.last_event_at or self.loaded_at
+        return {
+            "ready": self.ready,
+            "users": len(self._users),
+            "events": self.events,
+            "resyncs": self.resyncs,
+            "restarts": self.restarts,
+            "seconds_since_event": now - synced_at if synced_at is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+        }
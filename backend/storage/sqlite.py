@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+from storage.base import StorageBackend, EmailAlreadyExistsError, ITER_PAGE_SIZE
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Users stored in a local SQLite database.
+
+    The record is kept as JSON next to a uniquely indexed, normalized email
+    column, so lookups by auth_id or email are single index probes.
+
+    Args:
+        path: Database file path, or ":memory:"
+    """
+
+    def __init__(self, path: str = "auth.db"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " auth_id TEXT PRIMARY KEY,"
+                " email TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+                " jti TEXT PRIMARY KEY,"
+                " exp REAL NOT NULL,"
+                " revoked_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS revoked_tokens_revoked_at ON revoked_tokens (revoked_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " token_hash TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+
+    def _fetchone(self, query, params):
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+
+    def get_user(self, auth_id):
+        row = self._fetchone("SELECT data FROM users WHERE auth_id = ?", (auth_id,))
+        return json.loads(row[0]) if row else None
+
+    def get_auth_id_by_email(self, email):
+        row = self._fetchone("SELECT auth_id FROM users WHERE email = ?", (email,))
+        return row[0] if row else None
+
+    def create_user(self, auth_id, record, email):
+        # A single INSERT: the unique email index makes the reservation atomic
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO users (auth_id, email, data) VALUES (?, ?, ?)",
+                    (auth_id, email, json.dumps(record)),
+                )
+        except sqlite3.IntegrityError as e:
+            if self.get_auth_id_by_email(email) is not None:
+                raise EmailAlreadyExistsError(email) from e
+            raise
+
+    def get_users(self, auth_ids):
+        auth_ids = list(auth_ids)
+        users = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(auth_ids), 500):
+            chunk = auth_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT auth_id, data FROM users WHERE auth_id IN ({placeholders})", chunk).fetchall()
+            for auth_id, data in rows:
+                users[auth_id] = json.loads(data)
+        return users
+
+    def create_users(self, users):
+        # One transaction for the whole batch; a taken email skips that row
+        duplicates = []
+        with self._lock, self._conn:
+            for auth_id, record, email in users:
+                cursor = self._conn.execute(
+                    "INSERT INTO users (auth_id, email, data) VALUES (?, ?, ?)"
+                    " ON CONFLICT (email) DO NOTHING",
+                    (auth_id, email, json.dumps(record)),
+                )
+                if cursor.rowcount == 0:
+                    duplicates.append(email)
+        return duplicates
+
+    def update_user(self, auth_id, fields):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM users WHERE auth_id = ?", (auth_id,)).fetchone()
+            if row:
+                record = {**json.loads(row[0]), **fields}
+                self._conn.execute(
+                    "UPDATE users SET data = ? WHERE auth_id = ?", (json.dumps(record), auth_id))
+
+    def iter_users(self, page_size=ITER_PAGE_SIZE, start_at=None, end_at=None):
+        # Keyset pagination on the primary key; the lock is only held per page
+        query = ("SELECT auth_id, data FROM users WHERE auth_id >= ? AND (? IS NULL OR auth_id <= ?) "
+                 "ORDER BY auth_id LIMIT ?")
+        last_auth_id = start_at or ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (last_auth_id, end_at, end_at, page_size)).fetchall()
+            for auth_id, data in rows:
+                yield auth_id, json.loads(data)
+            if len(rows) < page_size:
+                return
+            query = ("SELECT auth_id, data FROM users WHERE auth_id > ? AND (? IS NULL OR auth_id <= ?) "
+                     "ORDER BY auth_id LIMIT ?")
+            last_auth_id = rows[-1][0]
+
+    def revoke_token(self, jti, exp, revoked_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, exp, revoked_at) VALUES (?, ?, ?)",
+                (jti, exp, revoked_at))
+
+    def get_revoked_tokens(self, since=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT jti, exp FROM revoked_tokens WHERE revoked_at >= ?",
+                (since if since is not None else float("-inf"),)).fetchall()
+
+    def purge_revoked_tokens(self, now):
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM revoked_tokens WHERE exp <= ?", (now,)).rowcount
+
+    def create_session(self, session_id, record):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, token_hash, created_at, data) VALUES (?, ?, ?, ?)",
+                (session_id, record['token_hash'], record['created_at'], json.dumps(record)))
+
+    def get_session(self, session_id):
+        row = self._fetchone("SELECT data FROM sessions WHERE session_id = ?", (session_id,))
+        return json.loads(row[0]) if row else None
+
+    def rotate_session(self, session_id, expected_hash, fields):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND token_hash = ?",
+                (session_id, expected_hash)).fetchone()
+            if row is None:
+                return False
+            record = {**json.loads(row[0]), **fields}
+            self._conn.execute(
+                "UPDATE sessions SET token_hash = ?, data = ? WHERE session_id = ?",
+                (record['token_hash'], json.dumps(record), session_id))
+            return True
+
+    def delete_session(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_sessions(self, created_before):
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM sessions WHERE created_at < ?", (created_before,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,9 +1,9 @@
 import pytest
 import os
+import sys
 from dotenv import load_dotenv
 
 
-@pytest.fixture(scope="session", autouse=True)
 def load_test_env():
     """Load environment variables for testing"""
     load_dotenv()
@@ -19,6 +19,80 @@ def load_test_env():
         os.environ["JWT_ALGORITHM"] = "HS256"
 
 
+# Test modules read settings at collection time, so the defaults have to be
+# in place before any of them is imported
+load_test_env()
+
+
+class FakeClock:
+    """Time function returning `now`, which tests advance by hand"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A fake clock starting at 1000.0"""
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Start every test with empty user record and verified-token caches"""
+    utils = sys.modules.get("utils")
+    if utils is not None:
+        utils.user_cache.clear()
+    jwt_utils = sys.modules.get("jwt_utils")
+    if jwt_utils is not None:
+        jwt_utils.token_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with fresh login rate limit budgets"""
+    rate_limit = sys.modules.get("rate_limit")
+    if rate_limit is not None:
+        rate_limit.login_limiter.reset()
+    yield
+
+
+@pytest.fixture
+def memory_backend():
+    """Install a fresh in-memory storage backend for the test"""
+    import storage
+    from storage.memory import MemoryBackend
+
+    previous = storage._backend
+    backend = MemoryBackend()
+    storage.set_backend(backend)
+    yield backend
+    storage.set_backend(previous)
+
+
+@pytest.fixture
+def legacy_ciphertext():
+    """Return a function encrypting in the legacy AES-CBC format, which is only read now"""
+    import base64
+    import secrets
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from encryption_utils import AES_KEY
+
+    def encrypt(plaintext):
+        iv = secrets.token_bytes(16)
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(plaintext.encode('utf-8')) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(AES_KEY), modes.CBC(iv)).encryptor()
+        return base64.b64encode(iv + encryptor.update(padded) + encryptor.finalize()).decode('utf-8')
+
+    return encrypt
+
+
 @pytest.fixture
 def sample_user_data():
     """Fixture providing sample user data for tests"""
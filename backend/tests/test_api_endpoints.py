@@ -1,7 +1,13 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
 from main import app
+from storage import EmailAlreadyExistsError
+from jwt_utils import create_jwt_token, create_access_token, verify_jwt_token
+import sessions
+import utils
+from encryption_utils import encrypt_message, seal_claim
 
 
 client = TestClient(app)
@@ -10,14 +16,12 @@ client = TestClient(app)
 class TestSignupEndpoint:
     """Test suite for /signup endpoint"""
 
-    @patch('api.signup.email_exists')
     @patch('api.signup.generate_auth_id')
-    @patch('api.signup.hash_password')
+    @patch('api.signup.hash_password_async')
     @patch('api.signup.encrypt_message')
     @patch('api.signup.create_user')
-    def test_signup_success(self, mock_create_user, mock_encrypt, mock_hash, mock_gen_auth, mock_email_exists):
+    def test_signup_success(self, mock_create_user, mock_encrypt, mock_hash, mock_gen_auth):
         """Test successful user signup"""
-        mock_email_exists.return_value = False
         mock_gen_auth.return_value = "test_auth_id"
         mock_hash.return_value = "hashed_password"
         mock_encrypt.return_value = "encrypted_aadhaar"
@@ -34,11 +38,9 @@ class TestSignupEndpoint:
         assert response.json()["message"] == "User created successfully"
         assert response.json()["auth_id"] == "test_auth_id"
 
-    @patch('api.signup.email_exists')
-    def test_signup_invalid_aadhaar_length(self, mock_email_exists):
+    @patch('api.signup.create_user')
+    def test_signup_invalid_aadhaar_length(self, mock_create_user):
         """Test signup with invalid Aadhaar length"""
-        mock_email_exists.return_value = False
-        
         response = client.post("/signup", json={
             "name": "Test User",
             "email": "test@example.com",
@@ -48,12 +50,11 @@ class TestSignupEndpoint:
         
         assert response.status_code == 400
         assert "Invalid Aadhaar number" in response.json()["detail"]
+        mock_create_user.assert_not_called()
 
-    @patch('api.signup.email_exists')
-    def test_signup_invalid_aadhaar_non_numeric(self, mock_email_exists):
+    @patch('api.signup.create_user')
+    def test_signup_invalid_aadhaar_non_numeric(self, mock_create_user):
         """Test signup with non-numeric Aadhaar"""
-        mock_email_exists.return_value = False
-        
         response = client.post("/signup", json={
             "name": "Test User",
             "email": "test@example.com",
@@ -63,11 +64,14 @@ class TestSignupEndpoint:
         
         assert response.status_code == 400
         assert "Invalid Aadhaar number" in response.json()["detail"]
+        mock_create_user.assert_not_called()
 
-    @patch('api.signup.email_exists')
-    def test_signup_email_already_exists(self, mock_email_exists):
+    @patch('api.signup.hash_password_async')
+    @patch('api.signup.create_user')
+    def test_signup_email_already_exists(self, mock_create_user, mock_hash):
         """Test signup with already registered email"""
-        mock_email_exists.return_value = True
+        mock_hash.return_value = "hashed_password"
+        mock_create_user.side_effect = EmailAlreadyExistsError("existing@example.com")
         
         response = client.post("/signup", json={
             "name": "Test User",
@@ -79,6 +83,22 @@ class TestSignupEndpoint:
         assert response.status_code == 400
         assert "Email already registered" in response.json()["detail"]
 
+    @patch('api.signup.hash_password_async')
+    def test_signup_concurrent_duplicate_email(self, mock_hash, memory_backend):
+        """Test that only one of several signups for the same email succeeds"""
+        mock_hash.return_value = "hashed_password"
+        payload = {
+            "name": "Test User",
+            "email": "race@example.com",
+            "aadhaar": "123456789012",
+            "password": "TestPass123"
+        }
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: client.post("/signup", json=payload), range(4)))
+        
+        assert sorted(response.status_code for response in responses) == [200, 400, 400, 400]
+
     def test_signup_invalid_email_format(self):
         """Test signup with invalid email format"""
         response = client.post("/signup", json={
@@ -91,14 +111,14 @@ class TestSignupEndpoint:
         assert response.status_code == 422  # Validation error
 
 
+@pytest.mark.usefixtures("memory_backend")
 class TestLoginEndpoint:
     """Test suite for /login endpoint"""
 
     @patch('api.login.get_user_by_email')
-    @patch('api.login.verify_password')
-    @patch('api.login.create_jwt_token')
-    @patch('api.login.decrypt_message')
-    def test_login_success(self, mock_decrypt, mock_create_token, mock_verify_pwd, mock_get_user):
+    @patch('api.login.verify_password_async')
+    @patch('api.login.create_access_token')
+    def test_login_success(self, mock_create_token, mock_verify_pwd, mock_get_user):
         """Test successful login"""
         mock_get_user.return_value = {
             "auth_id": "test_auth",
@@ -109,7 +129,6 @@ class TestLoginEndpoint:
         }
         mock_verify_pwd.return_value = True
         mock_create_token.return_value = "jwt_token"
-        mock_decrypt.return_value = "123456789012"
         
         response = client.post("/login", json={
             "email": "test@example.com",
@@ -119,6 +138,7 @@ class TestLoginEndpoint:
         assert response.status_code == 200
         assert response.json()["message"] == "Login successful"
         assert "user" in response.json()
+        assert response.cookies["token"] == "jwt_token"
 
     @patch('api.login.get_user_by_email')
     def test_login_user_not_found(self, mock_get_user):
@@ -134,7 +154,7 @@ class TestLoginEndpoint:
         assert "Invalid email or password" in response.json()["detail"]
 
     @patch('api.login.get_user_by_email')
-    @patch('api.login.verify_password')
+    @patch('api.login.verify_password_async')
     def test_login_wrong_password(self, mock_verify_pwd, mock_get_user):
         """Test login with incorrect password"""
         mock_get_user.return_value = {
@@ -152,6 +172,91 @@ class TestLoginEndpoint:
         assert "Invalid email or password" in response.json()["detail"]
 
 
+    @patch('api.login.get_user_by_email')
+    @patch('api.login.verify_password_async')
+    @patch('api.login.needs_rehash')
+    @patch('api.login.hash_password_async')
+    @patch('api.login.update_user')
+    def test_login_rehashes_outdated_hash(self, mock_update_user, mock_hash, mock_needs_rehash,
+                                          mock_verify_pwd, mock_get_user):
+        """Test a successful login upgrades an outdated password hash"""
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012"),
+            "password": "old_hash"
+        }
+        mock_verify_pwd.return_value = True
+        mock_needs_rehash.return_value = True
+        mock_hash.return_value = "new_hash"
+        
+        response = client.post("/login", json={
+            "email": "test@example.com",
+            "password": "TestPass123"
+        })
+        
+        assert response.status_code == 200
+        mock_hash.assert_called_once_with("TestPass123")
+        mock_update_user.assert_called_once_with("test_auth", password="new_hash")
+
+    @patch('api.login.get_user_by_email')
+    @patch('api.login.verify_password_async')
+    @patch('api.login.needs_rehash')
+    @patch('api.login.update_user')
+    def test_login_keeps_current_hash(self, mock_update_user, mock_needs_rehash,
+                                      mock_verify_pwd, mock_get_user):
+        """Test a current password hash is not rewritten"""
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012"),
+            "password": "current_hash"
+        }
+        mock_verify_pwd.return_value = True
+        mock_needs_rehash.return_value = False
+        
+        response = client.post("/login", json={
+            "email": "test@example.com",
+            "password": "TestPass123"
+        })
+        
+        assert response.status_code == 200
+        mock_update_user.assert_not_called()
+
+
+    @patch('api.login.get_user_by_email')
+    @patch('api.login.verify_password_async')
+    def test_login_rate_limited_before_lookup(self, mock_verify_pwd, mock_get_user):
+        """Test over-budget attempts get 429 without touching storage or Argon2"""
+        mock_get_user.return_value = None
+        
+        with patch('rate_limit.login_limiter.check', return_value=12.5):
+            response = client.post("/login", json={
+                "email": "victim@example.com",
+                "password": "Guess123"
+            })
+        
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "13"
+        mock_get_user.assert_not_called()
+        mock_verify_pwd.assert_not_called()
+
+    @patch('api.login.get_user_by_email')
+    def test_login_email_budget_exhausted(self, mock_get_user):
+        """Test repeated failures for one email are eventually rejected"""
+        mock_get_user.return_value = None
+        
+        statuses = [client.post("/login", json={
+            "email": "victim@example.com",
+            "password": "Guess123"
+        }).status_code for _ in range(12)]
+        
+        assert statuses[0] == 401
+        assert statuses[-1] == 429
+
+
 class TestVerifyEndpoint:
     """Test suite for /verify endpoint"""
 
@@ -180,7 +285,7 @@ class TestVerifyEndpoint:
         response = client.get("/verify")
         
         assert response.status_code == 401
-        assert response.json()["valid"] is False
+        assert response.json()["detail"] == "No token provided"
 
     @patch('api.verify.verify_jwt_token')
     def test_verify_invalid_token(self, mock_verify_token):
@@ -190,7 +295,7 @@ class TestVerifyEndpoint:
         response = client.get("/verify", cookies={"token": "invalid_token"})
         
         assert response.status_code == 401
-        assert response.json()["valid"] is False
+        assert response.json()["detail"] == "Invalid or expired token"
 
     @patch('api.verify.verify_jwt_token')
     @patch('api.verify.get_user_by_auth_id')
@@ -201,7 +306,158 @@ class TestVerifyEndpoint:
         
         response = client.get("/verify", cookies={"token": "valid_token"})
         
-        assert response.status_code == 404
+        # 401 like any other unusable token, so clients log in again
+        assert response.status_code == 401
+        assert response.json()["detail"] == "User not found"
+
+
+class TestStatelessVerify:
+    """Test suite for /verify answering from token claims"""
+
+    def _token(self, pv=1, typ="access"):
+        return create_jwt_token("test_auth", profile={
+            "name": "Test User",
+            "email": "test@example.com",
+            "pv": pv
+        }, claims={"typ": typ, "aadhaar_seal": seal_claim("123456789012", "test_auth")})
+
+    @patch('api.verify.get_user_by_auth_id')
+    def test_verify_without_database_read(self, mock_get_user):
+        """Test an access token is answered without reading the user"""
+        response = client.get("/verify", cookies={"token": self._token()})
+        
+        assert response.status_code == 200
+        assert response.json()["user"] == {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": "123456789012"
+        }
+        mock_get_user.assert_not_called()
+
+    @patch('api.verify.get_cached_user')
+    @patch('api.verify.get_user_by_auth_id')
+    def test_verify_stale_profile_version_reads_user(self, mock_get_user, mock_cached_user):
+        """Test a token with an outdated profile version falls back to a read"""
+        mock_cached_user.return_value = {"profile_version": 2}
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Renamed User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012")
+        }
+        
+        response = client.get("/verify", cookies={"token": self._token(pv=1)})
+        
+        assert response.status_code == 200
+        assert response.json()["user"]["name"] == "Renamed User"
+        mock_get_user.assert_called_once_with("test_auth")
+
+    @patch('api.verify.get_user_by_auth_id')
+    def test_verify_profile_ignored_on_other_tokens(self, mock_get_user):
+        """Test profile claims are only trusted in access tokens"""
+        mock_get_user.return_value = None
+        
+        response = client.get("/verify", cookies={"token": self._token(typ="legacy")})
+        
+        assert response.status_code == 401
+        mock_get_user.assert_called_once_with("test_auth")
+
+    @pytest.mark.parametrize("seal", [None, "not-a-seal", "other_user"])
+    @patch('api.verify.get_user_by_auth_id')
+    def test_missing_or_foreign_seal_reads_user(self, mock_get_user, seal):
+        """Test the Aadhaar number is only taken from a seal bound to the token's user"""
+        if seal == "other_user":
+            seal = seal_claim("999999999999", "other_user")
+        token = create_jwt_token("test_auth", profile={
+            "name": "Test User",
+            "email": "test@example.com",
+            "pv": 1
+        }, claims={"typ": "access", "aadhaar_seal": seal})
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012")
+        }
+        
+        response = client.get("/verify", cookies={"token": token})
+        
+        assert response.status_code == 200
+        assert response.json()["user"]["aadhaar"] == "123456789012"
+        mock_get_user.assert_called_once_with("test_auth")
+
+    @patch('api.verify.get_user_by_auth_id')
+    def test_access_token_without_database_read(self, mock_get_user):
+        """Test the tokens login issues are answered from their claims"""
+        token = create_access_token({
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012")
+        }, "session1")
+        
+        response = client.get("/verify", cookies={"token": token})
+        
+        assert response.status_code == 200
+        assert response.json()["user"]["name"] == "Test User"
+        assert response.json()["user"]["aadhaar"] == "123456789012"
+        mock_get_user.assert_not_called()
+
+    @pytest.mark.usefixtures("memory_backend")
+    @patch('api.login.get_user_by_email')
+    @patch('api.login.verify_password_async')
+    def test_login_issues_profile_claims(self, mock_verify_pwd, mock_get_user):
+        """Test login issues an access token with profile claims and a session"""
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012"),
+            "password": "hashed_password"
+        }
+        mock_verify_pwd.return_value = True
+        
+        response = client.post("/login", json={
+            "email": "test@example.com",
+            "password": "TestPass123"
+        })
+        
+        payload = verify_jwt_token(response.cookies["token"])
+        assert "123456789012" not in response.cookies["token"]
+        assert payload["profile"] == {"name": "Test User", "email": "test@example.com", "pv": 1}
+        assert payload["typ"] == "access"
+        assert response.cookies["refresh_token"].startswith(payload["sid"] + ".")
+
+
+class TestResponseModels:
+    """Test suite for typed responses"""
+
+    def test_endpoints_declare_response_models(self):
+        """Test each auth endpoint publishes its response schema"""
+        paths = client.get("/openapi.json").json()["paths"]
+        for path, method, model in [("/signup", "post", "SignupResponse"), ("/login", "post", "LoginResponse"),
+                                    ("/verify", "get", "VerifyResponse"), ("/logout", "post", "MessageResponse"),
+                                    ("/refresh", "post", "MessageResponse")]:
+            schema = paths[path][method]["responses"]["200"]["content"]["application/json"]["schema"]
+            assert schema == {"$ref": f"#/components/schemas/{model}"}
+
+    @patch('api.verify.get_user_by_auth_id')
+    def test_verify_renders_model_as_json(self, mock_get_user):
+        """Test /verify renders exactly the VerifyResponse fields as JSON"""
+        mock_get_user.return_value = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012"),
+            "password": "hashed_password"
+        }
+
+        response = client.get("/verify", cookies={"token": create_jwt_token("test_auth")})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert set(response.json()["user"]) == {"auth_id", "name", "email", "aadhaar"}
 
 
 class TestLogoutEndpoint:
@@ -215,3 +471,73 @@ class TestLogoutEndpoint:
         assert response.json()["message"] == "Logged out successfully"
         # Check that token cookie is cleared
         assert "token" in response.cookies or response.headers.get("set-cookie")
+
+    def test_logout_ends_session(self, memory_backend):
+        """Test logout deletes the refresh session and revokes its access tokens"""
+        session = sessions.start_session("test_auth")
+        token = create_access_token({
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012")
+        }, session.session_id)
+        
+        response = client.post("/logout", cookies={"token": token, "refresh_token": session.refresh_token})
+        
+        assert response.status_code == 200
+        assert memory_backend.get_session(session.session_id) is None
+        assert verify_jwt_token(token) is None
+
+    def test_logout_ignores_forged_refresh_cookie(self, memory_backend):
+        """Test a refresh cookie with the wrong secret does not end the session"""
+        session = sessions.start_session("test_auth")
+        
+        response = client.post("/logout", cookies={"refresh_token": session.session_id + ".guess"})
+        
+        assert response.status_code == 200
+        assert memory_backend.get_session(session.session_id) is not None
+
+
+class TestRefreshEndpoint:
+    """Test suite for /refresh endpoint"""
+
+    @pytest.fixture
+    def user(self, memory_backend):
+        record = {
+            "auth_id": "test_auth",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": encrypt_message("123456789012"),
+            "password": "hashed_password"
+        }
+        memory_backend.create_user("test_auth", record, "test@example.com")
+        return record
+
+    def test_refresh_rotates_tokens(self, user):
+        """Test a refresh issues a new access token and a new refresh token"""
+        session = sessions.start_session("test_auth")
+        
+        response = client.post("/refresh", cookies={"refresh_token": session.refresh_token})
+        
+        assert response.status_code == 200
+        payload = verify_jwt_token(response.cookies["token"])
+        assert payload["sid"] == session.session_id
+        assert payload["profile"]["name"] == "Test User"
+        assert response.cookies["refresh_token"] != session.refresh_token
+
+    def test_refresh_without_cookie(self):
+        """Test a request without a refresh token is rejected"""
+        response = client.post("/refresh")
+        
+        assert response.status_code == 401
+
+    def test_refresh_reuse_clears_cookies(self, user):
+        """Test a reused refresh token is rejected and the cookies are cleared"""
+        session = sessions.start_session("test_auth")
+        client.post("/refresh", cookies={"refresh_token": session.refresh_token})
+        
+        with patch('sessions.REFRESH_REUSE_GRACE', -1):
+            response = client.post("/refresh", cookies={"refresh_token": session.refresh_token})
+        
+        assert response.status_code == 401
+        assert 'refresh_token=""' in response.headers.get("set-cookie")
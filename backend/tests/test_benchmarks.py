@@ -0,0 +1,37 @@
+import pytest
+from benchmarks.harness import summarize, bench, compare_results
+from benchmarks.load import seed_users
+from storage.memory import MemoryBackend
+
+
+class TestBenchmarkHarness:
+    """Test suite for the benchmark harness helpers"""
+
+    def test_summarize_percentiles(self):
+        """Test summarize reports percentiles in microseconds"""
+        samples = [i / 1e6 for i in range(1, 101)]
+        summary = summarize(samples)
+        assert summary["rounds"] == 100
+        assert summary["p50_us"] == pytest.approx(51)
+        assert summary["p99_us"] == pytest.approx(100)
+
+    def test_bench_runs_requested_rounds(self):
+        """Test bench calls the function for warmup plus timed rounds"""
+        calls = []
+        summary = bench(lambda: calls.append(1), rounds=5, warmup=2)
+        assert len(calls) == 7
+        assert summary["rounds"] == 5
+
+    def test_compare_results_flags_regressions(self):
+        """Test only slowdowns beyond the threshold are reported"""
+        baseline = {"fast": {"p50_us": 10.0}, "slow": {"p50_us": 10.0}}
+        current = {"fast": {"p50_us": 11.0}, "slow": {"p50_us": 13.0}, "new": {"p50_us": 1.0}}
+        assert compare_results(baseline, current, threshold=0.2) == [("slow", 10.0, 13.0)]
+
+    def test_seed_users_populates_backend(self):
+        """Test synthetic users are stored and indexed by email"""
+        backend = MemoryBackend()
+        emails = seed_users(backend, 5)
+        assert len(emails) == 5
+        assert backend.get_auth_id_by_email(emails[0]) is not None
+        assert sum(1 for _ in backend.iter_users()) == 5
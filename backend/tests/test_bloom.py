@@ -0,0 +1,205 @@
+import time
+import secrets
+import pytest
+from unittest.mock import patch
+from bloom import BloomFilter, EmailFilter
+import utils
+
+
+class FakeStore:
+    """Emails with creation times, scanned the way utils._scan_emails does"""
+
+    def __init__(self, emails=()):
+        self.users = [(0.0, email) for email in emails]
+        self.scans = []
+
+    def scan(self, since=None, until=None):
+        self.scans.append(since)
+        return [email for created, email in self.users
+                if (since is None or created >= since) and (until is None or created <= until)]
+
+
+class TestBloomFilter:
+    """Test suite for the Bloom filter"""
+
+    def test_no_false_negatives(self):
+        """Test every added item is reported as present"""
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        emails = [f"user{i}@example.com" for i in range(1000)]
+        for email in emails:
+            bloom.add(email)
+        assert all(email in bloom for email in emails)
+
+    def test_false_positive_rate_near_target(self):
+        """Test the measured and estimated rates stay near the target at capacity"""
+        bloom = BloomFilter.for_capacity(5000, 0.01)
+        for i in range(5000):
+            bloom.add(f"user{i}@example.com")
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(20000))
+        assert false_positives / 20000 < 0.02
+        assert 0.005 < bloom.estimated_fpr() < 0.02
+
+    def test_count_ignores_repeated_items(self):
+        """Test re-adding an item does not inflate the count"""
+        bloom = BloomFilter.for_capacity(100)
+        bloom.add("a@example.com")
+        bloom.add("a@example.com")
+        assert bloom.count == 1
+
+    def test_serialization_round_trip(self):
+        """Test a saved filter loads with the same bits and sync time"""
+        bloom = BloomFilter.for_capacity(100)
+        bloom.add("a@example.com")
+        loaded, synced_at = BloomFilter.from_bytes(bloom.to_bytes(synced_at=123.5))
+        assert "a@example.com" in loaded
+        assert "b@example.com" not in loaded
+        assert (loaded.num_bits, loaded.num_hashes, loaded.count) == (bloom.num_bits, bloom.num_hashes, 1)
+        assert synced_at == 123.5
+
+    def test_rejects_corrupt_data(self):
+        """Test truncated or foreign data is refused"""
+        data = BloomFilter.for_capacity(100).to_bytes()
+        with pytest.raises(ValueError):
+            BloomFilter.from_bytes(data[:-1])
+        with pytest.raises(ValueError):
+            BloomFilter.from_bytes(b"not a filter at all")
+
+
+class TestEmailFilter:
+    """Test suite for the registered-email filter"""
+
+    def make_filter(self, store, clock, **kwargs):
+        return EmailFilter(capacity=1000, error_rate=0.01, scan=store.scan,
+                           refresh_interval=1.0, skew=60.0, clock=clock, **kwargs)
+
+    def test_not_used_until_built(self, clock):
+        """Test nothing is reported absent before the initial scan"""
+        email_filter = self.make_filter(FakeStore(), clock)
+        assert email_filter.definitely_absent("new@example.com") is False
+
+    def test_unknown_email_is_absent_without_scanning(self, clock):
+        """Test a recent filter answers negatives with no store access"""
+        store = FakeStore(["known@example.com"])
+        email_filter = self.make_filter(store, clock)
+        email_filter.load_or_build()
+
+        assert email_filter.definitely_absent("new@example.com") is True
+        assert email_filter.definitely_absent("known@example.com") is False
+        assert store.scans == [None]
+
+    def test_refresh_catches_up_with_other_workers(self, clock):
+        """Test a catch-up scan covers only the window since the last scan"""
+        store = FakeStore(["known@example.com"])
+        email_filter = self.make_filter(store, clock)
+        email_filter.load_or_build()
+
+        # Created by another worker after the build
+        store.users.append((clock.now + 0.5, "elsewhere@example.com"))
+        clock.now += 1
+        email_filter.refresh()
+        assert email_filter.definitely_absent("elsewhere@example.com") is False
+        assert store.scans == [None, 1000.0 - 60.0]
+
+    def test_stale_filter_answers_maybe_without_scanning(self, clock):
+        """Test negatives stop once the background refresh lags, and callers never scan"""
+        store = FakeStore(["known@example.com"])
+        email_filter = self.make_filter(store, clock)
+        email_filter.load_or_build()
+
+        clock.now += 2
+        assert email_filter.definitely_absent("new@example.com") is False
+        assert store.scans == [None]
+        assert email_filter.stats()["stale"] == 1
+
+    def test_local_adds_are_visible_immediately(self, clock):
+        """Test users created by this process are never reported absent"""
+        email_filter = self.make_filter(FakeStore(), clock)
+        email_filter.load_or_build()
+        email_filter.add("fresh@example.com")
+        assert email_filter.definitely_absent("fresh@example.com") is False
+
+    def test_warm_start_scans_only_since_snapshot(self, tmp_path, clock):
+        """Test a saved snapshot is reused and only recent users are re-scanned"""
+        path = str(tmp_path / "filter.bin")
+        first = self.make_filter(FakeStore(["known@example.com"]), clock, path=path)
+        first.load_or_build()
+
+        clock.now += 3600
+        store = FakeStore()
+        second = self.make_filter(store, clock, path=path)
+        second.load_or_build()
+        assert store.scans == [1000.0 - 60.0]
+        assert second.definitely_absent("known@example.com") is False
+
+    def test_snapshot_with_other_sizing_is_rebuilt(self, tmp_path, clock):
+        """Test a snapshot sized for another capacity triggers a full scan"""
+        path = str(tmp_path / "filter.bin")
+        EmailFilter(capacity=10, error_rate=0.01, scan=FakeStore().scan, path=path).load_or_build()
+
+        store = FakeStore()
+        self.make_filter(store, clock, path=path).load_or_build()
+        assert store.scans == [None]
+
+    def test_stats_report_false_positive_rates(self, clock):
+        """Test observed and estimated false-positive rates are reported"""
+        email_filter = self.make_filter(FakeStore(["known@example.com"]), clock)
+        email_filter.load_or_build()
+        email_filter.definitely_absent("new@example.com")
+        email_filter.record_false_positive()
+
+        stats = email_filter.stats()
+        assert stats["count"] == 1
+        assert stats["negatives"] == 1
+        assert stats["observed_fpr"] == 0.5
+        assert 0 <= stats["estimated_fpr"] < 0.01
+
+
+@pytest.mark.usefixtures("memory_backend")
+class TestEmailLookupsWithFilter:
+    """Test suite for email lookups backed by the filter"""
+
+    @pytest.fixture(autouse=True)
+    def enabled_filter(self):
+        email_filter = EmailFilter(capacity=1000, error_rate=0.01, scan=utils._scan_emails)
+        with patch('utils.email_filter', email_filter):
+            yield email_filter
+
+    def test_unknown_email_skips_the_store(self, enabled_filter):
+        """Test a definite negative never reaches the backend"""
+        utils.create_user("auth1", "One", "one@example.com", "encrypted", "hashed")
+        enabled_filter.load_or_build()
+
+        with patch('utils.get_backend') as mock_backend:
+            assert utils.email_exists("new@example.com") is False
+        mock_backend.return_value.get_auth_id_by_email.assert_not_called()
+
+    def test_registered_emails_still_resolve(self, enabled_filter):
+        """Test users from the initial scan and later creates are found"""
+        utils.create_user("auth1", "One", "One@Example.com", "encrypted", "hashed")
+        enabled_filter.load_or_build()
+        utils.create_user("auth2", "Two", "two@example.com", "encrypted", "hashed")
+
+        assert utils.get_auth_id_by_email("one@example.com") == "auth1"
+        assert utils.get_auth_id_by_email("TWO@example.com") == "auth2"
+
+    def test_scan_since_uses_time_ordered_auth_ids(self, memory_backend):
+        """Test the catch-up scan reads only auth ids generated within its window"""
+        old_id = utils.auth_id_floor(1000) + "0" * 12
+        new_id = utils.auth_id_floor(2000) + "z" * 12
+        memory_backend.create_user(old_id, {"email": "old@example.com"}, "old@example.com")
+        memory_backend.create_user(new_id, {"email": "new@example.com"}, "new@example.com")
+
+        assert list(utils._scan_emails(1500, 2000)) == ["new@example.com"]
+        assert list(utils._scan_emails(1500, 1999)) == []
+        assert sorted(utils._scan_emails()) == ["new@example.com", "old@example.com"]
+
+    def test_scan_skips_legacy_random_auth_ids(self, memory_backend):
+        """Test random pre-time-ordered auth ids are not re-read by every catch-up scan"""
+        for i in range(200):
+            auth_id = "".join(secrets.choice(utils.AUTH_ID_ALPHABET) for _ in range(10))
+            memory_backend.create_user(auth_id, {"email": f"legacy{i}@example.com"}, f"legacy{i}@example.com")
+        recent_id = utils.generate_auth_id()
+        memory_backend.create_user(recent_id, {"email": "recent@example.com"}, "recent@example.com")
+        now = time.time()
+
+        assert list(utils._scan_emails(now - 60, now + 60)) == ["recent@example.com"]
@@ -0,0 +1,193 @@
+import json
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+import bulk_users
+from bulk_users import import_lines, export_users, BulkImporter
+from encryption_utils import decrypt_message, encrypt_message
+from settings import Settings
+
+client = TestClient(app)
+
+ADMIN = Settings(admin_token="admin-secret")
+
+
+def ndjson(*rows):
+    return [json.dumps(row) + "\n" for row in rows]
+
+
+def user_row(i, **overrides):
+    return {"name": f"User {i}", "email": f"user{i}@example.com",
+            "aadhaar": "123456789012", "password": f"Password{i}", **overrides}
+
+
+@patch('bulk_users.hash_password_async', side_effect=lambda password: f"hashed:{password}")
+class TestBulkImport:
+    """Test suite for chunked bulk user import"""
+
+    def test_import_ndjson(self, mock_hash, memory_backend):
+        """Test every valid row is stored with a hashed password and encrypted Aadhaar"""
+        summary = asyncio.run(import_lines(ndjson(user_row(1), user_row(2))))
+        assert summary == {"rows": 2, "created": 2, "duplicates": 0, "invalid": 0, "errors": []}
+
+        auth_id = memory_backend.get_auth_id_by_email("user1@example.com")
+        record = memory_backend.get_user(auth_id)
+        assert record["password"] == "hashed:Password1"
+        assert decrypt_message(record["aadhaar"]) == "123456789012"
+        assert record["profile_version"] == 1
+
+    def test_import_csv(self, mock_hash, memory_backend):
+        """Test CSV input is read using its header row"""
+        lines = ["email,name,aadhaar,password\n",
+                 "csv@example.com,\"Doe, Jane\",123456789012,secret\n"]
+        summary = asyncio.run(import_lines(lines, fmt="csv"))
+        assert summary["created"] == 1
+        auth_id = memory_backend.get_auth_id_by_email("csv@example.com")
+        assert memory_backend.get_user(auth_id)["name"] == "Doe, Jane"
+
+    def test_invalid_rows_are_reported(self, mock_hash, memory_backend):
+        """Test malformed lines and invalid fields are skipped with their row number"""
+        lines = ndjson(user_row(1, aadhaar="12345"), user_row(2, email="not-an-email")) + ["{oops\n"] \
+            + ndjson(user_row(3))
+        summary = asyncio.run(import_lines(lines))
+        assert summary["created"] == 1
+        assert summary["invalid"] == 3
+        assert [error["row"] for error in summary["errors"]] == [1, 2, 3]
+        assert summary["errors"][0]["error"] == "Invalid Aadhaar number"
+
+    def test_duplicate_emails_are_skipped(self, mock_hash, memory_backend):
+        """Test repeated and already registered emails are counted, not created"""
+        asyncio.run(import_lines(ndjson(user_row(1))))
+        summary = asyncio.run(import_lines(ndjson(user_row(1), user_row(2), user_row(2, name="Again"))))
+        assert summary["created"] == 1
+        assert summary["duplicates"] == 2
+
+    def test_writes_one_batch_per_chunk(self, mock_hash, memory_backend):
+        """Test rows are written with one batched create per chunk"""
+        with patch.object(memory_backend, 'create_users', wraps=memory_backend.create_users) as create_users:
+            summary = asyncio.run(import_lines(ndjson(*(user_row(i) for i in range(5))), chunk_size=2))
+        assert summary["created"] == 5
+        assert [len(call.args[0]) for call in create_users.call_args_list] == [2, 2, 1]
+
+    def test_rejects_unknown_format(self, mock_hash):
+        """Test only NDJSON and CSV are accepted"""
+        with pytest.raises(ValueError):
+            asyncio.run(import_lines([], fmt="xml"))
+
+    def test_error_list_is_capped(self, mock_hash, memory_backend):
+        """Test the summary counts every invalid row but lists a bounded number"""
+        importer = BulkImporter()
+        for _ in range(150):
+            asyncio.run(importer.add("not an object"))
+        summary = asyncio.run(importer.finish())
+        assert summary["invalid"] == 150
+        assert len(summary["errors"]) == 100
+
+
+def store_users(backend, count):
+    for i in range(count):
+        backend.create_user(f"auth{i}", {"name": f"User {i}", "email": f"user{i}@example.com",
+                                         "aadhaar": encrypt_message("123456789012"),
+                                         "password": "hashed", "profile_version": 1}, f"user{i}@example.com")
+
+
+class TestExport:
+    """Test suite for streaming NDJSON export"""
+
+    def test_export_without_decryption(self, memory_backend):
+        """Test each user becomes one NDJSON line without the password hash"""
+        store_users(memory_backend, 3)
+        lines = list(export_users())
+        assert len(lines) == 3
+        first = json.loads(lines[0])
+        assert first["auth_id"] == "auth0"
+        assert first["email"] == "user0@example.com"
+        assert "password" not in first
+        assert first["aadhaar"] != "123456789012"
+
+    def test_export_decrypts_in_batches(self, memory_backend):
+        """Test Aadhaar numbers are decrypted with one batch call per page"""
+        store_users(memory_backend, 5)
+        with patch('bulk_users.decrypt_many', wraps=bulk_users.decrypt_many) as decrypt_many:
+            lines = list(export_users(decrypt=True, batch_size=2))
+        assert [json.loads(line)["aadhaar"] for line in lines] == ["123456789012"] * 5
+        assert [len(call.args[0]) for call in decrypt_many.call_args_list] == [2, 2, 1]
+
+    def test_export_survives_undecryptable_record(self, memory_backend):
+        """Test one bad ciphertext is exported as null instead of aborting"""
+        store_users(memory_backend, 2)
+        memory_backend.update_user("auth1", {"aadhaar": "not-a-ciphertext"})
+        rows = [json.loads(line) for line in export_users(decrypt=True)]
+        assert rows[0]["aadhaar"] == "123456789012"
+        assert rows[1]["aadhaar"] is None
+
+    def test_export_is_lazy(self, memory_backend):
+        """Test the export reads users page by page as lines are consumed"""
+        store_users(memory_backend, 5)
+        with patch.object(memory_backend, 'iter_users', wraps=memory_backend.iter_users) as iter_users:
+            lines = export_users(batch_size=2)
+            assert iter_users.call_count == 0
+            next(lines)
+        iter_users.assert_called_once_with(page_size=2)
+
+
+@patch('bulk_users.hash_password_async', side_effect=lambda password: f"hashed:{password}")
+class TestAdminImportEndpoint:
+    """Test suite for POST /admin/users/import"""
+
+    @patch('api.admin.get_settings', return_value=Settings())
+    def test_disabled_without_admin_token(self, mock_settings, mock_hash):
+        """Test admin routes do not exist unless ADMIN_TOKEN is set"""
+        response = client.post("/admin/users/import", content="".join(ndjson(user_row(1))))
+        assert response.status_code == 404
+
+    @patch('api.admin.get_settings', return_value=ADMIN)
+    def test_rejects_wrong_token(self, mock_settings, mock_hash):
+        """Test a missing or wrong admin token is refused"""
+        response = client.post("/admin/users/import", content="", headers={"X-Admin-Token": "wrong"})
+        assert response.status_code == 403
+
+    @patch('api.admin.get_settings', return_value=ADMIN)
+    def test_streams_ndjson_body(self, mock_settings, mock_hash, memory_backend):
+        """Test an NDJSON body is imported and summarized"""
+        response = client.post(
+            "/admin/users/import",
+            content="".join(ndjson(user_row(1), user_row(2))).rstrip("\n"),
+            headers={"X-Admin-Token": "admin-secret", "Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert response.json()["created"] == 2
+        assert memory_backend.get_auth_id_by_email("user2@example.com") is not None
+
+    @patch('api.admin.get_settings', return_value=ADMIN)
+    def test_csv_body(self, mock_settings, mock_hash, memory_backend):
+        """Test a text/csv body is imported using its header row"""
+        response = client.post(
+            "/admin/users/import",
+            content="name,email,aadhaar,password\nCsv User,csv@example.com,123456789012,secret\n",
+            headers={"X-Admin-Token": "admin-secret", "Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        assert response.json()["created"] == 1
+
+
+class TestAdminExportEndpoint:
+    """Test suite for GET /admin/users/export"""
+
+    @patch('api.admin.get_settings', return_value=ADMIN)
+    def test_streams_ndjson(self, mock_settings, memory_backend):
+        """Test the export endpoint streams one NDJSON line per user"""
+        store_users(memory_backend, 3)
+        response = client.get("/admin/users/export?decrypt=true", headers={"X-Admin-Token": "admin-secret"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["auth_id"] for row in rows] == ["auth0", "auth1", "auth2"]
+        assert rows[0]["aadhaar"] == "123456789012"
+
+    @patch('api.admin.get_settings', return_value=ADMIN)
+    def test_requires_admin_token(self, mock_settings):
+        """Test the export is refused without the admin token"""
+        assert client.get("/admin/users/export").status_code == 403
@@ -0,0 +1,152 @@
+import threading
+from cache import TTLCache, SingleFlight
+
+
+class TestTTLCache:
+    """Test suite for the LRU + TTL cache"""
+
+    def test_get_returns_stored_value(self):
+        """Test a stored value is returned and counted as a hit"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_missing_key_counts_as_miss(self):
+        """Test a missing key returns the default and counts as a miss"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        assert cache.get("missing", "default") == "default"
+        assert cache.stats()["misses"] == 1
+
+    def test_entries_expire_after_ttl(self, clock):
+        """Test entries are dropped once their TTL has passed"""
+        cache = TTLCache(maxsize=2, ttl=10, timer=clock)
+        cache.set("a", 1)
+        clock.now += 10
+        assert cache.get("a") is None
+        stats = cache.stats()
+        assert stats["expirations"] == 1
+        assert stats["size"] == 0
+
+    def test_per_entry_ttl_is_capped(self, clock):
+        """Test a per-entry ttl shortens, but never extends, an entry's lifetime"""
+        cache = TTLCache(maxsize=4, ttl=10, timer=clock)
+        cache.set("short", 1, ttl=2)
+        cache.set("long", 2, ttl=100)
+        cache.set("expired", 3, ttl=0)
+        clock.now += 5
+        assert cache.get("short") is None
+        assert cache.get("long") == 2
+        assert "expired" not in cache._data
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_removes_entry(self):
+        """Test invalidate drops a single key"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.invalidate("a")
+        cache.invalidate("never-set")
+        assert cache.get("a") is None
+
+    def test_zero_maxsize_disables_cache(self):
+        """Test a zero-sized cache never stores anything"""
+        cache = TTLCache(maxsize=0, ttl=10)
+        cache.set("a", 1)
+        assert len(cache) == 0
+        assert cache.get("a") is None
+
+
+class TestSingleFlight:
+    """Test suite for thread-level call coalescing"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test callers arriving while a call is in flight reuse its result"""
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def load(key):
+            calls.append(key)
+            started.set()
+            release.wait(5)
+            return {"key": key}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("a", load, "a")))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("a", load, "a"))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        while flight.shared < 3:
+            pass
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        assert calls == ["a"]
+        assert results == [{"key": "a"}] * 4
+        # The next call after completion runs again
+        release.set()
+        flight.do("a", load, "a")
+        assert calls == ["a", "a"]
+
+    def test_errors_are_shared(self):
+        """Test a failing call raises in the waiting callers too"""
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("database unavailable")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("a", fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        while flight.shared < 1:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert len(errors) == 2
+
+    def test_forget_starts_a_new_call(self):
+        """Test a caller after forget does not join the call in flight"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            release.wait(5)
+            return len(calls)
+
+        leader = threading.Thread(target=flight.do, args=("a", load))
+        leader.start()
+        while not calls:
+            pass
+        flight.forget("a")
+        release.set()
+        assert flight.do("a", load) == 2
+        leader.join(5)
@@ -1,10 +1,13 @@
 import pytest
 import base64
-from encryption_utils import encrypt_message, decrypt_message
+from encryption_utils import (
+    encrypt_message, decrypt_message, encrypt_many, decrypt_many, needs_reencryption,
+    AESCipher, AES_KEY, GCM_HEADER, seal_claim, open_claim
+)
 
 
 class TestEncryptionUtils:
-    """Test suite for AES-256-CBC encryption and decryption utilities"""
+    """Test suite for AES encryption and decryption utilities"""
 
     def test_encrypt_message_returns_base64_string(self):
         """Test that encrypt_message returns a base64 encoded string"""
@@ -113,3 +116,63 @@ class TestEncryptionUtils:
         encrypted = encrypt_message(plaintext)
         decrypted = decrypt_message(encrypted)
         assert decrypted == plaintext
+
+    def test_encrypt_many_round_trip(self):
+        """Test batch encryption and decryption preserve order"""
+        plaintexts = ["123456789012", "", "Hello 世界", "A" * 100]
+        encrypted = encrypt_many(plaintexts)
+        assert len(encrypted) == len(plaintexts)
+        assert len(set(encrypted)) == len(plaintexts)
+        assert decrypt_many(encrypted) == plaintexts
+
+    def test_batch_and_single_calls_are_compatible(self):
+        """Test batch output decrypts with the single-message API and vice versa"""
+        encrypted = encrypt_many(["123456789012"])[0]
+        assert decrypt_message(encrypted) == "123456789012"
+        assert decrypt_many([encrypt_message("210987654321")]) == ["210987654321"]
+
+    def test_empty_batch(self):
+        """Test batch APIs accept an empty list"""
+        assert encrypt_many([]) == []
+        assert decrypt_many([]) == []
+
+    def test_cipher_context_with_other_key_cannot_decrypt(self):
+        """Test a context built for a different key rejects the ciphertext"""
+        other = AESCipher(bytes(32))
+        encrypted = AESCipher(AES_KEY).encrypt("123456789012")
+        try:
+            decrypted = other.decrypt(encrypted)
+        except Exception:
+            decrypted = None
+        assert decrypted != "123456789012"
+
+    def test_encrypt_uses_versioned_gcm_envelope(self):
+        """Test new ciphertexts carry the GCM envelope header"""
+        encrypted = encrypt_message("123456789012")
+        assert base64.b64decode(encrypted).startswith(GCM_HEADER)
+        assert needs_reencryption(encrypted) is False
+
+    def test_decrypt_legacy_cbc_ciphertext(self, legacy_ciphertext):
+        """Test ciphertexts written in the legacy CBC format still decrypt"""
+        legacy = legacy_ciphertext("123456789012")
+        assert needs_reencryption(legacy) is True
+        assert decrypt_message(legacy) == "123456789012"
+
+    def test_decrypt_tampered_gcm_tag(self):
+        """Test GCM authentication rejects a modified tag"""
+        encrypted_bytes = bytearray(base64.b64decode(encrypt_message("123456789012")))
+        encrypted_bytes[-1] ^= 0x01
+        with pytest.raises(Exception):
+            decrypt_message(base64.b64encode(bytes(encrypted_bytes)).decode('utf-8'))
+
+    def test_sealed_claim_round_trip(self):
+        """Test a sealed claim opens only for the subject it was sealed to"""
+        sealed = seal_claim("123456789012", "user1")
+        assert "123456789012" not in sealed
+        assert open_claim(sealed, "user1") == "123456789012"
+        assert open_claim(sealed, "user2") is None
+
+    def test_open_claim_rejects_garbage(self):
+        """Test malformed seals open to None instead of raising"""
+        assert open_claim("not-a-seal", "user1") is None
+        assert open_claim(encrypt_message("123456789012"), "user1") is None
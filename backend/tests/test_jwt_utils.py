@@ -1,8 +1,14 @@
 import pytest
 import jwt
 import time
+import base64
 from datetime import datetime, timedelta
-from jwt_utils import create_jwt_token, verify_jwt_token, JWT_SECRET_KEY, JWT_ALGORITHM
+from unittest.mock import patch
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from fastapi.testclient import TestClient
+import jwt_utils
+from jwt_utils import create_jwt_token, verify_jwt_token, profile_claims, KeyRing, JWT_SECRET_KEY, JWT_ALGORITHM
 
 
 class TestJWTUtils:
@@ -137,3 +143,170 @@ class TestJWTUtils:
         payload = verify_jwt_token(token)
         assert payload is not None
         assert payload['user_id'] == user_id
+
+    def test_token_without_profile_has_no_profile_claim(self):
+        """Test that plain tokens carry no profile claims"""
+        payload = verify_jwt_token(create_jwt_token("plain_user"))
+        assert 'profile' not in payload
+
+    def test_token_with_profile_claims(self):
+        """Test that profile claims round-trip through the token"""
+        user = {
+            "auth_id": "profile_user",
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": "encrypted_aadhaar",
+            "password": "hashed_password",
+            "profile_version": 3
+        }
+        token = create_jwt_token(user['auth_id'], profile=profile_claims(user))
+        payload = verify_jwt_token(token)
+        assert payload['profile'] == {
+            "name": "Test User",
+            "email": "test@example.com",
+            "pv": 3
+        }
+
+
+def private_pem(key) -> str:
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption()).decode()
+
+
+def public_pem(key) -> str:
+    return key.public_key().public_bytes(serialization.Encoding.PEM,
+                                         serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+
+
+class TestVerificationCache:
+    """Test suite for the verified-token cache"""
+
+    def test_repeat_verification_skips_signature_check(self):
+        """Test a verified token is served from the cache the second time"""
+        token = create_jwt_token("cached_user")
+        assert verify_jwt_token(token)['user_id'] == "cached_user"
+        with patch('jwt_utils.jwt.decode') as mock_decode:
+            assert verify_jwt_token(token)['user_id'] == "cached_user"
+        mock_decode.assert_not_called()
+        assert jwt_utils.get_token_cache_stats()["hits"] >= 1
+
+    @pytest.fixture(params=["UTC", "Asia/Kolkata", "America/Los_Angeles"])
+    def local_timezone(self, request, monkeypatch):
+        # exp is UTC; the host's zone must not shift the cache entry's lifetime
+        monkeypatch.setenv("TZ", request.param)
+        time.tzset()
+        yield request.param
+        monkeypatch.undo()
+        time.tzset()
+
+    def test_cache_entry_expires_with_token(self, local_timezone):
+        """Test a cached payload is not returned past the token's exp, in any host timezone"""
+        # exp is whole seconds, so leave at least one full second of validity
+        exp = int(time.time()) + 2
+        token = jwt.encode({"user_id": "short_lived", "exp": exp}, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+        assert verify_jwt_token(token) is not None
+        assert len(jwt_utils.token_cache) == 1
+        time.sleep(exp - time.time() + 0.1)
+        assert verify_jwt_token(token) is None
+
+    def test_cached_payload_is_a_copy(self):
+        """Test callers cannot alter the cached payload"""
+        token = create_jwt_token("copy_user")
+        verify_jwt_token(token)['user_id'] = "someone_else"
+        assert verify_jwt_token(token)['user_id'] == "copy_user"
+
+    def test_invalid_tokens_are_not_cached(self):
+        """Test a rejected token is checked again on every call"""
+        verify_jwt_token("invalid.token.string")
+        assert len(jwt_utils.token_cache) == 0
+
+
+class TestKeyRing:
+    """Test suite for asymmetric signing keys and key IDs"""
+
+    @pytest.fixture
+    def keyring(self):
+        def install(keyring):
+            patcher = patch('jwt_utils._keyring', keyring)
+            patcher.start()
+            installed.append(patcher)
+            return keyring
+        installed = []
+        yield install
+        for patcher in installed:
+            patcher.stop()
+
+    @pytest.mark.parametrize("algorithm, key", [
+        ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    ])
+    def test_asymmetric_round_trip_with_kid(self, keyring, algorithm, key):
+        """Test tokens are signed with the private key and carry its kid"""
+        ring = keyring(KeyRing(algorithm, private_key=private_pem(key), key_id="key-1"))
+        token = create_jwt_token("asym_user")
+
+        header = jwt.get_unverified_header(token)
+        assert header["alg"] == algorithm
+        assert header["kid"] == "key-1"
+        assert verify_jwt_token(token)['user_id'] == "asym_user"
+        # Anyone holding the published public key can verify the token
+        public_key = jwt.PyJWK(ring.jwks()["keys"][0]).key
+        assert jwt.decode(token, public_key, algorithms=[algorithm])['user_id'] == "asym_user"
+
+    def test_kid_defaults_to_thumbprint(self, keyring):
+        """Test the signing key is identified by its JWK thumbprint when no kid is set"""
+        ring = keyring(KeyRing("ES256", private_key=private_pem(ec.generate_private_key(ec.SECP256R1()))))
+        jwk = ring.jwks()["keys"][0]
+        assert ring.key_id == jwk["kid"] == jwt_utils.jwk_thumbprint(jwk)
+
+    def test_ec_coordinates_keep_leading_zeros(self, keyring):
+        """Test a P-256 key whose x starts with a zero byte publishes a loadable JWK"""
+        key = next(key for key in (ec.derive_private_key(n, ec.SECP256R1()) for n in range(1, 2000))
+                   if key.public_key().public_numbers().x < 1 << 248)
+        ring = keyring(KeyRing("ES256", private_key=private_pem(key)))
+        jwk = ring.jwks()["keys"][0]
+        assert len(base64.urlsafe_b64decode(jwk["x"] + "=")) == 32
+        assert verify_jwt_token(create_jwt_token("padded_user"))['user_id'] == "padded_user"
+
+    def test_previous_public_key_still_verifies(self, keyring):
+        """Test tokens signed by a rotated-out key verify through JWT_PUBLIC_KEYS"""
+        old_key, new_key = ec.generate_private_key(ec.SECP256R1()), ec.generate_private_key(ec.SECP256R1())
+        keyring(KeyRing("ES256", private_key=private_pem(old_key)))
+        old_token = create_jwt_token("rotated_user")
+
+        ring = keyring(KeyRing("ES256", private_key=private_pem(new_key), public_keys=public_pem(old_key)))
+        assert len(ring.jwks()["keys"]) == 2
+        assert verify_jwt_token(old_token)['user_id'] == "rotated_user"
+
+    def test_unknown_kid_is_rejected(self, keyring):
+        """Test a token from a key outside the ring is refused"""
+        keyring(KeyRing("ES256", private_key=private_pem(ec.generate_private_key(ec.SECP256R1()))))
+        foreign = jwt.encode({"user_id": "x", "exp": datetime.utcnow() + timedelta(days=1)},
+                             ec.generate_private_key(ec.SECP256R1()), algorithm="ES256", headers={"kid": "other"})
+        assert verify_jwt_token(foreign) is None
+
+    def test_algorithm_confusion_is_rejected(self, keyring):
+        """Test an HS256 token is refused when the ring expects ES256"""
+        keyring(KeyRing("ES256", private_key=private_pem(ec.generate_private_key(ec.SECP256R1()))))
+        forged = jwt.encode({"user_id": "x", "exp": datetime.utcnow() + timedelta(days=1)}, "guess", algorithm="HS256")
+        assert verify_jwt_token(forged) is None
+
+    def test_asymmetric_algorithm_requires_private_key(self):
+        """Test ES256 without JWT_PRIVATE_KEY fails clearly"""
+        with pytest.raises(ValueError):
+            KeyRing("ES256", secret="secret")
+
+    def test_jwks_endpoint(self, keyring):
+        """Test the JWKS endpoint publishes only public key material"""
+        from main import app
+        keyring(KeyRing("EdDSA", private_key=private_pem(ed25519.Ed25519PrivateKey.generate()), key_id="ed-1"))
+        response = TestClient(app).get("/.well-known/jwks.json")
+        assert response.status_code == 200
+        assert "max-age" in response.headers["cache-control"]
+        [jwk] = response.json()["keys"]
+        assert (jwk["kid"], jwk["kty"], jwk["alg"]) == ("ed-1", "OKP", "EdDSA")
+        assert "d" not in jwk
+
+    def test_hmac_publishes_no_keys(self):
+        """Test the shared secret is never exposed in the JWKS"""
+        assert KeyRing("HS256", secret="secret").jwks() == {"keys": []}
@@ -0,0 +1,114 @@
+import pytest
+import asyncio
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import metrics
+from metrics import Histogram, timed, MetricsMiddleware, server_timing_header, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def clear_histograms():
+    """Start every test with empty histograms"""
+    metrics.stage_duration.clear()
+    metrics.request_duration.clear()
+    yield
+
+
+class TestHistogram:
+    """Test suite for the Prometheus histogram"""
+
+    def test_observe_buckets_cumulatively(self):
+        """Test observations land in cumulative buckets"""
+        histogram = Histogram("test_seconds", "Test", "stage", buckets=(0.1, 1.0))
+        histogram.observe("a", 0.05)
+        histogram.observe("a", 0.5)
+        histogram.observe("a", 5)
+        text = histogram.render()
+        assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in text
+        assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+        assert 'test_seconds_count{stage="a"} 3' in text
+
+    def test_render_metrics_includes_gauges_and_counters(self):
+        """Test gauges and counters are rendered with their types"""
+        text = render_metrics(gauges={"pool_queued": 2}, counters={"cache_hits_total": 7})
+        assert "# TYPE pool_queued gauge\npool_queued 2" in text
+        assert "# TYPE cache_hits_total counter\ncache_hits_total 7" in text
+
+
+class TestTimed:
+    """Test suite for the timed decorator"""
+
+    @patch('metrics.METRICS_ENABLED', True)
+    def test_sync_function_recorded(self):
+        """Test a sync stage is recorded when metrics are enabled"""
+        @timed("test.sync")
+        def work():
+            return 42
+
+        assert work() == 42
+        assert metrics.stage_duration.snapshot()["test.sync"][2] == 1
+
+    @patch('metrics.METRICS_ENABLED', True)
+    def test_async_function_recorded(self):
+        """Test an async stage is recorded when metrics are enabled"""
+        @timed("test.async")
+        async def work():
+            return 42
+
+        assert asyncio.run(work()) == 42
+        assert metrics.stage_duration.snapshot()["test.async"][2] == 1
+
+    @patch('metrics.METRICS_ENABLED', False)
+    def test_disabled_records_nothing(self):
+        """Test nothing is recorded when metrics are disabled"""
+        @timed("test.disabled")
+        def work():
+            return 42
+
+        assert work() == 42
+        assert metrics.stage_duration.snapshot() == {}
+
+
+class TestMetricsMiddleware:
+    """Test suite for request timing and Server-Timing headers"""
+
+    def _client(self, server_timing):
+        app = FastAPI()
+
+        @timed("test.stage")
+        def stage():
+            return "ok"
+
+        @app.get("/items/{item_id}")
+        def read_item(item_id: str):
+            return {"item": stage()}
+
+        app.add_middleware(MetricsMiddleware, server_timing=server_timing)
+        return TestClient(app)
+
+    @patch('metrics.METRICS_ENABLED', True)
+    def test_server_timing_header(self):
+        """Test stages of the request are reported in Server-Timing"""
+        response = self._client(server_timing=True).get("/items/1")
+        header = response.headers["server-timing"]
+        assert "test-stage;dur=" in header
+        assert "total;dur=" in header
+
+    @patch('metrics.METRICS_ENABLED', True)
+    def test_requests_labelled_by_route_template(self):
+        """Test request durations use the route template, not the raw path"""
+        client = self._client(server_timing=False)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        snapshot = metrics.request_duration.snapshot()
+        assert snapshot["GET /items/{item_id}"][2] == 2
+        assert snapshot["other"][2] == 1
+        assert "server-timing" not in client.get("/items/3").headers
+
+    def test_server_timing_header_sums_repeated_stages(self):
+        """Test repeated stages are summed into one entry"""
+        value = server_timing_header([("db.read", 0.001), ("db.read", 0.002)])
+        assert value == "db-read;dur=3.000"
@@ -1,5 +1,10 @@
 import pytest
-from password_utils import hash_password, verify_password
+import asyncio
+from password_utils import (
+    hash_password, verify_password, hash_password_async, verify_password_async, HashingPool,
+    needs_rehash, calibrate_argon2
+)
+from argon2 import PasswordHasher
 from argon2.exceptions import InvalidHashError
 
 
@@ -76,3 +81,78 @@ class TestPasswordUtils:
         hashed = hash_password(password)
         assert verify_password(hashed, password) is True
         assert verify_password(hashed, password.strip()) is False
+
+    def test_needs_rehash_false_for_current_parameters(self):
+        """Test a hash made with the current parameters is kept"""
+        assert needs_rehash(hash_password("password")) is False
+
+    def test_needs_rehash_true_for_outdated_parameters(self):
+        """Test a hash made with other parameters is flagged for rehashing"""
+        old_hash = PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash("password")
+        assert verify_password(old_hash, "password") is True
+        assert needs_rehash(old_hash) is True
+
+    def test_needs_rehash_invalid_hash(self):
+        """Test an invalid hash is not flagged"""
+        assert needs_rehash("not_a_valid_argon2_hash") is False
+
+
+class TestCalibration:
+    """Test suite for Argon2 parameter calibration"""
+
+    def test_calibrate_respects_memory_budget(self):
+        """Test calibration never exceeds the memory budget"""
+        params = calibrate_argon2(target_ms=5, max_memory_kib=16384, parallelism=1, max_time_cost=2)
+        assert params["memory_cost"] <= 16384
+        assert 1 <= params["time_cost"] <= 2
+        assert params["parallelism"] == 1
+        assert params["measured_ms"] > 0
+
+    def test_calibrate_shrinks_memory_for_tiny_targets(self):
+        """Test an unreachable target falls back to the memory floor with one pass"""
+        params = calibrate_argon2(target_ms=0.001, max_memory_kib=32768, parallelism=1)
+        assert params["memory_cost"] == 8192
+        assert params["time_cost"] == 1
+
+
+class TestHashingPool:
+    """Test suite for the Argon2 worker pool"""
+
+    def test_async_hash_and_verify_round_trip(self):
+        """Test hashing and verifying on the pool"""
+        async def run():
+            hashed = await hash_password_async("poolPassword1")
+            return await verify_password_async(hashed, "poolPassword1")
+
+        assert asyncio.run(run()) is True
+
+    def test_async_verify_wrong_password(self):
+        """Test pool verification rejects a wrong password"""
+        hashed = hash_password("poolPassword1")
+        assert asyncio.run(verify_password_async(hashed, "wrong")) is False
+
+    def test_pool_reports_queue_depth(self):
+        """Test that calls beyond the worker count are reported as queued"""
+        pool = HashingPool(workers=1, kind="thread")
+        snapshots = []
+
+        async def run():
+            tasks = [asyncio.ensure_future(pool.run(hash_password, "x")) for _ in range(3)]
+            await asyncio.sleep(0)
+            snapshots.append(pool.stats())
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        pool.shutdown()
+
+        assert snapshots[0]["running"] == 1
+        assert snapshots[0]["queued"] == 2
+        stats = pool.stats()
+        assert stats["queued"] == 0
+        assert stats["running"] == 0
+        assert stats["completed"] == 3
+
+    def test_pool_rejects_unknown_executor(self):
+        """Test that an unknown executor kind is rejected"""
+        with pytest.raises(ValueError):
+            HashingPool(kind="fiber")
@@ -0,0 +1,127 @@
+import pytest
+from rate_limit import (
+    parse_rate, TokenBucketLimiter, SlidingWindowLimiter, MemoryWindowStore, SQLiteWindowStore,
+    LoginRateLimiter, create_limiter
+)
+
+
+class TestTokenBucketLimiter:
+    """Test suite for the in-process token bucket"""
+
+    def test_allows_burst_then_rejects(self, clock):
+        """Test the bucket allows its capacity and then rejects"""
+        limiter = TokenBucketLimiter(3, 60, clock=clock)
+        assert [limiter.hit("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert limiter.hit("k") == pytest.approx(20.0)
+
+    def test_refills_over_time(self, clock):
+        """Test tokens come back at capacity/period per second"""
+        limiter = TokenBucketLimiter(3, 60, clock=clock)
+        for _ in range(3):
+            limiter.hit("k")
+        clock.now += 20
+        assert limiter.hit("k") == 0.0
+        assert limiter.hit("k") > 0
+
+    def test_keys_are_independent(self, clock):
+        """Test one key's budget does not affect another"""
+        limiter = TokenBucketLimiter(1, 60, clock=clock)
+        assert limiter.hit("a") == 0.0
+        assert limiter.hit("b") == 0.0
+        assert limiter.hit("a") > 0
+
+    def test_bounded_number_of_keys(self, clock):
+        """Test old buckets are dropped beyond max_keys"""
+        limiter = TokenBucketLimiter(1, 60, max_keys=2, clock=clock)
+        for key in ("a", "b", "c"):
+            limiter.hit(key)
+        assert len(limiter._buckets) == 2
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def window_store(request, tmp_path):
+    """Each sliding-window counter store"""
+    if request.param == "memory":
+        return MemoryWindowStore()
+    return SQLiteWindowStore(str(tmp_path / "rate.db"))
+
+
+class TestSlidingWindowLimiter:
+    """Test suite for the shareable sliding-window limiter"""
+
+    def test_rejects_over_limit(self, window_store, clock):
+        """Test attempts beyond the limit within one window are rejected"""
+        clock.now = 600
+        limiter = SlidingWindowLimiter(2, 60, window_store, clock=clock)
+        assert limiter.hit("k") == 0.0
+        assert limiter.hit("k") == 0.0
+        assert limiter.hit("k") >= 1.0
+
+    def test_previous_window_weighs_in(self, window_store, clock):
+        """Test hits from the previous window still count while they overlap"""
+        clock.now = 600
+        limiter = SlidingWindowLimiter(2, 60, window_store, clock=clock)
+        limiter.hit("k")
+        limiter.hit("k")
+        clock.now = 660 + 6  # 10% into the next window: 2 * 0.9 + 1 > 2
+        assert limiter.hit("k") > 0
+        clock.now = 720 + 30  # halfway into the window after: 1 * 0.5 + 1 <= 2
+        assert limiter.hit("k") == 0.0
+
+    def test_shared_between_limiter_instances(self, tmp_path, clock):
+        """Test two workers sharing a SQLite store see each other's attempts"""
+        path = str(tmp_path / "shared.db")
+        clock.now = 600
+        worker_a = SlidingWindowLimiter(2, 60, SQLiteWindowStore(path), clock=clock)
+        worker_b = SlidingWindowLimiter(2, 60, SQLiteWindowStore(path), clock=clock)
+        assert worker_a.hit("k") == 0.0
+        assert worker_b.hit("k") == 0.0
+        assert worker_a.hit("k") > 0
+
+    def test_expired_counters_of_other_keys_are_dropped(self, window_store, clock):
+        """Test an increment purges every key's expired windows, not just its own"""
+        clock.now = 600
+        limiter = SlidingWindowLimiter(2, 60, window_store, clock=clock)
+        for key in ("a", "b", "c"):
+            limiter.hit(key)
+        clock.now = 720
+        limiter.hit("d")
+        assert window_store.increment("a", 10, 60) == (1, 0)
+
+    def test_mixed_periods_share_a_store(self, window_store, clock):
+        """Test a short-period limiter does not purge a long-period limiter's counters"""
+        clock.now = 3600
+        hourly = SlidingWindowLimiter(1, 3600, window_store, clock=clock)
+        minutely = SlidingWindowLimiter(100, 60, window_store, clock=clock)
+        assert hourly.hit("k") == 0.0
+        clock.now = 3600 + 600
+        minutely.hit("other")
+        assert hourly.hit("k") > 0
+
+
+class TestLoginRateLimiter:
+    """Test suite for the combined per-IP and per-email login limiter"""
+
+    def test_email_budget_applies_across_ips(self):
+        """Test one email is limited even when attempts come from many IPs"""
+        limiter = LoginRateLimiter(create_limiter("100/60", "memory"), create_limiter("2/60", "memory"))
+        assert limiter.check("1.1.1.1", "victim@example.com") == 0.0
+        assert limiter.check("2.2.2.2", "victim@example.com") == 0.0
+        assert limiter.check("3.3.3.3", "victim@example.com") > 0
+
+    def test_ip_budget_applies_across_emails(self):
+        """Test one IP is limited even when it sprays many emails"""
+        limiter = LoginRateLimiter(create_limiter("2/60", "memory"), create_limiter("100/60", "memory"))
+        assert limiter.check("1.1.1.1", "a@example.com") == 0.0
+        assert limiter.check("1.1.1.1", "b@example.com") == 0.0
+        assert limiter.check("1.1.1.1", "c@example.com") > 0
+
+    def test_disabled_limiter_allows_everything(self):
+        """Test a disabled limiter never rejects"""
+        limiter = LoginRateLimiter(create_limiter("1/60", "memory"), create_limiter("1/60", "memory"),
+                                   enabled=False)
+        assert all(limiter.check("1.1.1.1", "a@example.com") == 0.0 for _ in range(5))
+
+    def test_parse_rate(self):
+        """Test rate strings are parsed into attempts and seconds"""
+        assert parse_rate("10/60") == (10, 60.0)
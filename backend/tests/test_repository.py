@@ -0,0 +1,134 @@
+import pytest
+import asyncio
+import threading
+from unittest.mock import patch
+import repository
+
+
+class TestRepository:
+    """Test suite for the async data access layer"""
+
+    @patch('repository.utils.fetch_user_by_auth_id')
+    def test_get_user_by_auth_id_delegates(self, mock_get_user):
+        """Test get_user_by_auth_id awaits the utils lookup"""
+        mock_get_user.return_value = {"auth_id": "auth123", "name": "Test User"}
+
+        user = asyncio.run(repository.get_user_by_auth_id("auth123"))
+        assert user["name"] == "Test User"
+        mock_get_user.assert_called_once_with("auth123")
+
+    @patch('repository.utils.fetch_user_by_auth_id')
+    def test_get_user_by_auth_id_cache_hit_skips_database(self, mock_fetch):
+        """Test a cached user is returned without touching the database"""
+        repository.utils.user_cache.set("auth123", {"auth_id": "auth123", "name": "Cached"})
+
+        user = asyncio.run(repository.get_user_by_auth_id("auth123"))
+        assert user["name"] == "Cached"
+        mock_fetch.assert_not_called()
+
+    @patch('repository.utils.create_user')
+    def test_create_user_passes_keyword_arguments(self, mock_create_user):
+        """Test create_user forwards every field"""
+        mock_create_user.return_value = True
+
+        result = asyncio.run(repository.create_user(
+            auth_id="auth123", name="Test User", email="test@example.com",
+            aadhaar="encrypted", password="hashed"))
+        assert result is True
+        mock_create_user.assert_called_once_with(
+            auth_id="auth123", name="Test User", email="test@example.com",
+            aadhaar="encrypted", password="hashed")
+
+    @patch('repository.utils.get_user_by_email')
+    def test_calls_run_off_the_event_loop(self, mock_get_user):
+        """Test blocking database calls run on a worker thread"""
+        threads = []
+        mock_get_user.side_effect = lambda email: threads.append(threading.current_thread().name)
+
+        asyncio.run(repository.get_user_by_email("test@example.com"))
+        assert threads[0].startswith("db-io")
+
+    @patch('repository.utils.fetch_user_by_auth_id')
+    def test_concurrent_lookups_overlap(self, mock_get_user):
+        """Test that slow lookups run concurrently instead of serially"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def slow_lookup(auth_id):
+            barrier.wait()
+            return {"auth_id": auth_id}
+
+        mock_get_user.side_effect = slow_lookup
+
+        async def run():
+            return await asyncio.gather(*(repository.get_user_by_auth_id(f"id{i}") for i in range(3)))
+
+        users = asyncio.run(run())
+        assert [user["auth_id"] for user in users] == ["id0", "id1", "id2"]
+
+    @patch('repository.utils.email_exists')
+    def test_errors_propagate(self, mock_email_exists):
+        """Test exceptions from the database surface to the caller"""
+        mock_email_exists.side_effect = RuntimeError("database unavailable")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(repository.email_exists("test@example.com"))
+
+
+class TestLookupCoalescing:
+    """Test suite for sharing concurrent identical lookups"""
+
+    @patch('repository.utils.fetch_user_by_auth_id')
+    def test_identical_lookups_share_one_read(self, mock_fetch):
+        """Test parallel requests for one auth_id make a single backend read"""
+        release = threading.Event()
+
+        def slow_lookup(auth_id):
+            release.wait(5)
+            return {"auth_id": auth_id, "name": "Shared"}
+
+        mock_fetch.side_effect = slow_lookup
+
+        async def run():
+            lookups = [asyncio.ensure_future(repository.get_user_by_auth_id("auth123")) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*lookups)
+
+        users = asyncio.run(run())
+        mock_fetch.assert_called_once_with("auth123")
+        assert [user["name"] for user in users] == ["Shared"] * 5
+        # Each caller gets its own copy
+        assert len({id(user) for user in users}) == 5
+
+    @patch('repository.utils.get_user_by_email')
+    def test_email_lookups_coalesce_on_normalized_email(self, mock_get_user):
+        """Test login retries that differ only in case share one read"""
+        release = threading.Event()
+        mock_get_user.side_effect = lambda email: release.wait(5) and {"email": "test@example.com"}
+
+        async def run():
+            lookups = [asyncio.ensure_future(repository.get_user_by_email(email))
+                       for email in ("test@example.com", "TEST@example.com ")]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*lookups)
+
+        assert asyncio.run(run()) == [{"email": "test@example.com"}] * 2
+        assert mock_get_user.call_count == 1
+
+    @patch('repository.utils.fetch_user_by_auth_id')
+    def test_cancelled_caller_does_not_cancel_shared_read(self, mock_fetch):
+        """Test the remaining callers still get the result if the first one goes away"""
+        release = threading.Event()
+        mock_fetch.side_effect = lambda auth_id: release.wait(5) and {"auth_id": auth_id}
+
+        async def run():
+            first = asyncio.ensure_future(repository.get_user_by_auth_id("auth123"))
+            second = asyncio.ensure_future(repository.get_user_by_auth_id("auth123"))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            release.set()
+            return await second
+
+        assert asyncio.run(run()) == {"auth_id": "auth123"}
+        mock_fetch.assert_called_once()
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+from serve import server_options, hash_workers_per_process
+
+
+class TestServerOptions:
+    """Test suite for the production server configuration"""
+
+    def test_defaults(self):
+        """Test production defaults: no reload, tuned keep-alive and backlog"""
+        options = server_options({})
+        assert options["reload"] is False
+        assert options["port"] == 8002
+        assert options["workers"] >= 1
+        assert options["timeout_keep_alive"] == 5
+        assert options["backlog"] == 2048
+        assert options["timeout_graceful_shutdown"] == 30
+
+    def test_environment_overrides(self):
+        """Test settings are read from the environment"""
+        options = server_options({
+            "PORT": "9000",
+            "WEB_CONCURRENCY": "3",
+            "KEEP_ALIVE": "15",
+            "BACKLOG": "4096"
+        })
+        assert options["port"] == 9000
+        assert options["workers"] == 3
+        assert options["timeout_keep_alive"] == 15
+        assert options["backlog"] == 4096
+
+    @patch('serve._available', return_value=False)
+    def test_falls_back_without_uvloop_and_httptools(self, mock_available):
+        """Test the pure-Python loop and parser are used when extras are missing"""
+        options = server_options({})
+        assert options["loop"] == "asyncio"
+        assert options["http"] == "h11"
+
+    @patch('serve.os.cpu_count', return_value=8)
+    def test_hash_workers_split_across_processes(self, mock_cpu_count):
+        """Test Argon2 pool size is divided between worker processes"""
+        assert hash_workers_per_process(4) == 2
+        assert hash_workers_per_process(16) == 1
@@ -0,0 +1,175 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+import sessions
+from sessions import RevocationSet, TokenRevocations, RefreshTokenError
+from jwt_utils import create_jwt_token, verify_jwt_token
+
+
+class TestRevocationSet:
+    """Test suite for the time-bucketed revocation set"""
+
+    def test_revoked_until_exp(self, clock):
+        """Test an id is revoked until its token's exp"""
+        revoked = RevocationSet(bucket_seconds=60, clock=clock)
+        revoked.add("jti1", exp=1100.0)
+        assert "jti1" in revoked
+        assert "other" not in revoked
+        clock.now = 1100.0
+        assert "jti1" not in revoked
+
+    def test_already_expired_ids_are_not_stored(self, clock):
+        """Test revoking an expired token keeps nothing"""
+        revoked = RevocationSet(clock=clock)
+        revoked.add("jti1", exp=999.0)
+        assert len(revoked) == 0
+
+    def test_sweep_drops_expired_buckets(self, clock):
+        """Test memory is released bucket by bucket as tokens expire"""
+        revoked = RevocationSet(bucket_seconds=60, clock=clock)
+        revoked.add("soon", exp=1010.0)
+        revoked.add("later", exp=2000.0)
+        clock.now = 1100.0
+        assert revoked.sweep() == 1
+        assert len(revoked) == 1
+        assert "later" in revoked
+
+
+class TestTokenRevocations:
+    """Test suite for revocations shared through the storage backend"""
+
+    def test_revoke_is_immediate_locally(self, memory_backend, clock):
+        """Test the revoking worker rejects the token without a sync"""
+        revocations = TokenRevocations(clock=clock)
+        revocations.revoke("jti1", exp=2000.0)
+        assert revocations.is_revoked("jti1")
+        assert memory_backend.get_revoked_tokens() == [("jti1", 2000.0)]
+
+    def test_sync_picks_up_other_workers(self, memory_backend, clock):
+        """Test a worker learns another worker's revocations on its next poll"""
+        worker_a, worker_b = TokenRevocations(clock=clock), TokenRevocations(clock=clock)
+        worker_b.sync()
+
+        clock.now += 5
+        worker_a.revoke("jti1", exp=2000.0)
+        assert not worker_b.is_revoked("jti1")
+        worker_b.sync()
+        assert worker_b.is_revoked("jti1")
+        assert worker_b.stats()["revoked"] == 1
+
+    def test_sync_purges_expired_revocations(self, memory_backend, clock):
+        """Test expired revocations are deleted from the store"""
+        memory_backend.revoke_token("expired", exp=500.0, revoked_at=100.0)
+        revocations = TokenRevocations(clock=clock)
+        revocations.sync()
+        assert memory_backend.get_revoked_tokens() == []
+        assert not revocations.is_revoked("expired")
+
+    def test_tokens_without_jti_are_not_revoked(self):
+        """Test tokens issued before jti existed still verify"""
+        assert TokenRevocations().is_revoked(None) is False
+
+
+@pytest.mark.usefixtures("memory_backend")
+class TestLogoutRevokesToken:
+    """Test suite for logout invalidating the token"""
+
+    @pytest.fixture(autouse=True)
+    def revocations(self):
+        revocations = TokenRevocations()
+        with patch('jwt_utils.revocations', revocations), patch('repository.revocations', revocations):
+            yield revocations
+
+    def test_tokens_carry_unique_jti(self):
+        """Test every token gets its own id"""
+        first, second = verify_jwt_token(create_jwt_token("user")), verify_jwt_token(create_jwt_token("user"))
+        assert first["jti"] != second["jti"]
+
+    def test_logout_revokes_token(self):
+        """Test a token stops verifying after logout, even if it was cached"""
+        from main import app
+        token = create_jwt_token("auth123")
+        assert verify_jwt_token(token) is not None
+
+        client = TestClient(app)
+        client.cookies.set("token", token)
+        response = client.post("/logout")
+        assert response.status_code == 200
+        assert verify_jwt_token(token) is None
+
+    def test_logout_leaves_other_sessions(self):
+        """Test only the logged-out token is revoked"""
+        from main import app
+        token, other = create_jwt_token("auth123"), create_jwt_token("auth123")
+        client = TestClient(app)
+        client.cookies.set("token", token)
+        client.post("/logout")
+        assert verify_jwt_token(other) is not None
+
+
+@pytest.mark.usefixtures("memory_backend")
+class TestRefreshSessions:
+    """Test suite for refresh token rotation"""
+
+    @pytest.fixture(autouse=True)
+    def revocations(self, clock):
+        revocations = TokenRevocations(clock=clock)
+        with patch('sessions.revocations', revocations):
+            yield revocations
+
+    def test_only_the_hash_is_stored(self, memory_backend, clock):
+        """Test the refresh secret itself never reaches storage"""
+        session = sessions.start_session("auth123", clock=clock)
+        record = memory_backend.get_session(session.session_id)
+        assert session.refresh_token.split(".", 1)[1] not in str(record)
+        assert record["exp"] == 1000.0 + sessions.REFRESH_TOKEN_TTL
+
+    def test_rotation_issues_a_new_token(self, clock):
+        """Test each refresh returns the next token of the same session"""
+        session = sessions.start_session("auth123", clock=clock)
+        rotated = sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        assert rotated.session_id == session.session_id
+        assert rotated.auth_id == "auth123"
+        assert rotated.refresh_token not in (None, session.refresh_token)
+        assert sessions.rotate_refresh_token(rotated.refresh_token, clock=clock).refresh_token
+
+    def test_concurrent_refresh_within_grace(self, revocations, clock):
+        """Test a just-rotated token still refreshes, without a new refresh token"""
+        session = sessions.start_session("auth123", clock=clock)
+        sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        clock.now += sessions.REFRESH_REUSE_GRACE / 2
+
+        again = sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        assert again.refresh_token is None
+        assert not revocations.is_revoked(session.session_id)
+
+    def test_reuse_ends_the_session(self, memory_backend, revocations, clock):
+        """Test presenting a rotated-out token ends the session and revokes its access tokens"""
+        session = sessions.start_session("auth123", clock=clock)
+        rotated = sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        clock.now += sessions.REFRESH_REUSE_GRACE + 1
+
+        with pytest.raises(RefreshTokenError):
+            sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        assert memory_backend.get_session(session.session_id) is None
+        assert revocations.is_revoked(session.session_id)
+        with pytest.raises(RefreshTokenError):
+            sessions.rotate_refresh_token(rotated.refresh_token, clock=clock)
+
+    def test_expired_and_malformed_tokens_are_rejected(self, clock):
+        """Test tokens past the session's absolute lifetime or without a secret fail"""
+        session = sessions.start_session("auth123", clock=clock)
+        clock.now += sessions.REFRESH_TOKEN_TTL
+        with pytest.raises(RefreshTokenError):
+            sessions.rotate_refresh_token(session.refresh_token, clock=clock)
+        with pytest.raises(RefreshTokenError):
+            sessions.rotate_refresh_token("no-secret")
+
+    def test_ended_session_revokes_access_tokens(self, revocations):
+        """Test access tokens carrying the session id stop verifying when it ends"""
+        session = sessions.start_session("auth123")
+        token = create_jwt_token("auth123", claims={"sid": session.session_id})
+        with patch('jwt_utils.revocations', revocations):
+            assert verify_jwt_token(token) is not None
+            sessions.end_session(session.session_id, exp=session.exp)
+            assert verify_jwt_token(token) is None
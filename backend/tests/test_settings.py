@@ -0,0 +1,76 @@
+import os
+import sys
+import subprocess
+import pytest
+from unittest.mock import patch
+import firebase_config
+import encryption_utils
+from settings import Settings, get_settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestSettings:
+    """Test suite for the lazily loaded process settings"""
+
+    def test_reads_environment(self):
+        """Test secrets and Firebase credentials are read from the environment"""
+        env = {
+            "ENCRYPTION_KEY": "enc",
+            "JWT_SECRET_KEY": "jwt",
+            "FIREBASE_PRIVATE_KEY": "line1\\nline2",
+            "FIREBASE_DATABASE_URL": "https://example.firebaseio.com"
+        }
+        with patch.dict(os.environ, env):
+            settings = Settings.from_env()
+        assert settings.encryption_key == "enc"
+        assert settings.jwt_secret_key == "jwt"
+        assert settings.firebase_credentials["private_key"] == "line1\nline2"
+        assert settings.firebase_database_url == "https://example.firebaseio.com"
+
+    def test_missing_firebase_vars(self):
+        """Test unset required Firebase variables are reported by name"""
+        settings = Settings(firebase_credentials={"type": "service_account"})
+        missing = settings.missing_firebase_vars()
+        assert "FIREBASE_PRIVATE_KEY" in missing
+        assert "FIREBASE_DATABASE_URL" in missing
+        assert "FIREBASE_TYPE" not in missing
+
+    def test_get_settings_is_cached(self):
+        """Test the environment is read once per process"""
+        assert get_settings() is get_settings()
+
+    def test_import_does_not_initialize_firebase_or_keys(self):
+        """Test importing the app needs no credentials and builds no clients"""
+        code = (
+            "import sys, main, firebase_config, encryption_utils;"
+            "assert firebase_config._app is None;"
+            "assert encryption_utils._cipher is None;"
+            "assert 'firebase_admin' not in sys.modules"
+        )
+        env = {"PATH": os.environ.get("PATH", ""), "ENV_FILE": os.devnull}
+        result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+
+class TestLazyInitialization:
+    """Test suite for clients built on first use"""
+
+    @patch('firebase_config._app', None)
+    @patch('firebase_config.get_settings', return_value=Settings())
+    def test_firebase_without_credentials_fails_on_first_use(self, mock_settings):
+        """Test missing Firebase configuration raises a clear error on use"""
+        with pytest.raises(ValueError, match="FIREBASE_PRIVATE_KEY"):
+            firebase_config.get_database()
+
+    @patch('encryption_utils._cipher', None)
+    @patch('encryption_utils.get_settings', return_value=Settings())
+    def test_cipher_without_key_fails_on_first_use(self, mock_settings):
+        """Test a missing ENCRYPTION_KEY raises when the cipher is needed"""
+        with pytest.raises(ValueError, match="ENCRYPTION_KEY"):
+            encryption_utils.encrypt_message("123456789012")
+
+    def test_cipher_is_shared(self):
+        """Test the application cipher is built once"""
+        assert encryption_utils.get_cipher() is encryption_utils.cipher
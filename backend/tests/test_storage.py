@@ -0,0 +1,671 @@
+import pytest
+from unittest.mock import Mock, patch
+from concurrent.futures import ThreadPoolExecutor
+from storage import create_backend, EmailAlreadyExistsError
+from storage.memory import MemoryBackend
+from storage.sqlite import SQLiteBackend
+from storage.firebase import FirebaseBackend, EMAIL_INDEX_NODE, REVOKED_TOKENS_NODE, SESSIONS_NODE, email_index_key
+from storage.replica import ReplicatedBackend
+
+
+RECORD = {
+    "name": "Test User",
+    "email": "Test@Example.com",
+    "aadhaar": "encrypted",
+    "password": "hashed"
+}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def local_backend(request):
+    """Each local backend, freshly created"""
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(":memory:")
+    yield backend
+    backend.close()
+
+
+class TestLocalBackends:
+    """Behaviour shared by the in-memory and SQLite backends"""
+
+    def test_create_and_get_user(self, local_backend):
+        """Test a stored record can be read back by auth_id"""
+        local_backend.create_user("auth123", RECORD, "test@example.com")
+        assert local_backend.get_user("auth123") == RECORD
+
+    def test_get_missing_user(self, local_backend):
+        """Test a missing auth_id returns None"""
+        assert local_backend.get_user("missing") is None
+
+    def test_lookup_by_email(self, local_backend):
+        """Test the email index resolves to the auth_id"""
+        local_backend.create_user("auth123", RECORD, "test@example.com")
+        assert local_backend.get_auth_id_by_email("test@example.com") == "auth123"
+        assert local_backend.get_auth_id_by_email("other@example.com") is None
+
+    def test_iter_users(self, local_backend):
+        """Test iter_users yields every stored user"""
+        local_backend.create_user("a", RECORD, "a@example.com")
+        local_backend.create_user("b", RECORD, "b@example.com")
+        assert sorted(auth_id for auth_id, _ in local_backend.iter_users()) == ["a", "b"]
+        assert local_backend.rebuild_email_index() == 2
+
+    def test_update_user(self, local_backend):
+        """Test update_user merges fields into the stored record"""
+        local_backend.create_user("a", RECORD, "test@example.com")
+        local_backend.update_user("a", {"aadhaar": "reencrypted"})
+        assert local_backend.get_user("a") == {**RECORD, "aadhaar": "reencrypted"}
+
+    def test_duplicate_email_rejected(self, local_backend):
+        """Test a second user with the same email is rejected and not stored"""
+        local_backend.create_user("a", RECORD, "test@example.com")
+        with pytest.raises(EmailAlreadyExistsError):
+            local_backend.create_user("b", RECORD, "test@example.com")
+        assert local_backend.get_auth_id_by_email("test@example.com") == "a"
+        assert local_backend.get_user("b") is None
+
+    def test_concurrent_signups_for_one_email(self, local_backend):
+        """Test exactly one of many concurrent creates for an email wins"""
+        def attempt(i):
+            try:
+                local_backend.create_user(f"user{i}", RECORD, "race@example.com")
+                return True
+            except EmailAlreadyExistsError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(attempt, range(16)))
+        assert results.count(True) == 1
+
+    def test_revoked_tokens(self, local_backend):
+        """Test revocations are listed by revocation time and purged after exp"""
+        local_backend.revoke_token("old", exp=200.0, revoked_at=10.0)
+        local_backend.revoke_token("new", exp=500.0, revoked_at=20.0)
+
+        assert sorted(local_backend.get_revoked_tokens()) == [("new", 500.0), ("old", 200.0)]
+        assert local_backend.get_revoked_tokens(since=15.0) == [("new", 500.0)]
+        assert local_backend.purge_revoked_tokens(now=300.0) == 1
+        assert local_backend.get_revoked_tokens() == [("new", 500.0)]
+
+    def test_sessions(self, local_backend):
+        """Test a session rotates only from its current hash and is purged by age"""
+        local_backend.create_session("s1", {"auth_id": "auth1", "token_hash": "h1", "created_at": 10.0})
+        local_backend.create_session("s2", {"auth_id": "auth2", "token_hash": "h2", "created_at": 20.0})
+
+        assert local_backend.rotate_session("s1", "h1", {"token_hash": "h3", "previous_hash": "h1"}) is True
+        assert local_backend.rotate_session("s1", "h1", {"token_hash": "h4"}) is False
+        assert local_backend.get_session("s1")["token_hash"] == "h3"
+        assert local_backend.get_session("s1")["previous_hash"] == "h1"
+        assert local_backend.purge_sessions(created_before=15.0) == 1
+        assert local_backend.get_session("s1") is None
+        local_backend.delete_session("s2")
+        assert local_backend.get_session("s2") is None
+
+    def test_iter_users_pages_in_key_order(self, local_backend):
+        """Test a paged scan yields every user once, ordered by auth_id"""
+        for auth_id in ["c", "a", "e", "b", "d"]:
+            local_backend.create_user(auth_id, RECORD, f"{auth_id}@example.com")
+        assert [auth_id for auth_id, _ in local_backend.iter_users(page_size=2)] == ["a", "b", "c", "d", "e"]
+
+    def test_iter_users_from_start_key(self, local_backend):
+        """Test start_at limits the scan to auth_ids at or after it"""
+        for auth_id in ["a", "b", "c", "d"]:
+            local_backend.create_user(auth_id, RECORD, f"{auth_id}@example.com")
+        assert [auth_id for auth_id, _ in local_backend.iter_users(page_size=1, start_at="b")] == ["b", "c", "d"]
+
+    def test_iter_users_key_range(self, local_backend):
+        """Test end_at stops the scan after the last auth_id at or before it"""
+        for auth_id in ["a", "b", "c", "d"]:
+            local_backend.create_user(auth_id, RECORD, f"{auth_id}@example.com")
+        scan = local_backend.iter_users(page_size=1, start_at="b", end_at="c")
+        assert [auth_id for auth_id, _ in scan] == ["b", "c"]
+        assert [auth_id for auth_id, _ in local_backend.iter_users(end_at="a")] == ["a"]
+
+    def test_get_users(self, local_backend):
+        """Test the batch read returns only the auth_ids that exist"""
+        local_backend.create_user("a", RECORD, "a@example.com")
+        local_backend.create_user("b", RECORD, "b@example.com")
+        assert local_backend.get_users(["a", "missing", "b"]) == {"a": RECORD, "b": RECORD}
+        assert local_backend.get_users([]) == {}
+
+    def test_create_users_skips_taken_emails(self, local_backend):
+        """Test the batch create stores new users and reports taken emails"""
+        local_backend.create_user("a", RECORD, "a@example.com")
+        duplicates = local_backend.create_users([
+            ("b", RECORD, "b@example.com"),
+            ("c", RECORD, "a@example.com"),
+            ("d", RECORD, "b@example.com")
+        ])
+        assert duplicates == ["a@example.com", "b@example.com"]
+        assert local_backend.get_auth_id_by_email("b@example.com") == "b"
+        assert local_backend.get_user("c") is None
+        assert local_backend.get_user("d") is None
+
+
+class TestSQLiteBackend:
+    """SQLite specific behaviour"""
+
+    def test_persists_to_file(self, tmp_path):
+        """Test records survive reopening the database file"""
+        path = str(tmp_path / "auth.db")
+        backend = SQLiteBackend(path)
+        backend.create_user("a", RECORD, "test@example.com")
+        backend.close()
+
+        reopened = SQLiteBackend(path)
+        assert reopened.get_user("a") == RECORD
+        reopened.close()
+
+
+class TestFirebaseBackend:
+    """Firebase backend against a mocked database reference"""
+
+    @patch('storage.firebase.get_database')
+    def test_get_auth_id_by_email_is_keyed_read(self, mock_db):
+        """Test email lookups read a single index entry"""
+        mock_db_instance = Mock()
+        mock_db_instance.child.return_value.child.return_value.get.return_value = "auth123"
+        mock_db.return_value = mock_db_instance
+
+        assert FirebaseBackend().get_auth_id_by_email("test@example.com") == "auth123"
+        mock_db_instance.child.assert_called_once_with(EMAIL_INDEX_NODE)
+        mock_db_instance.child.return_value.child.assert_called_once_with(
+            email_index_key("test@example.com"))
+        mock_db_instance.get.assert_not_called()
+
+    @pytest.fixture
+    def tree(self):
+        fake = FakeTreeReference({})
+        with patch('storage.firebase.get_database', return_value=fake):
+            yield fake
+
+    def _index(self, tree, email):
+        return tree.child(EMAIL_INDEX_NODE).child(email_index_key(email)).get()
+
+    def test_create_user_reserves_email_then_writes_record(self, tree):
+        """Test create_user reserves the email in the index and writes the record"""
+        FirebaseBackend().create_user("auth123", RECORD, "test@example.com")
+        assert self._index(tree, "test@example.com") == "auth123"
+        assert tree.child("auth123").get() == RECORD
+
+    def test_create_user_rejects_taken_email(self, tree):
+        """Test the reservation fails when the index entry belongs to an existing user"""
+        FirebaseBackend().create_user("otherUser", RECORD, "test@example.com")
+
+        with pytest.raises(EmailAlreadyExistsError):
+            FirebaseBackend().create_user("auth123", RECORD, "test@example.com")
+        assert tree.child("auth123").get() is None
+        assert self._index(tree, "test@example.com") == "otherUser"
+
+    def test_create_user_reclaims_orphaned_email(self, tree):
+        """Test an index entry whose user record was never written does not block the email"""
+        tree.child(EMAIL_INDEX_NODE).child(email_index_key("test@example.com")).set("crashedUser")
+
+        FirebaseBackend().create_user("auth123", RECORD, "test@example.com")
+        assert self._index(tree, "test@example.com") == "auth123"
+        assert tree.child("auth123").get() == RECORD
+
+    def test_create_user_releases_email_when_write_fails(self, tree):
+        """Test the email reservation is released if the record write fails"""
+        tree.before_set["auth123"] = Mock(side_effect=RuntimeError("write failed"))
+
+        with pytest.raises(RuntimeError):
+            FirebaseBackend().create_user("auth123", RECORD, "test@example.com")
+        assert self._index(tree, "test@example.com") is None
+
+    def test_create_user_backs_out_when_reservation_is_reclaimed(self, tree):
+        """Test a signup whose entry was reclaimed before its record landed removes its record"""
+        def rival_signup():
+            # Sees no record for auth123 yet, so takes the entry over
+            FirebaseBackend().create_user("rival", RECORD, "test@example.com")
+        tree.before_set["auth123"] = rival_signup
+
+        with pytest.raises(EmailAlreadyExistsError):
+            FirebaseBackend().create_user("auth123", RECORD, "test@example.com")
+        assert tree.child("auth123").get() is None
+        assert self._index(tree, "test@example.com") == "rival"
+        assert tree.child("rival").get() == RECORD
+
+    @patch('storage.firebase.get_database')
+    def test_get_users_reads_each_key(self, mock_db):
+        """Test the batch read fetches every auth_id and drops missing ones"""
+        mock_db_instance = Mock()
+        records = {"auth1": RECORD}
+        mock_db_instance.child.side_effect = lambda key: Mock(get=Mock(return_value=records.get(key)))
+        mock_db.return_value = mock_db_instance
+
+        assert FirebaseBackend().get_users(["auth1", "auth2", "auth1"]) == {"auth1": RECORD}
+        assert mock_db_instance.child.call_count == 2
+
+    def test_create_users_writes_one_multi_path_update(self, tree):
+        """Test each email is reserved and all records are written in one update"""
+        FirebaseBackend().create_user("otherUser", RECORD, "taken@example.com")
+        tree.updates.clear()
+
+        duplicates = FirebaseBackend().create_users([
+            ("auth1", RECORD, "one@example.com"),
+            ("auth2", RECORD, "taken@example.com"),
+            ("auth3", RECORD, "three@example.com")
+        ])
+        assert duplicates == ["taken@example.com"]
+        assert tree.updates == [{"auth1": RECORD, "auth3": RECORD}]
+        assert tree.child("auth2").get() is None
+
+    def test_create_users_reclaims_orphaned_emails(self, tree):
+        """Test the batch reclaims index entries whose user record does not exist"""
+        tree.child(EMAIL_INDEX_NODE).child(email_index_key("one@example.com")).set("crashedUser")
+
+        assert FirebaseBackend().create_users([("auth1", RECORD, "one@example.com")]) == []
+        assert self._index(tree, "one@example.com") == "auth1"
+
+    def test_create_users_backs_out_reclaimed_reservations(self, tree):
+        """Test users whose entry was reclaimed before the write are removed and reported"""
+        def rival_signup(updates):
+            FirebaseBackend().create_user("rival", RECORD, "two@example.com")
+        tree.before_update.append(rival_signup)
+
+        duplicates = FirebaseBackend().create_users([
+            ("auth1", RECORD, "one@example.com"),
+            ("auth2", RECORD, "two@example.com")
+        ])
+        assert duplicates == ["two@example.com"]
+        assert tree.child("auth1").get() == RECORD
+        assert tree.child("auth2").get() is None
+        assert self._index(tree, "two@example.com") == "rival"
+
+    def test_create_users_releases_emails_when_write_fails(self, tree):
+        """Test the batch's reservations are released if the update fails"""
+        tree.before_update.append(Mock(side_effect=RuntimeError("write failed")))
+
+        with pytest.raises(RuntimeError):
+            FirebaseBackend().create_users([("auth1", RECORD, "one@example.com")])
+        assert self._index(tree, "one@example.com") is None
+
+    @patch('storage.firebase.get_database')
+    def test_iter_users_pages_by_key_around_the_index(self, mock_db):
+        """Test the scan pages by key and never reads the email index subtree"""
+        tree = {f"auth{i}": {"email": f"user{i}@example.com"} for i in range(5)}
+        tree["zed"] = {"email": "zed@example.com"}
+        tree[EMAIL_INDEX_NODE] = {"stale": "auth1"}
+        tree[REVOKED_TOKENS_NODE] = {"0000000000001_jti": 2}
+        fake = FakeRootReference(tree)
+        mock_db.return_value = fake
+
+        users = list(FirebaseBackend().iter_users(page_size=2))
+        assert [auth_id for auth_id, _ in users] == ["auth0", "auth1", "auth2", "auth3", "auth4", "zed"]
+        assert all(len(page) <= 3 for page in fake.pages)
+        assert not any(EMAIL_INDEX_NODE in page or REVOKED_TOKENS_NODE in page for page in fake.pages)
+
+    @patch('storage.firebase.get_database')
+    def test_iter_users_from_start_key(self, mock_db):
+        """Test a scan from a start key skips earlier users and the index"""
+        tree = {"auth1": RECORD, "auth2": RECORD, "zed": RECORD, EMAIL_INDEX_NODE: {"stale": "auth1"}}
+        fake = FakeRootReference(tree)
+        mock_db.return_value = fake
+
+        assert [auth_id for auth_id, _ in FirebaseBackend().iter_users(start_at="auth2")] == ["auth2", "zed"]
+        assert [auth_id for auth_id, _ in FirebaseBackend().iter_users(start_at="y")] == ["zed"]
+        assert not any(EMAIL_INDEX_NODE in page for page in fake.pages)
+
+    @patch('storage.firebase.get_database')
+    def test_iter_users_key_range(self, mock_db):
+        """Test end_at bounds the scan on both sides of the index"""
+        tree = {"auth1": RECORD, "auth2": RECORD, "zed": RECORD, EMAIL_INDEX_NODE: {"stale": "auth1"}}
+        fake = FakeRootReference(tree)
+        mock_db.return_value = fake
+
+        assert [auth_id for auth_id, _ in FirebaseBackend().iter_users(start_at="auth2", end_at="y")] == ["auth2"]
+        assert [auth_id for auth_id, _ in FirebaseBackend().iter_users(end_at="zed")] == ["auth1", "auth2", "zed"]
+        assert not any(EMAIL_INDEX_NODE in page for page in fake.pages)
+
+    @patch('storage.firebase.get_database')
+    def test_rebuild_email_index(self, mock_db):
+        """Test the backfill writes one index entry per user, in batches"""
+        fake = FakeRootReference({
+            "auth1": {"email": "One@example.com", "name": "One"},
+            "auth2": {"email": "two@example.com", "name": "Two"},
+            "auth3": {"email": "three@example.com", "name": "Three"},
+            EMAIL_INDEX_NODE: {"stale": "auth1"}
+        })
+        mock_db.return_value = fake
+
+        assert FirebaseBackend().rebuild_email_index(batch_size=2) == 3
+        assert fake.updates == [
+            {
+                f"{EMAIL_INDEX_NODE}/{email_index_key('one@example.com')}": "auth1",
+                f"{EMAIL_INDEX_NODE}/{email_index_key('two@example.com')}": "auth2"
+            },
+            {f"{EMAIL_INDEX_NODE}/{email_index_key('three@example.com')}": "auth3"}
+        ]
+
+
+class TestFirebaseRevocations:
+    """Test suite for revoked token storage in Firebase"""
+
+    @patch('storage.firebase.get_database')
+    def test_revocations_are_keyed_by_time(self, mock_db):
+        """Test a revocation is stored under its time-prefixed key with the exp"""
+        FirebaseBackend().revoke_token("abc_def", exp=1700000500, revoked_at=1700000000.25)
+        mock_db.return_value.child.assert_called_with(REVOKED_TOKENS_NODE)
+        mock_db.return_value.child.return_value.child.assert_called_with("1700000000250_abc_def")
+        mock_db.return_value.child.return_value.child.return_value.set.assert_called_with(1700000500)
+
+    @patch('storage.firebase.get_database')
+    def test_poll_reads_from_the_since_key(self, mock_db):
+        """Test polling is a key range query starting at the since time"""
+        query = mock_db.return_value.child.return_value.order_by_key.return_value
+        query.start_at.return_value.get.return_value = {"1700000000250_abc_def": 1700000500}
+
+        assert FirebaseBackend().get_revoked_tokens(since=1700000000) == [("abc_def", 1700000500)]
+        query.start_at.assert_called_with("1700000000000")
+
+    @patch('storage.firebase.get_database')
+    def test_purge_deletes_expired_entries(self, mock_db):
+        """Test only revocations of expired tokens are deleted"""
+        mock_db.return_value.child.return_value.get.return_value = {"1_old": 100, "2_live": 900}
+        assert FirebaseBackend().purge_revoked_tokens(now=500) == 1
+        mock_db.return_value.update.assert_called_once_with({f"{REVOKED_TOKENS_NODE}/1_old": None})
+
+
+class TestFirebaseSessions:
+    """Test suite for refresh session storage in Firebase"""
+
+    @patch('storage.firebase.get_database')
+    def test_rotate_is_a_transaction_on_the_hash(self, mock_db):
+        """Test rotation applies only while the stored hash is the expected one"""
+        reference = mock_db.return_value.child.return_value.child.return_value
+        current = {"auth_id": "auth1", "token_hash": "h1"}
+        reference.transaction.side_effect = lambda update: update(current)
+
+        assert FirebaseBackend().rotate_session("s1", "h1", {"token_hash": "h2"}) is True
+        assert FirebaseBackend().rotate_session("s1", "h0", {"token_hash": "h2"}) is False
+        mock_db.return_value.child.assert_called_with(SESSIONS_NODE)
+
+    @patch('storage.firebase.get_database')
+    def test_purge_is_a_key_range(self, mock_db):
+        """Test sessions created before the cutoff are found by key and deleted"""
+        query = mock_db.return_value.child.return_value.order_by_key.return_value
+        query.end_at.return_value.get.return_value = {"1700000000250_abc": {"auth_id": "auth1"}}
+
+        assert FirebaseBackend().purge_sessions(created_before=1700000001) == 1
+        query.end_at.assert_called_with("1700000001000")
+        mock_db.return_value.update.assert_called_once_with({f"{SESSIONS_NODE}/1700000000250_abc": None})
+
+
+class FakeRootReference:
+    """Key-ordered queries over an in-memory tree, recording each page read"""
+
+    def __init__(self, tree, start=None, end=None, limit=None, root=None):
+        self.tree = tree
+        self.start, self.end, self.limit = start, end, limit
+        self.root = root or self
+        if root is None:
+            self.pages = []
+            self.updates = []
+
+    def _query(self, **changes):
+        params = {"start": self.start, "end": self.end, "limit": self.limit, **changes}
+        return FakeRootReference(self.tree, root=self.root, **params)
+
+    def order_by_key(self):
+        return self._query()
+
+    def start_at(self, key):
+        return self._query(start=key)
+
+    def end_at(self, key):
+        return self._query(end=key)
+
+    def limit_to_first(self, limit):
+        return self._query(limit=limit)
+
+    def get(self):
+        keys = [key for key in sorted(self.tree)
+                if (self.start is None or key >= self.start) and (self.end is None or key <= self.end)]
+        page = {key: self.tree[key] for key in keys[:self.limit]}
+        self.root.pages.append(page)
+        return page
+
+    def update(self, updates):
+        self.root.updates.append(updates)
+
+
+class FakeTreeReference:
+    """
+    Path references into an in-memory tree, with hooks that run before a
+    write lands so tests can interleave a concurrent signup.
+    """
+
+    def __init__(self, tree, path=(), root=None):
+        self.tree = tree
+        self.path = path
+        self.root = root or self
+        if root is None:
+            self.before_set = {}
+            self.before_update = []
+            self.updates = []
+
+    def child(self, key):
+        return FakeTreeReference(self.tree, self.path + tuple(key.split("/")), root=self.root)
+
+    def get(self, shallow=False):
+        node = self.tree
+        for key in self.path:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        if shallow and isinstance(node, dict):
+            return {key: True for key in node}
+        return node
+
+    def set(self, value):
+        hook = self.root.before_set.pop("/".join(self.path), None)
+        if hook is not None:
+            hook()
+        self._write(value)
+
+    def _write(self, value):
+        *parents, last = self.path
+        node = self.tree
+        for key in parents:
+            node = node.setdefault(key, {})
+        if value is None:
+            node.pop(last, None)
+        else:
+            node[last] = value
+
+    def delete(self):
+        self._write(None)
+
+    def update(self, updates):
+        for hook in self.root.before_update:
+            hook(updates)
+        self.root.before_update = []
+        self.root.updates.append(updates)
+        for path, value in updates.items():
+            self.child(path)._write(value)
+
+    def transaction(self, update):
+        value = update(self.get())
+        self._write(value)
+        return value
+
+
+class StreamingMemoryBackend(MemoryBackend):
+    """Memory backend with a listen() that hands the callback to the test"""
+
+    def listen(self, callback):
+        self.callback = callback
+        return Mock()
+
+    def heartbeat(self, now):
+        self.callback(event("put", "/~heartbeat", now))
+
+
+def event(event_type, path, data):
+    return Mock(event_type=event_type, path=path, data=data)
+
+
+class TestReplicatedBackend:
+    """Test suite for the in-process read replica"""
+
+    @pytest.fixture
+    def primary(self):
+        backend = StreamingMemoryBackend()
+        backend.create_user("auth1", RECORD, "test@example.com")
+        return backend
+
+    @pytest.fixture
+    def replica(self, primary):
+        replica = ReplicatedBackend(primary, skip_keys=[EMAIL_INDEX_NODE], page_size=2)
+        replica.warm_up()
+        return replica
+
+    def test_reads_go_to_primary_until_warm(self, primary):
+        """Test a cold replica falls back to the primary for every read"""
+        replica = ReplicatedBackend(primary)
+        assert replica.get_user("auth1") == RECORD
+        assert replica.get_auth_id_by_email("test@example.com") == "auth1"
+        assert replica.stats()["fallbacks"] == 2
+
+    def test_warm_reads_are_local(self, primary, replica):
+        """Test users and emails loaded during warm-up are served without the primary"""
+        with patch.object(primary, 'get_user') as get_user, \
+                patch.object(primary, 'get_auth_id_by_email') as get_auth_id:
+            assert replica.get_user("auth1") == RECORD
+            assert replica.get_auth_id_by_email("test@example.com") == "auth1"
+        get_user.assert_not_called()
+        get_auth_id.assert_not_called()
+        assert replica.stats()["hits"] == 2
+
+    def test_misses_fall_through_to_primary(self, primary, replica):
+        """Test a user the replica has not seen yet is still found"""
+        primary.create_user("auth2", {**RECORD, "email": "two@example.com"}, "two@example.com")
+        assert replica.get_auth_id_by_email("two@example.com") == "auth2"
+        assert replica.get_users(["auth1", "auth2"]).keys() == {"auth1", "auth2"}
+
+    def test_put_and_patch_events_update_the_copy(self, primary, replica):
+        """Test change events for users, fields and multi-path updates are applied"""
+        primary.callback(event("put", "/auth2", {**RECORD, "email": "Two@Example.com"}))
+        primary.callback(event("put", "/auth1/name", "Renamed"))
+        primary.callback(event("patch", "/", {"auth3": {**RECORD, "email": "three@example.com"},
+                                              "auth2/profile_version": 2}))
+        primary.callback(event("put", f"/{EMAIL_INDEX_NODE}/abc", "auth2"))
+
+        with patch.object(primary, 'get_user', return_value=None):
+            assert replica.get_user("auth1")["name"] == "Renamed"
+            assert replica.get_user("auth2")["profile_version"] == 2
+        assert replica.get_auth_id_by_email("two@example.com") == "auth2"
+        assert replica.get_auth_id_by_email("three@example.com") == "auth3"
+        assert EMAIL_INDEX_NODE not in replica._users
+        assert replica.stats()["events"] == 4
+
+    def test_deleted_user_is_dropped(self, primary, replica):
+        """Test a null put removes the user and its email"""
+        primary.callback(event("put", "/auth1", None))
+        assert "auth1" not in replica._users
+        assert "test@example.com" not in replica._emails
+
+    def test_root_put_resyncs(self, primary, replica):
+        """Test the stream's initial full snapshot replaces the copy"""
+        primary.callback(event("put", "/", {"auth9": {**RECORD, "email": "nine@example.com"},
+                                            EMAIL_INDEX_NODE: {"abc": "auth9"}}))
+        assert set(replica._users) == {"auth9"}
+        assert replica.get_auth_id_by_email("nine@example.com") == "auth9"
+        assert replica.stats()["resyncs"] == 1
+
+    def test_local_writes_are_visible_immediately(self, primary, replica):
+        """Test this process reads its own creates and updates before any event"""
+        replica.create_user("auth2", {**RECORD, "email": "two@example.com"}, "two@example.com")
+        replica.update_user("auth1", {"name": "Updated"})
+        with patch.object(primary, 'get_user', return_value=None):
+            assert replica.get_user("auth2")["email"] == "two@example.com"
+            assert replica.get_user("auth1")["name"] == "Updated"
+
+    def test_bad_event_disables_replica(self, primary, replica):
+        """Test an event that cannot be applied switches reads back to the primary"""
+        primary.callback(event("patch", "/", "not-a-mapping"))
+        assert replica.ready is False
+        assert replica.get_user("auth1") == RECORD
+        assert replica.stats()["fallbacks"] == 1
+
+    def test_failed_replica_restarts(self, primary, replica):
+        """Test maintenance reloads the copy and resubscribes after a failed event"""
+        primary.callback(event("patch", "/", "not-a-mapping"))
+        primary.create_user("auth2", {**RECORD, "email": "two@example.com"}, "two@example.com")
+        replica.maintain()
+        assert replica.ready is True
+        assert "auth2" in replica._users
+        assert replica.stats()["restarts"] == 1
+        primary.callback(event("put", "/auth1/name", "Renamed"))
+        assert replica._users["auth1"]["name"] == "Renamed"
+
+    def test_stale_replica_restarts(self, primary):
+        """Test maintenance reloads a replica whose stream went quiet"""
+        now = [100.0]
+        replica = ReplicatedBackend(primary, max_staleness=60.0, clock=lambda: now[0])
+        replica.warm_up()
+        now[0] = 160.0
+        replica.maintain()
+        assert replica.ready is True
+        assert replica.stats()["restarts"] == 1
+
+    def test_healthy_replica_sends_heartbeat(self, primary):
+        """Test maintenance of a healthy replica writes a heartbeat that refreshes the stream"""
+        now = [100.0]
+        replica = ReplicatedBackend(primary, skip_keys=["~heartbeat"], max_staleness=60.0,
+                                    clock=lambda: now[0])
+        replica.warm_up()
+        now[0] = 150.0
+        replica.maintain()
+        now[0] = 200.0
+        assert replica.ready is True
+        assert replica.stats()["restarts"] == 0
+        assert "~heartbeat" not in replica._users
+
+    def test_closed_replica_reads_primary(self, primary, replica):
+        """Test reads go back to the primary once the listener is closed"""
+        replica.close()
+        assert replica.ready is False
+        replica.maintain()
+        assert replica.ready is False
+
+    def test_stale_stream_reads_primary(self, primary):
+        """Test a stream silent for max_staleness stops serving reads until its next event"""
+        now = [100.0]
+        replica = ReplicatedBackend(primary, max_staleness=60.0, clock=lambda: now[0])
+        replica.warm_up()
+        assert replica.ready is True
+        now[0] = 160.0
+        assert replica.ready is False
+        primary.callback(event("put", "/", {"auth1": RECORD}))
+        assert replica.ready is True
+
+    def test_seconds_since_event(self, primary):
+        """Test staleness is measured from the last applied event"""
+        now = [100.0]
+        replica = ReplicatedBackend(primary, clock=lambda: now[0])
+        replica.warm_up()
+        now[0] = 130.0
+        assert replica.stats()["seconds_since_event"] == 30.0
+        primary.callback(event("put", "/auth1/name", "Renamed"))
+        assert replica.stats()["seconds_since_event"] == 0.0
+
+
+class TestCreateBackend:
+    """Backend selection by name"""
+
+    def test_memory(self):
+        """Test the memory backend is selectable by name"""
+        assert isinstance(create_backend("memory"), MemoryBackend)
+
+    def test_replica_wraps_firebase(self):
+        """Test STORAGE_REPLICA wraps the Firebase backend in a read replica"""
+        with patch('storage.STORAGE_REPLICA', True):
+            backend = create_backend("firebase")
+        assert isinstance(backend, ReplicatedBackend)
+        assert isinstance(backend.primary, FirebaseBackend)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected"""
+        with pytest.raises(ValueError):
+            create_backend("cassandra")
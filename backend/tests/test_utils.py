@@ -1,91 +1,80 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from utils import generate_auth_id, email_exists, get_user_by_email, create_user, get_user_by_auth_id
+from unittest.mock import Mock, patch
+from utils import (
+    generate_auth_id, email_exists, get_user_by_email, create_user, get_user_by_auth_id,
+    get_user_cache_stats, normalize_email, AuthIdGenerator, update_user, reencrypt_user_aadhaar,
+    get_users_by_auth_ids, create_users, new_user_record, invalidate_user, get_cached_user
+)
+from encryption_utils import decrypt_message, needs_reencryption
 
 
+@pytest.mark.usefixtures("memory_backend")
 class TestUtils:
     """Test suite for utility functions"""
 
-    @patch('utils.get_database')
-    def test_generate_auth_id_length(self, mock_db):
-        """Test that generated auth_id is 10 characters long"""
-        mock_db_instance = Mock()
-        mock_db_instance.child.return_value.get.return_value = None
-        mock_db.return_value = mock_db_instance
-        
+    def test_generate_auth_id_length(self):
+        """Test that generated auth_id is 20 characters long"""
         auth_id = generate_auth_id()
-        assert len(auth_id) == 10
+        assert len(auth_id) == 20
 
-    @patch('utils.get_database')
-    def test_generate_auth_id_alphanumeric(self, mock_db):
+    def test_generate_auth_id_alphanumeric(self):
         """Test that generated auth_id contains only alphanumeric characters"""
-        mock_db_instance = Mock()
-        mock_db_instance.child.return_value.get.return_value = None
-        mock_db.return_value = mock_db_instance
-        
         auth_id = generate_auth_id()
         assert auth_id.isalnum()
 
-    @patch('utils.get_database')
-    def test_generate_auth_id_unique(self, mock_db):
-        """Test that generate_auth_id checks for uniqueness"""
-        mock_db_instance = Mock()
-        # First call returns existing user, second returns None (unique)
-        mock_db_instance.child.return_value.get.side_effect = [{"name": "existing"}, None]
-        mock_db.return_value = mock_db_instance
+    @patch('utils.get_backend')
+    def test_generate_auth_id_unique(self, mock_backend):
+        """Test that generate_auth_id is unique without touching the database"""
+        auth_ids = [generate_auth_id() for _ in range(1000)]
+        assert len(set(auth_ids)) == 1000
+        mock_backend.assert_not_called()
+
+    def test_generate_auth_id_sorted_by_creation_time(self):
+        """Test that IDs sort in creation order, including within one millisecond"""
+        clock = Mock(return_value=1700000000.0)
+        generator = AuthIdGenerator(node="00", clock=clock)
+        same_ms = [generator() for _ in range(50)]
+        clock.return_value = 1700000001.0
+        later = generator()
         
-        auth_id = generate_auth_id()
-        assert auth_id is not None
-        assert len(auth_id) == 10
+        assert same_ms == sorted(same_ms)
+        assert later > same_ms[-1]
+
+    def test_generate_auth_id_node_prefix(self):
+        """Test that the node prefix follows the timestamp"""
+        generator = AuthIdGenerator(node="zz")
+        assert generator()[8:10] == "zz"
 
-    @patch('utils.get_database')
-    def test_email_exists_returns_true_when_email_found(self, mock_db):
+    def test_email_exists_returns_true_when_email_found(self):
         """Test email_exists returns True when email is found"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = {
-            "user1": {"email": "test@example.com", "name": "Test"},
-            "user2": {"email": "other@example.com", "name": "Other"}
-        }
-        mock_db.return_value = mock_db_instance
+        create_user("user1", "Test", "test@example.com", "encrypted", "hashed")
+        create_user("user2", "Other", "other@example.com", "encrypted", "hashed")
         
         result = email_exists("test@example.com")
         assert result is True
 
-    @patch('utils.get_database')
-    def test_email_exists_returns_false_when_email_not_found(self, mock_db):
+    def test_email_exists_returns_false_when_email_not_found(self):
         """Test email_exists returns False when email is not found"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = {
-            "user1": {"email": "test@example.com", "name": "Test"}
-        }
-        mock_db.return_value = mock_db_instance
+        create_user("user1", "Test", "test@example.com", "encrypted", "hashed")
         
         result = email_exists("notfound@example.com")
         assert result is False
 
-    @patch('utils.get_database')
-    def test_email_exists_returns_false_when_no_users(self, mock_db):
+    def test_email_exists_returns_false_when_no_users(self):
         """Test email_exists returns False when database is empty"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = None
-        mock_db.return_value = mock_db_instance
-        
         result = email_exists("test@example.com")
         assert result is False
 
-    @patch('utils.get_database')
-    def test_get_user_by_email_found(self, mock_db):
+    def test_email_exists_ignores_case_and_whitespace(self):
+        """Test email lookups are normalized"""
+        create_user("user1", "Test", "Test@Example.com", "encrypted", "hashed")
+        
+        assert email_exists(" test@example.COM ") is True
+        assert normalize_email(" Test@Example.COM ") == "test@example.com"
+
+    def test_get_user_by_email_found(self):
         """Test get_user_by_email returns user data when found"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = {
-            "auth123": {
-                "email": "test@example.com",
-                "name": "Test User",
-                "aadhaar": "encrypted_aadhaar",
-                "password": "hashed_password"
-            }
-        }
-        mock_db.return_value = mock_db_instance
+        create_user("auth123", "Test User", "test@example.com", "encrypted_aadhaar", "hashed_password")
         
         user = get_user_by_email("test@example.com")
         assert user is not None
@@ -93,36 +82,20 @@ class TestUtils:
         assert user['name'] == "Test User"
         assert user['auth_id'] == "auth123"
 
-    @patch('utils.get_database')
-    def test_get_user_by_email_not_found(self, mock_db):
+    def test_get_user_by_email_not_found(self):
         """Test get_user_by_email returns None when not found"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = {
-            "auth123": {"email": "other@example.com", "name": "Other"}
-        }
-        mock_db.return_value = mock_db_instance
+        create_user("auth123", "Other", "other@example.com", "encrypted", "hashed")
         
         user = get_user_by_email("notfound@example.com")
         assert user is None
 
-    @patch('utils.get_database')
-    def test_get_user_by_email_empty_database(self, mock_db):
+    def test_get_user_by_email_empty_database(self):
         """Test get_user_by_email with empty database"""
-        mock_db_instance = Mock()
-        mock_db_instance.get.return_value = None
-        mock_db.return_value = mock_db_instance
-        
         user = get_user_by_email("test@example.com")
         assert user is None
 
-    @patch('utils.get_database')
-    def test_create_user_success(self, mock_db):
+    def test_create_user_success(self, memory_backend):
         """Test create_user successfully creates a user"""
-        mock_db_instance = Mock()
-        mock_child = Mock()
-        mock_db_instance.child.return_value = mock_child
-        mock_db.return_value = mock_db_instance
-        
         result = create_user(
             auth_id="auth123",
             name="Test User",
@@ -132,17 +105,17 @@ class TestUtils:
         )
         
         assert result is True
-        mock_db_instance.child.assert_called_once_with("auth123")
-        mock_child.set.assert_called_once()
+        assert memory_backend.get_user("auth123") == {
+            "name": "Test User",
+            "email": "test@example.com",
+            "aadhaar": "encrypted_aadhaar",
+            "password": "hashed_password",
+            "profile_version": 1
+        }
+        assert memory_backend.get_auth_id_by_email("test@example.com") == "auth123"
 
-    @patch('utils.get_database')
-    def test_create_user_with_special_characters(self, mock_db):
+    def test_create_user_with_special_characters(self):
         """Test create_user with special characters in name"""
-        mock_db_instance = Mock()
-        mock_child = Mock()
-        mock_db_instance.child.return_value = mock_child
-        mock_db.return_value = mock_db_instance
-        
         result = create_user(
             auth_id="auth456",
             name="Test O'Brien-Smith",
@@ -152,34 +125,127 @@ class TestUtils:
         )
         
         assert result is True
+        assert get_user_by_auth_id("auth456")['name'] == "Test O'Brien-Smith"
 
-    @patch('utils.get_database')
-    def test_get_user_by_auth_id_found(self, mock_db):
+    def test_get_user_by_auth_id_found(self):
         """Test get_user_by_auth_id returns user when found"""
-        mock_db_instance = Mock()
-        mock_child = Mock()
-        mock_child.get.return_value = {
-            "name": "Test User",
-            "email": "test@example.com",
-            "aadhaar": "encrypted",
-            "password": "hashed"
-        }
-        mock_db_instance.child.return_value = mock_child
-        mock_db.return_value = mock_db_instance
+        create_user("auth123", "Test User", "test@example.com", "encrypted", "hashed")
         
         user = get_user_by_auth_id("auth123")
         assert user is not None
         assert user['name'] == "Test User"
         assert user['auth_id'] == "auth123"
 
-    @patch('utils.get_database')
-    def test_get_user_by_auth_id_not_found(self, mock_db):
+    def test_get_user_by_auth_id_not_found(self):
         """Test get_user_by_auth_id returns None when not found"""
-        mock_db_instance = Mock()
-        mock_child = Mock()
-        mock_child.get.return_value = None
-        mock_db_instance.child.return_value = mock_child
-        mock_db.return_value = mock_db_instance
-        
         user = get_user_by_auth_id("nonexistent")
         assert user is None
+
+    @patch('utils.get_backend')
+    def test_get_user_by_auth_id_served_from_cache(self, mock_backend):
+        """Test repeated lookups for the same auth_id hit the cache"""
+        mock_backend_instance = Mock()
+        mock_backend_instance.get_user.return_value = {"name": "Test User"}
+        mock_backend.return_value = mock_backend_instance
+        
+        first = get_user_by_auth_id("auth123")
+        first['name'] = "Mutated"
+        second = get_user_by_auth_id("auth123")
+        
+        assert second['name'] == "Test User"
+        assert mock_backend_instance.get_user.call_count == 1
+        stats = get_user_cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @patch('utils.get_backend')
+    def test_get_user_by_auth_id_does_not_cache_missing_users(self, mock_backend):
+        """Test that a missing user is looked up again next time"""
+        mock_backend_instance = Mock()
+        mock_backend_instance.get_user.return_value = None
+        mock_backend.return_value = mock_backend_instance
+        
+        assert get_user_by_auth_id("auth123") is None
+        assert get_user_by_auth_id("auth123") is None
+        assert mock_backend_instance.get_user.call_count == 2
+
+    @patch('utils.get_backend')
+    def test_create_user_invalidates_cache(self, mock_backend):
+        """Test create_user drops any cached record for the auth_id"""
+        mock_backend_instance = Mock()
+        mock_backend_instance.get_user.return_value = {"name": "Old Name"}
+        mock_backend.return_value = mock_backend_instance
+        
+        get_user_by_auth_id("auth123")
+        create_user(auth_id="auth123", name="New Name", email="test@example.com",
+                    aadhaar="encrypted", password="hashed")
+        mock_backend_instance.get_user.return_value = {"name": "New Name"}
+        
+        assert get_user_by_auth_id("auth123")['name'] == "New Name"
+
+    @patch('utils.get_backend')
+    def test_read_overtaken_by_invalidation_is_not_cached(self, mock_backend):
+        """Test a record read before a write landed is returned but not cached"""
+        def get_user(auth_id):
+            invalidate_user(auth_id)  # the write lands while the read is in flight
+            return {"name": "Old Name"}
+        mock_backend.return_value.get_user.side_effect = get_user
+
+        assert get_user_by_auth_id("auth123")['name'] == "Old Name"
+        assert get_cached_user("auth123") is None
+
+    def test_get_users_by_auth_ids_reads_only_cache_misses(self):
+        """Test the batch lookup answers cached users and fetches the rest in one call"""
+        create_user("auth1", "One", "one@example.com", "encrypted", "hashed")
+        create_user("auth2", "Two", "two@example.com", "encrypted", "hashed")
+        get_user_by_auth_id("auth1")
+
+        with patch('utils.get_backend') as mock_backend:
+            mock_backend.return_value.get_users.return_value = {"auth2": {"name": "Two"}}
+            users = get_users_by_auth_ids(["auth1", "auth2", "missing"])
+
+        mock_backend.return_value.get_users.assert_called_once_with(["auth2", "missing"])
+        assert users["auth1"]["name"] == "One"
+        assert users["auth2"] == {"name": "Two", "auth_id": "auth2"}
+        assert "missing" not in users
+
+    def test_create_users_reports_duplicates(self, memory_backend):
+        """Test the batch create normalizes emails and reports taken ones"""
+        create_user("auth1", "One", "one@example.com", "encrypted", "hashed")
+        duplicates = create_users({
+            "auth2": new_user_record("Two", "two@example.com", "encrypted", "hashed"),
+            "auth3": new_user_record("Again", "One@Example.com", "encrypted", "hashed")
+        })
+        assert duplicates == ["one@example.com"]
+        assert memory_backend.get_auth_id_by_email("two@example.com") == "auth2"
+        assert memory_backend.get_user("auth3") is None
+
+    def test_update_user_merges_fields_and_invalidates_cache(self):
+        """Test update_user changes only the given fields and refreshes the cache"""
+        create_user("auth123", "Test User", "test@example.com", "encrypted", "hashed")
+        get_user_by_auth_id("auth123")
+        
+        update_user("auth123", password="rehashed")
+        
+        user = get_user_by_auth_id("auth123")
+        assert user['password'] == "rehashed"
+        assert user['name'] == "Test User"
+
+    def test_reencrypt_user_aadhaar_upgrades_legacy_ciphertext(self, legacy_ciphertext):
+        """Test a legacy Aadhaar ciphertext is rewritten in the current format"""
+        create_user("auth123", "Test User", "test@example.com",
+                    legacy_ciphertext("123456789012"), "hashed")
+        
+        assert reencrypt_user_aadhaar(get_user_by_auth_id("auth123")) is True
+        
+        upgraded = get_user_by_auth_id("auth123")['aadhaar']
+        assert needs_reencryption(upgraded) is False
+        assert decrypt_message(upgraded) == "123456789012"
+        assert reencrypt_user_aadhaar(get_user_by_auth_id("auth123")) is False
+
+    def test_reencrypt_user_aadhaar_ignores_unreadable_ciphertext(self):
+        """Test a corrupt ciphertext is left alone instead of raising"""
+        create_user("auth123", "Test User", "test@example.com", "corrupted", "hashed")
+        
+        assert reencrypt_user_aadhaar(get_user_by_auth_id("auth123")) is False
+        assert get_user_by_auth_id("auth123")['aadhaar'] == "corrupted"
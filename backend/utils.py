@@ -1,62 +1,377 @@
+import time
+import logging
 import string
-import random
-from firebase_config import get_database
+import secrets
+import threading
+from storage import get_backend, EmailAlreadyExistsError, ITER_PAGE_SIZE
+from cache import TTLCache, SingleFlight
+from bloom import EmailFilter
+from settings import env
+from encryption_utils import encrypt_message, decrypt_message, needs_reencryption
+
+logger = logging.getLogger(__name__)
+
+# In-process cache of user records keyed by auth_id, in front of
+# get_user_by_auth_id. Set USER_CACHE_SIZE=0 to disable.
+USER_CACHE_SIZE = int(env("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(env("USER_CACHE_TTL", "60"))
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Invalidation generations, striped by auth_id so memory stays fixed. A
+# read only fills the cache if its stripe was not invalidated while the
+# read was in flight; a collision just skips a fill.
+_GENERATION_STRIPES = 1024
+_generations = [0] * _GENERATION_STRIPES
+_generation_lock = threading.Lock()
+
+# Concurrent lookups for the same auth_id / email share one backend read,
+# including the burst of misses when a hot cache entry expires
+user_lookups = SingleFlight()
+email_lookups = SingleFlight()
+
+# Auth IDs are <8 time chars><2 node chars><10 random chars> over an alphabet
+# in ASCII order, so they sort by creation time and need no existence check.
+AUTH_ID_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+AUTH_ID_TIME_CHARS = 8
+AUTH_ID_NODE_CHARS = 2
+AUTH_ID_RANDOM_CHARS = 10
+
+
+def normalize_email(email):
+    """Normalize an email for index lookups (trimmed and lower-cased)"""
+    return email.strip().lower()
+
+
+def _encode_base62(value, length):
+    base = len(AUTH_ID_ALPHABET)
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, base)
+        chars.append(AUTH_ID_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def _node_prefix():
+    """NODE_ID (0-3843) if configured, otherwise random per process"""
+    node_id = env("NODE_ID")
+    space = len(AUTH_ID_ALPHABET) ** AUTH_ID_NODE_CHARS
+    value = int(node_id) % space if node_id else secrets.randbelow(space)
+    return _encode_base62(value, AUTH_ID_NODE_CHARS)
+
+
+class AuthIdGenerator:
+    """
+    Time-ordered auth ID generator that is unique without a database read.
+
+    IDs from one generator are strictly increasing: within the same
+    millisecond the random part is incremented instead of redrawn. The node
+    prefix separates processes, and the CSPRNG suffix covers the rest.
+    """
+
+    def __init__(self, node=None, clock=time.time):
+        self.node = node or _node_prefix()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+        self._random_space = len(AUTH_ID_ALPHABET) ** AUTH_ID_RANDOM_CHARS
+
+    def __call__(self):
+        with self._lock:
+            now_ms = max(int(self._clock() * 1000), self._last_ms)
+            if now_ms == self._last_ms:
+                self._last_random += 1
+                if self._last_random >= self._random_space:
+                    # Random part exhausted within one millisecond; borrow the next one
+                    now_ms += 1
+                    self._last_random = secrets.randbelow(self._random_space // 2)
+            else:
+                # Leave headroom so increments within the millisecond cannot overflow
+                self._last_random = secrets.randbelow(self._random_space // 2)
+            self._last_ms = now_ms
+            random_part = self._last_random
+
+        return (_encode_base62(now_ms, AUTH_ID_TIME_CHARS) + self.node
+                + _encode_base62(random_part, AUTH_ID_RANDOM_CHARS))
+
+
+_auth_id_generator = AuthIdGenerator()
 
 
 def generate_auth_id():
-    """Generate a unique 10-character auth ID"""
-    characters = string.ascii_letters + string.digits
-    db = get_database()
+    """Generate a unique, time-ordered 20-character auth ID"""
+    return _auth_id_generator()
+
 
-    while True:
-        auth_id = ''.join(random.choices(characters, k=10))
-        # Check if auth_id already exists
-        existing_user = db.child(auth_id).get()
-        if not existing_user:
-            return auth_id
+def auth_id_floor(timestamp):
+    """Smallest auth ID that can be generated at or after timestamp"""
+    return _encode_base62(int(timestamp * 1000), AUTH_ID_TIME_CHARS)
+
+
+def auth_id_ceiling(timestamp):
+    """Largest auth ID that can be generated at or before timestamp"""
+    return (auth_id_floor(timestamp)
+            + AUTH_ID_ALPHABET[-1] * (AUTH_ID_NODE_CHARS + AUTH_ID_RANDOM_CHARS))
+
+
+def _scan_emails(since=None, until=None):
+    # Bounded on both sides: auth ids from before time-ordered ids are
+    # random and mostly sort above any recent floor
+    start_at = auth_id_floor(max(0, since)) if since is not None else None
+    end_at = auth_id_ceiling(until) if until is not None else None
+    for _, record in get_backend().iter_users(start_at=start_at, end_at=end_at):
+        if record.get('email'):
+            yield normalize_email(record['email'])
+
+
+# Optional Bloom filter of registered emails: lookups for unknown emails
+# (new signups, mistyped logins) are answered without any database I/O
+EMAIL_FILTER_ENABLED = env("EMAIL_FILTER_ENABLED", "false").lower() == "true"
+EMAIL_FILTER_CAPACITY = int(env("EMAIL_FILTER_CAPACITY", "1000000"))
+EMAIL_FILTER_ERROR_RATE = float(env("EMAIL_FILTER_ERROR_RATE", "0.01"))
+EMAIL_FILTER_REFRESH = float(env("EMAIL_FILTER_REFRESH", "1"))
+EMAIL_FILTER_PATH = env("EMAIL_FILTER_PATH", "email-filter.bin")
+
+email_filter = EmailFilter(
+    capacity=EMAIL_FILTER_CAPACITY,
+    error_rate=EMAIL_FILTER_ERROR_RATE,
+    scan=_scan_emails,
+    refresh_interval=EMAIL_FILTER_REFRESH,
+    path=EMAIL_FILTER_PATH or None
+) if EMAIL_FILTER_ENABLED else None
+
+
+def start_email_filter():
+    """Build (or warm-start) the email filter; a no-op unless it is enabled.
+
+    Lookups bypass the filter until this has finished, and if it fails they
+    keep doing so.
+    """
+    if email_filter is None:
+        return
+    try:
+        email_filter.load_or_build()
+    except Exception:
+        logger.exception("Could not build the email filter; lookups will not use it")
+        return
+    email_filter.start()
+
+
+def get_auth_id_by_email(email):
+    """Look up the auth_id for an email via the email index"""
+    email = normalize_email(email)
+    if email_filter is not None and email_filter.definitely_absent(email):
+        return None
+
+    return email_lookups.do(email, _lookup_auth_id, email)
+
+
+def _lookup_auth_id(email):
+    auth_id = get_backend().get_auth_id_by_email(email)
+    if auth_id is None and email_filter is not None and email_filter.ready:
+        email_filter.record_false_positive()
+    return auth_id
 
 
 def email_exists(email):
     """Check if email already exists in database"""
-    db = get_database()
-    all_users = db.get()
-
-    if all_users:
-        for auth_id, user_data in all_users.items():
-            if user_data.get('email') == email:
-                return True
-    return False
+    return get_auth_id_by_email(email) is not None
 
 
 def get_user_by_email(email):
     """Get user data by email"""
-    db = get_database()
-    all_users = db.get()
+    auth_id = get_auth_id_by_email(email)
 
-    if all_users:
-        for auth_id, user_data in all_users.items():
-            if user_data.get('email') == email:
-                return {**user_data, 'auth_id': auth_id}
+    if auth_id:
+        return get_user_by_auth_id(auth_id)
     return None
 
 
-def create_user(auth_id, name, email, aadhaar, password):
-    """Create a new user in the database"""
-    db = get_database()
-    db.child(auth_id).set({
+def new_user_record(name, email, aadhaar, password):
+    """Build the stored record for a new user (aadhaar and password already protected)"""
+    return {
         'name': name,
         'email': email,
         'aadhaar': aadhaar,
-        'password': password
-    })
+        'password': password,
+        'profile_version': 1
+    }
+
+
+def create_user(auth_id, name, email, aadhaar, password):
+    """Create a new user in the database.
+
+    Reserving the email and writing the record happen as one atomic backend
+    operation, so no separate email_exists check is needed first.
+
+    Raises:
+        EmailAlreadyExistsError: If the email is already registered
+    """
+    normalized = normalize_email(email)
+    get_backend().create_user(auth_id, new_user_record(name, email, aadhaar, password), normalized)
+    invalidate_user(auth_id)
+    email_lookups.forget(normalized)
+    if email_filter is not None:
+        email_filter.add(normalized)
     return True
 
 
+def create_users(records):
+    """Create many users in one batched backend write.
+
+    Args:
+        records: {auth_id: record} built with new_user_record
+
+    Returns:
+        Normalized emails that were already registered (those users are skipped)
+    """
+    duplicates = get_backend().create_users(
+        [(auth_id, record, normalize_email(record['email'])) for auth_id, record in records.items()])
+    for auth_id, record in records.items():
+        email = normalize_email(record['email'])
+        invalidate_user(auth_id)
+        email_lookups.forget(email)
+        if email_filter is not None:
+            email_filter.add(email)
+    return duplicates
+
+
+def update_user(auth_id, **fields):
+    """Update fields on an existing user and drop its cached record"""
+    get_backend().update_user(auth_id, fields)
+    invalidate_user(auth_id)
+
+
+def reencrypt_user_aadhaar(user):
+    """
+    Lazily migrate a user's Aadhaar ciphertext to the current envelope.
+
+    Called after a record has been read; a no-op for records that are
+    already current, so migration cost is spread over normal traffic. This
+    is best effort: a failure is logged and retried on the next read.
+
+    Returns:
+        True if the record was rewritten
+    """
+    try:
+        if not needs_reencryption(user['aadhaar']):
+            return False
+        update_user(user['auth_id'], aadhaar=encrypt_message(decrypt_message(user['aadhaar'])))
+        return True
+    except Exception:
+        logger.warning("Could not re-encrypt Aadhaar for user %s", user.get('auth_id'), exc_info=True)
+        return False
+
+
 def get_user_by_auth_id(auth_id):
     """Get user data by auth_id"""
-    db = get_database()
-    user_data = db.child(auth_id).get()
+    user = get_cached_user(auth_id)
+    if user is not None:
+        return user
+    return fetch_user_by_auth_id(auth_id)
+
+
+def get_users_by_auth_ids(auth_ids):
+    """Get many users by auth_id with one batched read for the cache misses.
+
+    Returns:
+        {auth_id: user} for the auth_ids that exist
+    """
+    users = {}
+    missing = []
+    for auth_id in dict.fromkeys(auth_ids):
+        user = get_cached_user(auth_id)
+        if user is not None:
+            users[auth_id] = user
+        else:
+            missing.append(auth_id)
+
+    if missing:
+        generations = {auth_id: _generation(auth_id) for auth_id in missing}
+        for auth_id, user_data in get_backend().get_users(missing).items():
+            user = {**user_data, 'auth_id': auth_id}
+            _cache_user(auth_id, user, generations[auth_id])
+            users[auth_id] = dict(user)
+    return users
+
+
+def get_cached_user(auth_id):
+    """Return the cached user record for auth_id without any database I/O"""
+    cached = user_cache.get(auth_id)
+    if cached is not None:
+        return dict(cached)
+    return None
+
+
+def fetch_user_by_auth_id(auth_id):
+    """Read a user record from the database and refresh the cache"""
+    user = user_lookups.do(auth_id, _load_user, auth_id)
+    return dict(user) if user else None
+
+
+def _load_user(auth_id):
+    generation = _generation(auth_id)
+    user_data = get_backend().get_user(auth_id)
 
     if user_data:
-        return {**user_data, 'auth_id': auth_id}
+        user = {**user_data, 'auth_id': auth_id}
+        _cache_user(auth_id, user, generation)
+        return user
     return None
+
+
+def _generation(auth_id):
+    return _generations[hash(auth_id) % _GENERATION_STRIPES]
+
+
+def _cache_user(auth_id, user, generation):
+    # Under the lock invalidate_user takes, so the check and the fill
+    # cannot straddle an invalidation
+    with _generation_lock:
+        if _generation(auth_id) == generation:
+            user_cache.set(auth_id, user)
+
+
+def invalidate_user(auth_id):
+    """Drop a user's cached record; call after any write to that user"""
+    with _generation_lock:
+        _generations[hash(auth_id) % _GENERATION_STRIPES] += 1
+        user_cache.invalidate(auth_id)
+    # A read already in flight may predate the write; it will not cache its
+    # result, and later callers start a fresh one
+    user_lookups.forget(auth_id)
+
+
+def get_email_filter_stats():
+    """Return email filter counters and false-positive rates, or None if disabled"""
+    return email_filter.stats() if email_filter is not None else None
+
+
+def get_storage_stats():
+    """Return backend-specific state (e.g. the read replica's), or None"""
+    return get_backend().stats()
+
+
+def get_user_cache_stats():
+    """Return hit/miss/eviction counters for the user record cache"""
+    return user_cache.stats()
+
+
+def get_coalesced_lookups():
+    """Return how many lookups shared another caller's in-flight backend read"""
+    return user_lookups.shared + email_lookups.shared
+
+
+def iter_users(page_size=ITER_PAGE_SIZE):
+    """Yield (auth_id, record) for every user, reading one page at a time"""
+    return get_backend().iter_users(page_size=page_size)
+
+
+def backfill_email_index():
+    """Rebuild the email index from the existing user records.
+
+    Returns:
+        Number of index entries written
+    """
+    return get_backend().rebuild_email_index()
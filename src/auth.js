@@ -0,0 +1,22 @@
+const API_URL = "http://localhost:8002";
+
+// Access tokens are short-lived; when /verify rejects one, trade the
+// refresh token cookie for a new pair once and retry
+export async function verifySession() {
+    const verify = () =>
+        fetch(`${API_URL}/verify`, {
+            method: "GET",
+            credentials: "include", // Important: sends cookies with request
+        });
+
+    const response = await verify();
+    if (response.status !== 401) {
+        return response;
+    }
+
+    const refreshed = await fetch(`${API_URL}/refresh`, {
+        method: "POST",
+        credentials: "include",
+    });
+    return refreshed.ok ? verify() : response;
+}
@@ -1,5 +1,6 @@
 import { useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { verifySession } from "../auth";
 
 function Guest() {
     const navigate = useNavigate();
@@ -7,10 +8,7 @@ function Guest() {
     useEffect(() => {
         const checkAuth = async () => {
             try {
-                const response = await fetch("http://localhost:8002/verify", {
-                    method: "GET",
-                    credentials: "include",
-                });
+                const response = await verifySession();
 
                 if (response.ok) {
                     // User is authenticated, redirect to home
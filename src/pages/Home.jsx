@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
+import { verifySession } from "../auth";
 
 function Home({ user, setUser }) {
     const navigate = useNavigate();
@@ -8,10 +9,7 @@ function Home({ user, setUser }) {
     useEffect(() => {
         const verifyToken = async () => {
             try {
-                const response = await fetch("http://localhost:8002/verify", {
-                    method: "GET",
-                    credentials: "include", // Important: sends cookies with request
-                });
+                const response = await verifySession();
 
                 if (response.ok) {
                     const data = await response.json();
@@ -1,6 +1,7 @@
 /* eslint-disable no-unused-vars */
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { verifySession } from "../auth";
 
 function Login({ setUser }) {
     const navigate = useNavigate();
@@ -14,10 +15,7 @@ function Login({ setUser }) {
     useEffect(() => {
         const checkAuth = async () => {
             try {
-                const response = await fetch("http://localhost:8002/verify", {
-                    method: "GET",
-                    credentials: "include",
-                });
+                const response = await verifySession();
 
                 if (response.ok) {
                     // User is authenticated, redirect to home
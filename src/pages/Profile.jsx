@@ -1,6 +1,7 @@
 /* eslint-disable no-unused-vars */
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
+import { verifySession } from "../auth";
 
 function Profile({ user, setUser }) {
     const navigate = useNavigate();
@@ -9,10 +10,7 @@ function Profile({ user, setUser }) {
     useEffect(() => {
         const verifyToken = async () => {
             try {
-                const response = await fetch("http://localhost:8002/verify", {
-                    method: "GET",
-                    credentials: "include",
-                });
+                const response = await verifySession();
 
                 if (response.ok) {
                     const data = await response.json();
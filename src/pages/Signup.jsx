@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { verifySession } from "../auth";
 
 function Signup() {
     const navigate = useNavigate();
@@ -16,10 +17,7 @@ function Signup() {
     useEffect(() => {
         const checkAuth = async () => {
             try {
-                const response = await fetch("http://localhost:8002/verify", {
-                    method: "GET",
-                    credentials: "include",
-                });
+                const response = await verifySession();
 
                 if (response.ok) {
                     // User is authenticated, redirect to home